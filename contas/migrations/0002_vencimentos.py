@@ -0,0 +1,75 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:46
+
+import calendar
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def _vencimento_em(dia, ano, mes):
+    return date(ano, mes, min(max(dia, 1), calendar.monthrange(ano, mes)[1]))
+
+
+def preencher_vencimentos(apps, schema_editor):
+    ContaPagar = apps.get_model('contas', 'ContaPagar')
+    ContaPaga = apps.get_model('contas', 'ContaPaga')
+    Categorias = apps.get_model('perfil', 'Categorias')
+
+    # O dono da conta é o dono da categoria
+    ContaPagar.objects.filter(user__isnull=True).update(
+        user=Subquery(Categorias.objects.filter(id=OuterRef('categoria_id')).values('user')[:1])
+    )
+
+    for paga in ContaPaga.objects.filter(vencimento__isnull=True).select_related('conta'):
+        paga.vencimento = _vencimento_em(paga.conta.dia_pagamento, paga.data_pagamento.year, paga.data_pagamento.month)
+        paga.save(update_fields=['vencimento'])
+
+    # Mesma regra da tela antiga: a ocorrência do mês atual, ou a do mês seguinte se já foi paga
+    hoje = date.today()
+    pagas_no_mes = set(ContaPaga.objects.filter(
+        data_pagamento__year=hoje.year, data_pagamento__month=hoje.month,
+    ).values_list('conta_id', flat=True))
+    proximo_mes = (hoje.year + 1, 1) if hoje.month == 12 else (hoje.year, hoje.month + 1)
+    for conta in ContaPagar.objects.all():
+        ano, mes = proximo_mes if conta.id in pagas_no_mes else (hoje.year, hoje.month)
+        conta.proximo_vencimento = _vencimento_em(conta.dia_pagamento, ano, mes)
+        conta.save(update_fields=['proximo_vencimento'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contas', '0001_initial'),
+        ('perfil', '0011_conta_saldo_inicial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contapaga',
+            name='vencimento',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contapagar',
+            name='proximo_vencimento',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contapagar',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='contapaga',
+            index=models.Index(fields=['conta', 'vencimento'], name='contapaga_conta_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(fields=['user', 'proximo_vencimento'], name='contapagar_user_venc_idx'),
+        ),
+        migrations.RunPython(preencher_vencimentos, migrations.RunPython.noop),
+    ]
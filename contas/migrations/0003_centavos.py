@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:53
+
+import core.dinheiro
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0002_vencimentos'),
+    ]
+
+    operations = [
+        core.dinheiro.migracao_para_centavos('contas', 'ContaPagar', 'valor'),
+        migrations.AlterField(
+            model_name='contapagar',
+            name='valor',
+            field=core.dinheiro.CentavosField(),
+        ),
+    ]
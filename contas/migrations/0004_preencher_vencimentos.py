@@ -0,0 +1,33 @@
+import calendar
+from datetime import date
+
+from django.db import migrations
+
+
+def _vencimento_em(dia, ano, mes):
+    return date(ano, mes, min(max(dia, 1), calendar.monthrange(ano, mes)[1]))
+
+
+def preencher_vencimentos(apps, schema_editor):
+    ContaPagar = apps.get_model('contas', 'ContaPagar')
+
+    # Contas criadas pelo admin depois da 0002 ficaram sem vencimento: a primeira ocorrência a partir de hoje
+    hoje = date.today()
+    proximo_mes = (hoje.year + 1, 1) if hoje.month == 12 else (hoje.year, hoje.month + 1)
+    for conta in ContaPagar.objects.filter(proximo_vencimento__isnull=True):
+        vencimento = _vencimento_em(conta.dia_pagamento, hoje.year, hoje.month)
+        if vencimento < hoje:
+            vencimento = _vencimento_em(conta.dia_pagamento, *proximo_mes)
+        conta.proximo_vencimento = vencimento
+        conta.save(update_fields=['proximo_vencimento'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0003_centavos'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_vencimentos, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,39 @@
 from django.db import models
+from django.contrib.auth.models import User
 from perfil.models import Categorias
 
+from core.dinheiro import CentavosField
+
 class ContaPagar(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     titulo = models.CharField(max_length=50)
     categoria = models.ForeignKey(Categorias, on_delete=models.DO_NOTHING)
     descricao = models.TextField()
-    valor = models.FloatField()
+    valor = CentavosField()
     dia_pagamento = models.IntegerField()
+    proximo_vencimento = models.DateField(null=True, blank=True)  # ocorrência mais antiga ainda não paga (ver contas.vencimentos)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'proximo_vencimento'], name='contapagar_user_venc_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
 
+    def save(self, *args, **kwargs):
+        # Contas criadas fora da tela (admin, objects.create) também entram em situacao() e pagar()
+        if self.proximo_vencimento is None and self.dia_pagamento is not None:
+            from .vencimentos import primeiro_vencimento
+            self.proximo_vencimento = primeiro_vencimento(int(self.dia_pagamento))
+        super().save(*args, **kwargs)
+
 class ContaPaga(models.Model):
     conta = models.ForeignKey(ContaPagar, on_delete=models.DO_NOTHING)
     data_pagamento = models.DateField()
+    vencimento = models.DateField(null=True, blank=True)  # ocorrência que foi paga
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conta', 'vencimento'], name='contapaga_conta_venc_idx'),
+        ]
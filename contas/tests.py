@@ -1,3 +1,67 @@
+from datetime import date
+
 from django.test import TestCase
 
-# Create your tests here.
+from core.dados_de_teste import nova_categoria, novo_usuario
+from .models import ContaPaga, ContaPagar
+from .vencimentos import pagar, primeiro_vencimento, situacao, vencimento_em, vencimento_seguinte
+
+
+class VencimentoTests(TestCase):
+    def test_dia_limitado_ao_tamanho_do_mes(self):
+        self.assertEqual(vencimento_em(31, 2026, 2), date(2026, 2, 28))
+        self.assertEqual(vencimento_em(31, 2024, 2), date(2024, 2, 29))
+        self.assertEqual(vencimento_em(31, 2026, 4), date(2026, 4, 30))
+        self.assertEqual(vencimento_em(0, 2026, 4), date(2026, 4, 1))
+
+    def test_seguinte_volta_ao_dia_original(self):
+        fevereiro = vencimento_seguinte(31, date(2026, 1, 31))
+        self.assertEqual(fevereiro, date(2026, 2, 28))
+        self.assertEqual(vencimento_seguinte(31, fevereiro), date(2026, 3, 31))
+        self.assertEqual(vencimento_seguinte(10, date(2026, 12, 10)), date(2027, 1, 10))
+
+    def test_primeiro_vencimento(self):
+        self.assertEqual(primeiro_vencimento(20, date(2026, 1, 20)), date(2026, 1, 20))
+        self.assertEqual(primeiro_vencimento(5, date(2026, 1, 20)), date(2026, 2, 5))
+
+
+class ContaPagarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = novo_usuario('contas')
+        cls.categoria = nova_categoria(cls.user, 'Casa')
+
+    def criar(self, titulo, **campos):
+        return ContaPagar.objects.create(user=self.user, titulo=titulo, categoria=self.categoria, descricao='', valor=100, **{'dia_pagamento': 10, **campos})
+
+    def test_janela_de_cinco_dias_passa_do_fim_do_mes(self):
+        vencida = self.criar('Vencida', proximo_vencimento=date(2026, 1, 25))
+        amanha = self.criar('Amanhã', proximo_vencimento=date(2026, 1, 30))
+        virada = self.criar('Virada', proximo_vencimento=date(2026, 2, 3))
+        self.criar('Depois', proximo_vencimento=date(2026, 2, 4))
+
+        self.assertEqual(situacao(self.user, hoje=date(2026, 1, 29)), ([vencida], [amanha, virada], []))
+
+    def test_restantes_do_mes(self):
+        proxima = self.criar('Próxima', proximo_vencimento=date(2026, 1, 12))
+        restante = self.criar('Restante', proximo_vencimento=date(2026, 1, 31))
+        self.assertEqual(situacao(self.user, hoje=date(2026, 1, 10)), ([], [proxima], [restante]))
+
+    def test_pagar_duas_vezes(self):
+        conta = self.criar('Luz', dia_pagamento=31, proximo_vencimento=date(2026, 1, 31))
+        # Dois envios do mesmo formulário leram a conta antes de qualquer pagamento
+        repetida = ContaPagar.objects.get(id=conta.id)
+
+        self.assertTrue(pagar(conta, date(2026, 1, 30)))
+        self.assertFalse(pagar(repetida))
+        self.assertEqual(ContaPagar.objects.get(id=conta.id).proximo_vencimento, date(2026, 2, 28))
+        self.assertEqual(list(ContaPaga.objects.values_list('vencimento', flat=True)), [date(2026, 1, 31)])
+
+    def test_conta_criada_sem_vencimento(self):
+        conta = self.criar('Admin')
+        self.assertEqual(conta.proximo_vencimento, primeiro_vencimento(10))
+
+        self.client.force_login(self.user)
+        resposta = self.client.post(f'/contas/pagar_conta/{conta.id}')
+        self.assertRedirects(resposta, '/contas/ver_contas', fetch_redirect_response=False)
+        self.assertEqual(ContaPaga.objects.get().vencimento, primeiro_vencimento(10))
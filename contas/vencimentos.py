@@ -0,0 +1,83 @@
+"""Cálculo de vencimentos das contas a pagar.
+
+Cada ContaPagar guarda em `proximo_vencimento` a ocorrência mais antiga ainda não
+paga. Pagar uma conta registra a ocorrência em ContaPaga e avança o vencimento
+para o mês seguinte, então a tela de contas sai de uma única consulta por faixa
+de datas em (user, proximo_vencimento). O dia de pagamento é limitado ao tamanho
+do mês (dia 31 vence em 28/29 de fevereiro, 30 de abril etc.).
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .models import ContaPagar, ContaPaga
+
+JANELA_DIAS = 5
+
+
+def vencimento_em(dia, ano, mes):
+    """Due date of a bill paid on `dia` in ano/mes, clamped to the month length."""
+    return date(ano, mes, min(max(dia, 1), calendar.monthrange(ano, mes)[1]))
+
+
+def _mes_seguinte(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def vencimento_seguinte(dia, vencimento):
+    """The occurrence after `vencimento`, in the following month."""
+    return vencimento_em(dia, *_mes_seguinte(vencimento.year, vencimento.month))
+
+
+def primeiro_vencimento(dia, hoje=None):
+    """First occurrence on or after `hoje` (used when a bill is created)."""
+    hoje = hoje or date.today()
+    vencimento = vencimento_em(dia, hoje.year, hoje.month)
+    if vencimento < hoje:
+        vencimento = vencimento_seguinte(dia, vencimento)
+    return vencimento
+
+
+@transaction.atomic
+def pagar(conta, data_pagamento=None):
+    """Mark the current occurrence of `conta` as paid and move to the next one.
+
+    Returns False if the occurrence was already paid (e.g. a double submit).
+    """
+    vencimento = conta.proximo_vencimento
+    seguinte = vencimento_seguinte(conta.dia_pagamento, vencimento)
+    # Só avança se ninguém pagou esta ocorrência entre a leitura e agora
+    if not ContaPagar.objects.filter(id=conta.id, proximo_vencimento=vencimento).update(proximo_vencimento=seguinte):
+        return False
+
+    ContaPaga.objects.create(conta=conta, vencimento=vencimento, data_pagamento=data_pagamento or date.today())
+    conta.proximo_vencimento = seguinte
+    return True
+
+
+def situacao(user, hoje=None, janela=JANELA_DIAS):
+    """Return (vencidas, proximas, restantes) for `user` with one range query.
+
+    vencidas: unpaid occurrences before today; proximas: due in the next `janela`
+    days (also across the month boundary); restantes: the rest of the current month.
+    """
+    hoje = hoje or date.today()
+    limite_proximas = hoje + timedelta(days=janela)
+    fim_do_mes = date(hoje.year, hoje.month, calendar.monthrange(hoje.year, hoje.month)[1])
+
+    contas = (
+        ContaPagar.objects
+        .filter(user=user, proximo_vencimento__lte=max(fim_do_mes, limite_proximas))
+        .order_by('proximo_vencimento', 'id')
+    )
+
+    vencidas, proximas, restantes = [], [], []
+    for conta in contas:
+        if conta.proximo_vencimento < hoje:
+            vencidas.append(conta)
+        elif conta.proximo_vencimento <= limite_proximas:
+            proximas.append(conta)
+        else:
+            restantes.append(conta)
+    return vencidas, proximas, restantes
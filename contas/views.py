@@ -1,9 +1,10 @@
 from django.shortcuts import render, redirect
 from perfil.models import Categorias
-from .models import ContaPagar, ContaPaga
+from perfil.cache import invalidar_dados
+from .models import ContaPagar
+from .vencimentos import pagar, primeiro_vencimento, situacao
 from django.contrib import messages
 from django.contrib.messages import constants
-from datetime import datetime
 
 def definir_contas(request):
 
@@ -18,31 +19,50 @@ def definir_contas(request):
         valor = request.POST.get('valor')
         dia_pagamento = request.POST.get('dia_pagamento')
 
+        try:
+            dia_pagamento = int(dia_pagamento)
+        except (TypeError, ValueError):
+            dia_pagamento = 0
+        if not 1 <= dia_pagamento <= 31:
+            messages.add_message(request, constants.ERROR, 'Informe um dia de pagamento entre 1 e 31.')
+            return redirect('/contas/definir_contas')
+
+        if not Categorias.objects.filter(id=categoria or None, user=request.user).exists():
+            messages.add_message(request, constants.ERROR, 'Categoria não encontrada.')
+            return redirect('/contas/definir_contas')
+
         conta = ContaPagar(
+            user=request.user,
             titulo=titulo,
             categoria_id=categoria,
             descricao=descricao,
             valor=valor,
-            dia_pagamento=dia_pagamento
+            dia_pagamento=dia_pagamento,
+            proximo_vencimento=primeiro_vencimento(dia_pagamento),
         )
 
         conta.save()
+        # A previsão de saldo (perfil.previsao) conta com as contas a pagar
+        invalidar_dados(request.user)
 
         messages.add_message(request, constants.SUCCESS, 'Conta cadastrada com sucesso')
         return redirect('/contas/definir_contas')
 
 def ver_contas(request):
-    MES_ATUAL = datetime.now().month
-    DIA_ATUAL = datetime.now().day
-    
-    contas = ContaPagar.objects.all()
+    contas_vencidas, contas_proximas_vencimento, restantes = situacao(request.user)
 
-    contas_pagas = ContaPaga.objects.filter(data_pagamento__month=MES_ATUAL).values('conta')
+    return render(request, 'ver_contas.html', {'contas_vencidas': contas_vencidas, 'contas_proximas_vencimento': contas_proximas_vencimento, 'restantes': restantes})
 
-    contas_vencidas = contas.filter(dia_pagamento__lt=DIA_ATUAL).exclude(id__in=contas_pagas)
-    
-    contas_proximas_vencimento = contas.filter(dia_pagamento__lte = DIA_ATUAL + 5).filter(dia_pagamento__gte=DIA_ATUAL).exclude(id__in=contas_pagas)
-    
-    restantes = contas.exclude(id__in=contas_vencidas).exclude(id__in=contas_pagas).exclude(id__in=contas_proximas_vencimento)
+def pagar_conta(request, id):
+    if request.method != 'POST':
+        return redirect('/contas/ver_contas')
 
-    return render(request, 'ver_contas.html', {'contas_vencidas': contas_vencidas, 'contas_proximas_vencimento': contas_proximas_vencimento, 'restantes': restantes})
\ No newline at end of file
+    conta = ContaPagar.objects.filter(id=id, user=request.user).first()
+    if conta is None:
+        messages.add_message(request, constants.ERROR, 'Conta não encontrada.')
+    elif pagar(conta):
+        invalidar_dados(request.user)
+        messages.add_message(request, constants.SUCCESS, f'{conta.titulo} paga. Próximo vencimento: {conta.proximo_vencimento.strftime("%d/%m/%Y")}')
+    else:
+        messages.add_message(request, constants.WARNING, 'Esta conta já foi paga.')
+    return redirect('/contas/ver_contas')
@@ -0,0 +1,34 @@
+"""Dados comuns aos testes: usuário, conta e categoria.
+
+`DadosBasicos` cria em setUpTestData o que quase toda classe de teste precisa
+(cls.user, cls.conta e cls.categoria 'Mercado'); as funções servem para usuários,
+contas e categorias extras.
+"""
+from django.contrib.auth.models import User
+
+from perfil.models import Categorias, Conta
+
+
+def novo_usuario(username):
+    return User.objects.create_user(username, password='x')
+
+
+def nova_conta(user, valor=0, apelido='Conta', **campos):
+    return Conta.objects.create(user=user, apelido=apelido, banco='NU', tipo='pf', valor=valor, **campos)
+
+
+def nova_categoria(user, categoria='Mercado', valor_planejado=0):
+    return Categorias.objects.create(user=user, categoria=categoria, valor_planejado=valor_planejado)
+
+
+class DadosBasicos:
+    """TestCase mixin: cls.user with one account (saldo_conta) and the 'Mercado' category."""
+
+    saldo_conta = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = novo_usuario(cls.__name__.lower())
+        cls.conta = nova_conta(cls.user, cls.saldo_conta)
+        cls.categoria = nova_categoria(cls.user)
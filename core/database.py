@@ -0,0 +1,79 @@
+"""Configuração do banco de dados a partir de variáveis de ambiente.
+
+SQLite (padrão) com perfil de produção:
+    SQLITE_PATH                caminho do arquivo (padrão: BASE_DIR/db.sqlite3)
+    SQLITE_JOURNAL_MODE        WAL: leitores não bloqueiam o escritor
+    SQLITE_SYNCHRONOUS         NORMAL: seguro com WAL, sem fsync a cada commit
+    SQLITE_BUSY_TIMEOUT        segundos esperando um lock antes de "database is locked" (20)
+    SQLITE_CACHE_SIZE          páginas em cache; negativo = KiB (-64000 ≈ 64 MB)
+    SQLITE_MMAP_SIZE           bytes lidos via mmap (256 MB)
+    SQLITE_TRANSACTION_MODE    IMMEDIATE (padrão), DEFERRED ou EXCLUSIVE (ver core.sqlite)
+
+PostgreSQL com DB_ENGINE=postgres (requer o pacote psycopg/psycopg2):
+    POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT
+    POSTGRES_PGBOUNCER=1       atrás de um pool PgBouncer em modo transaction
+                               (desliga server-side cursors, usados por .iterator())
+
+Para os dois:
+    DB_CONN_MAX_AGE            segundos de reuso de cada conexão (60; 0 = uma por requisição)
+
+Os PRAGMAs do SQLite são aplicados em cada conexão nova pelo sinal connection_created.
+"""
+import os
+
+from django.db.backends.signals import connection_created
+
+
+def _env(nome, padrao):
+    return os.environ.get(nome, padrao)
+
+
+def configurar_banco(base_dir):
+    """Return the settings dict of the default database."""
+    if _env('DB_ENGINE', 'sqlite') == 'postgres':
+        return configurar_postgres()
+    return configurar_sqlite(_env('SQLITE_PATH', str(base_dir / 'db.sqlite3')))
+
+
+def configurar_postgres():
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _env('POSTGRES_DB', 'numus'),
+        'USER': _env('POSTGRES_USER', 'numus'),
+        'PASSWORD': _env('POSTGRES_PASSWORD', ''),
+        'HOST': _env('POSTGRES_HOST', 'localhost'),
+        'PORT': _env('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(_env('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': _env('POSTGRES_PGBOUNCER', '') == '1',
+    }
+
+
+def configurar_sqlite(caminho):
+    return {
+        'ENGINE': 'core.sqlite',
+        'NAME': caminho,
+        'CONN_MAX_AGE': int(_env('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': float(_env('SQLITE_BUSY_TIMEOUT', 20))},
+        'TRANSACTION_MODE': _env('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        'PRAGMAS': {
+            'journal_mode': _env('SQLITE_JOURNAL_MODE', 'WAL'),
+            'synchronous': _env('SQLITE_SYNCHRONOUS', 'NORMAL'),
+            'cache_size': int(_env('SQLITE_CACHE_SIZE', -64000)),
+            'mmap_size': int(_env('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+            'temp_store': 'MEMORY',
+        },
+    }
+
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome} = {valor}')
+
+
+connection_created.connect(aplicar_pragmas, dispatch_uid='core.database.aplicar_pragmas')
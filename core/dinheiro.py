@@ -0,0 +1,109 @@
+"""Valores monetários em centavos inteiros.
+
+`CentavosField` guarda o valor como um inteiro de centavos (BIGINT) e entrega
+Decimal com duas casas no Python. SUM, comparações e os deltas com F() rodam
+sobre inteiros no banco, então os totais são exatos (o FloatField acumulava erro
+de arredondamento a cada soma).
+
+Expressões que misturam o campo com constantes precisam de `centavos(valor)` em
+vez do número puro: um Value sem output_field seria gravado em reais, não em
+centavos. `Soma` é o Sum com o resultado convertido para Decimal.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Sum, Value
+
+CENTAVO = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def para_decimal(valor):
+    """Convert int, float, str or Decimal into a Decimal with two places (half up)."""
+    if isinstance(valor, float):
+        # repr evita trazer o erro binário do float (0.1 -> 0.1000000000000000055...)
+        valor = repr(valor)
+    if isinstance(valor, str):
+        valor = valor.strip().replace(',', '.')
+    try:
+        return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Valor monetário inválido: {valor!r}')
+
+
+def para_centavos(valor):
+    return int(para_decimal(valor) * 100)
+
+
+def de_centavos(centavos):
+    return (Decimal(centavos) / 100).quantize(CENTAVO)
+
+
+class CentavosField(models.BigIntegerField):
+    description = 'Valor monetário guardado em centavos'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return de_centavos(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return para_decimal(value)
+        except ValueError:
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return para_centavos(value)
+
+    def formfield(self, **kwargs):
+        from django import forms
+        return super(models.BigIntegerField, self).formfield(**{
+            'form_class': forms.DecimalField,
+            'max_digits': 17,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+def centavos(valor):
+    """Constant usable in expressions with money columns (F() deltas, Coalesce defaults)."""
+    return Value(valor, output_field=CentavosField())
+
+
+class Soma(Sum):
+    """Sum of a money expression, returned as Decimal (exact: summed as integers)."""
+
+    output_field = CentavosField()
+
+    def __init__(self, *expressions, default=None, **extra):
+        if default is not None and not hasattr(default, 'resolve_expression'):
+            default = centavos(default)
+        super().__init__(*expressions, default=default, **extra)
+
+
+def migracao_para_centavos(app_label, modelo, *campos):
+    """RunPython that rescales float columns (reais) to integer cents and back.
+
+    Goes right before the AlterField to CentavosField: the column is still a
+    float when the values are multiplied by 100 and rounded.
+    """
+    from django.db.migrations import RunPython
+    from django.db.models import F
+    from django.db.models.functions import Round
+
+    def escalar(fator):
+        def executar(apps, schema_editor):
+            linhas = apps.get_model(app_label, modelo).objects.using(schema_editor.connection.alias)
+            if fator > 1:
+                linhas.update(**{campo: Round(F(campo) * fator) for campo in campos})
+            else:
+                linhas.update(**{campo: F(campo) * fator for campo in campos})
+        return executar
+
+    return RunPython(escalar(100), escalar(0.01))
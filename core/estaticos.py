@@ -0,0 +1,152 @@
+"""Arquivos estáticos com hash no nome, pré-comprimidos e com cache longo.
+
+`ArmazenamentoEstatico` é o ManifestStaticFilesStorage do Django (o collectstatic
+grava `home.3f2a9c1b7e4d.css` e o {% static %} devolve esse nome) e, depois do
+pós-processamento, grava ao lado de cada arquivo de texto uma versão .gz e, se o
+pacote `brotli` estiver instalado, uma .br.
+
+`estatico` serve o STATIC_ROOT pelo próprio Django (SERVIR_ESTATICOS) escolhendo
+a variante comprimida aceita pelo navegador. `CacheEstaticosMiddleware` marca os
+arquivos com hash no nome (estáticos do manifest e variantes de imagem de
+perfil.imagens) como imutáveis por um ano; os demais são revalidados. Com nginx na
+frente, o mesmo efeito vem de `gzip_static on` e de um `expires max` em /static/.
+"""
+import gzip
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.checks import Error, Tags, Warning, register
+from django.http import Http404
+from django.utils._os import safe_join
+from django.views.static import serve
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há .gz
+    brotli = None
+
+COMPRIMIVEIS = ('.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.xml', '.html', '.ico', '.ttf', '.eot', '.otf')
+TAMANHO_MINIMO = 512
+
+# nome.0123456789ab.css (manifest) ou pasta/<sha 32>[_p].webp (perfil.imagens)
+_COM_HASH = re.compile(r'(?:\.[0-9a-f]{12}\.[\w.]+|/[0-9a-f]{32}(?:_\w+)?\.\w+)$')
+
+
+def _comprimir(caminho):
+    original = caminho.read_bytes()
+    if len(original) < TAMANHO_MINIMO:
+        return
+    variantes = [('.gz', lambda dados: gzip.compress(dados, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', lambda dados: brotli.compress(dados, quality=11)))
+    for sufixo, compressor in variantes:
+        comprimido = compressor(original)
+        # Só vale a pena se economizar pelo menos 5%
+        if len(comprimido) < len(original) * 0.95:
+            caminho.with_name(caminho.name + sufixo).write_bytes(comprimido)
+
+
+class ArmazenamentoEstatico(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nome in set(self.hashed_files.values()):
+            if nome.endswith(COMPRIMIVEIS):
+                _comprimir(Path(self.path(nome)))
+
+
+def _aceita(request, codificacao):
+    return codificacao in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def estatico(request, path):
+    """Serve a file from STATIC_ROOT, preferring its precompressed .br/.gz variant."""
+    raiz = settings.STATIC_ROOT
+    # safe_join recusa caminhos fora do STATIC_ROOT (SuspiciousFileOperation -> 400)
+    caminho = Path(safe_join(raiz, path))
+    if not caminho.is_file():
+        raise Http404(path)
+
+    servido = path
+    for codificacao, sufixo in (('br', '.br'), ('gzip', '.gz')):
+        if _aceita(request, codificacao) and caminho.with_name(caminho.name + sufixo).is_file():
+            servido = path + sufixo
+            break
+
+    response = serve(request, servido, document_root=raiz)
+    if servido != path and response.status_code == 200:
+        # serve() deduz o tipo do .gz/.br e já coloca o Content-Encoding
+        response.headers['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response.headers['Content-Disposition'] = f'inline; filename="{caminho.name}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+class CacheEstaticosMiddleware:
+    """Cache-Control for static and media files served by Django."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixos = tuple(prefixo for prefixo in (settings.STATIC_URL, settings.MEDIA_URL) if prefixo)
+        self.max_age = getattr(settings, 'ESTATICOS_MAX_AGE', 365 * 24 * 60 * 60)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(self.prefixos) or response.status_code not in (200, 304):
+            return response
+        if _COM_HASH.search(request.path):
+            # O conteúdo muda junto com o nome: o navegador nem precisa revalidar
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        return response
+
+
+_STATIC_LITERAL = re.compile(r'''(?:src|href)\s*=\s*["']\s*/static/([^"'{]+)''')
+_STATIC_TAG = re.compile(r'''{%\s*static\s+["']([^"']+)["']\s*%}''')
+
+
+def _templates_do_projeto():
+    from django.apps import apps
+
+    pastas = [Path(pasta) for config in settings.TEMPLATES for pasta in config.get('DIRS', [])]
+    base = Path(settings.BASE_DIR)
+    for app in apps.get_app_configs():
+        caminho = Path(app.path)
+        if base in caminho.parents:
+            pastas.append(caminho / 'templates')
+    for pasta in pastas:
+        if pasta.is_dir():
+            yield from pasta.rglob('*.html')
+
+
+@register(Tags.staticfiles)
+def verificar_templates(app_configs, **kwargs):
+    """Templates must reference static files through {% static %} with names the finders know.
+
+    A hardcoded /static/ path skips the hashed name (and is never cached long-term);
+    an unknown name makes the manifest storage fail when the page is rendered.
+    """
+    from django.contrib.staticfiles import finders
+
+    problemas = []
+    for template in _templates_do_projeto():
+        texto = template.read_text(encoding='utf-8', errors='replace')
+        for nome in _STATIC_LITERAL.findall(texto):
+            problemas.append(Warning(
+                f'{template}: /static/{nome} sem {{% static %}}, o nome com hash não é usado.',
+                hint="Use {% static '" + nome.strip() + "' %}.",
+                id='core.W001',
+            ))
+        for nome in set(_STATIC_TAG.findall(texto)):
+            if finders.find(nome) is None:
+                problemas.append(Error(
+                    f"{template}: {{% static '{nome}' %}} não existe nos diretórios de estáticos.",
+                    hint='Com o ManifestStaticFilesStorage essa página falha ao renderizar.',
+                    id='core.E001',
+                ))
+    return problemas
@@ -0,0 +1,234 @@
+"""Instrumentação por requisição: tempo, queries, templates e tamanho da resposta.
+
+`MetricasMiddleware` mede cada requisição e agrega os números por nome de view
+em memória (por processo). As queries são observadas com
+`connection.execute_wrapper`; o tempo de template vem do backend
+`TemplatesMedidos` (TEMPLATES['BACKEND']), cujos templates somam o próprio render
+à requisição em andamento. Nada do Django é alterado em tempo de execução: sem
+esse backend a requisição só fica sem o tempo de template. Queries com o mesmo formato (SQL com
+os parâmetros ainda como %s) repetidas muitas vezes na mesma requisição são
+marcadas como suspeitas de N+1.
+
+Os agregados ficam em /metricas/ (somente staff). Com METRICAS_SERVER_TIMING a
+resposta também leva um header Server-Timing, visível no devtools do navegador.
+"""
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template as TemplateDjango, reraise
+
+logger = logging.getLogger(__name__)
+
+LIMITES_TEMPO_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+LIMITES_QUERIES = [1, 2, 5, 10, 20, 50, 100, 200]
+
+_coleta = ContextVar('metricas_coleta', default=None)
+
+
+class Coleta:
+    """Numbers of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+        self.formatos = Counter()
+
+
+def formato_sql(sql):
+    """Normalize a SQL statement to its shape: IN lists and literals collapsed."""
+    sql = re.sub(r'IN \((?:%s, )*%s\)', 'IN (...)', sql)
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    return re.sub(r'\b\d+\b', '?', sql)
+
+
+def _observar_query(execute, sql, params, many, context):
+    coleta = _coleta.get()
+    if coleta is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        coleta.tempo_db += time.perf_counter() - inicio
+        coleta.queries += 1
+        coleta.formatos[formato_sql(sql)] += 1
+
+
+class TemplateMedido(TemplateDjango):
+    def render(self, context=None, request=None):
+        coleta = _coleta.get()
+        if coleta is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            coleta.tempo_template += time.perf_counter() - inicio
+
+
+class TemplatesMedidos(DjangoTemplates):
+    """DjangoTemplates whose templates add their render time to the current request's Coleta.
+
+    Only top-level renders pass through the backend ({% include %} and {% extends %}
+    stay inside the engine), so nested templates are not counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateMedido(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+
+    def adicionar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+
+    def como_dict(self):
+        rotulos = [f'<={limite}' for limite in self.limites] + [f'>{self.limites[-1]}']
+        return dict(zip(rotulos, self.contagens))
+
+
+class MetricasView:
+    """Aggregated numbers of one view name."""
+
+    def __init__(self):
+        self.requisicoes = 0
+        self.tempo_total = 0.0
+        self.tempo_max = 0.0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+        self.queries = 0
+        self.queries_max = 0
+        self.bytes = 0
+        self.histograma_tempo = Histograma(LIMITES_TEMPO_MS)
+        self.histograma_queries = Histograma(LIMITES_QUERIES)
+        self.n_mais_1 = Counter()
+
+    def adicionar(self, tempo_ms, coleta, tamanho, repetidas):
+        self.requisicoes += 1
+        self.tempo_total += tempo_ms
+        self.tempo_max = max(self.tempo_max, tempo_ms)
+        self.tempo_db += coleta.tempo_db * 1000
+        self.tempo_template += coleta.tempo_template * 1000
+        self.queries += coleta.queries
+        self.queries_max = max(self.queries_max, coleta.queries)
+        self.bytes += tamanho or 0
+        self.histograma_tempo.adicionar(tempo_ms)
+        self.histograma_queries.adicionar(coleta.queries)
+        for formato in repetidas:
+            self.n_mais_1[formato] += 1
+
+    def como_dict(self):
+        n = self.requisicoes or 1
+        return {
+            'requisicoes': self.requisicoes,
+            'tempo_total_ms': round(self.tempo_total, 1),
+            'tempo_medio_ms': round(self.tempo_total / n, 2),
+            'tempo_max_ms': round(self.tempo_max, 2),
+            'tempo_db_medio_ms': round(self.tempo_db / n, 2),
+            'tempo_template_medio_ms': round(self.tempo_template / n, 2),
+            'queries_media': round(self.queries / n, 1),
+            'queries_max': self.queries_max,
+            'bytes_medio': round(self.bytes / n),
+            'histograma_tempo_ms': self.histograma_tempo.como_dict(),
+            'histograma_queries': self.histograma_queries.como_dict(),
+            'n_mais_1': [{'sql': sql, 'requisicoes': total} for sql, total in self.n_mais_1.most_common(5)],
+        }
+
+
+class Registro:
+    """Per-process store of MetricasView by view name."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._views = {}
+
+    def adicionar(self, view, tempo_ms, coleta, tamanho, repetidas):
+        with self._lock:
+            self._views.setdefault(view, MetricasView()).adicionar(tempo_ms, coleta, tamanho, repetidas)
+
+    def como_dict(self):
+        with self._lock:
+            views = {nome: metricas.como_dict() for nome, metricas in self._views.items()}
+        return dict(sorted(views.items(), key=lambda item: item[1]['tempo_total_ms'], reverse=True))
+
+    def zerar(self):
+        with self._lock:
+            self._views.clear()
+
+
+registro = Registro()
+
+
+def _nome_view(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'sem_rota'
+    if match.url_name:
+        return match.view_name
+    # Rota sem name: o caminho da view (ou da classe, nas views baseadas em classe)
+    view = getattr(match.func, 'view_class', match.func)
+    return f'{view.__module__}.{getattr(view, "__qualname__", type(view).__qualname__)}'
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limite_n_mais_1 = getattr(settings, 'METRICAS_N_MAIS_1', 5)
+        self.server_timing = getattr(settings, 'METRICAS_SERVER_TIMING', False)
+
+    def __call__(self, request):
+        coleta = Coleta()
+        token = _coleta.set(coleta)
+        inicio = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(_observar_query):
+                response = self.get_response(request)
+        finally:
+            _coleta.reset(token)
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+
+        view = _nome_view(request)
+        repetidas = [formato for formato, vezes in coleta.formatos.items() if vezes >= self.limite_n_mais_1]
+        for formato in repetidas:
+            logger.warning('Possível N+1 em %s: %d× %s', view, coleta.formatos[formato], formato[:200])
+
+        # Respostas em streaming não têm tamanho conhecido aqui (e as queries feitas
+        # durante o streaming, depois do middleware, não entram na contagem)
+        tamanho = None if response.streaming else len(response.content)
+        registro.adicionar(view, tempo_ms, coleta, tamanho, repetidas)
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={tempo_ms:.1f}',
+                f'db;dur={coleta.tempo_db * 1000:.1f};desc="{coleta.queries} queries"',
+                f'tpl;dur={coleta.tempo_template * 1000:.1f}',
+            ])
+        return response
+
+
+@staff_member_required
+def metricas(request):
+    """Aggregated metrics as JSON; POST resets them."""
+    if request.method == 'POST':
+        registro.zerar()
+    return JsonResponse({'views': registro.como_dict()}, json_dumps_params={'ensure_ascii': False, 'indent': 2})
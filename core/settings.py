@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+
+from .database import configurar_banco
 # MESSAGES
 from django.contrib.messages import constants
 
@@ -48,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'core',
     'perfil',
     'extrato',
     'planejamento',
@@ -56,6 +59,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.estaticos.CacheEstaticosMiddleware',
+    'core.metricas.MetricasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,12 +71,22 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'core.urls'
 
+# Em produção os templates compilados ficam em memória (cached loader): sem ler e
+# compilar o arquivo a cada include. Em desenvolvimento cada render relê o arquivo
+TEMPLATES_EM_CACHE = os.environ.get('TEMPLATES_EM_CACHE', '0' if DEBUG else '1') == '1'
+TEMPLATES_LOADERS_BASE = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com o tempo de render medido por requisição (core.metricas)
+        'BACKEND': 'core.metricas.TemplatesMedidos',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATES_LOADERS_BASE)] if TEMPLATES_EM_CACHE else TEMPLATES_LOADERS_BASE,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -88,11 +103,9 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite com WAL/PRAGMAs e conexões persistentes, ou PostgreSQL (DB_ENGINE=postgres); ver core/database.py
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': str(BASE_DIR / 'db.sqlite3'),
-    }
+    'default': configurar_banco(BASE_DIR),
 }
 
 
@@ -134,12 +147,62 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (
     os.path.join(BASE_DIR, 'templates/static'),
     os.path.join(BASE_DIR, 'static'),
+    ('styles', os.path.join(BASE_DIR, 'styles')),
+    ('scripts', os.path.join(BASE_DIR, 'scripts')),
 )
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic grava os arquivos com hash do conteúdo no nome (manifest) e versões .gz/.br
+# (core.estaticos). Em desenvolvimento fica o storage simples, sem precisar do collectstatic
+STATICFILES_MANIFEST = os.environ.get('STATICFILES_MANIFEST', '0' if DEBUG else '1') == '1'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'core.estaticos.ArmazenamentoEstatico' if STATICFILES_MANIFEST
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Sem nginx na frente: o Django serve o STATIC_ROOT (com os pré-comprimidos) em STATIC_URL
+SERVIR_ESTATICOS = os.environ.get('SERVIR_ESTATICOS') == '1'
+# Arquivos com hash no nome ficam em cache no navegador por um ano (core.estaticos.CacheEstaticosMiddleware)
+ESTATICOS_MAX_AGE = 365 * 24 * 60 * 60
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Relatórios PDF: threads do processo web que consomem a fila local (0 = só o comando processar_relatorios)
+RELATORIOS_PDF_WORKERS = int(os.environ.get('RELATORIOS_PDF_WORKERS', 2))
+# Pedido parado há mais que isso (processo reiniciado ou morto no meio) volta para a fila
+RELATORIOS_PDF_TIMEOUT = int(os.environ.get('RELATORIOS_PDF_TIMEOUT', 10 * 60))
+
+# Cache (dashboard por usuário). locmem só é coerente com um único processo;
+# com vários workers use CACHE_BACKEND=file ou db (python manage.py createcachetable)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'numus',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'numus_cache'),
+    },
+}
+CACHES = {
+    'default': {**CACHE_BACKENDS[CACHE_BACKEND], 'TIMEOUT': 60 * 60},
+    # Fragmentos de template ({% cache ... using='fragmentos' %}, ex.: a sidebar)
+    'fragmentos': {**CACHE_BACKENDS[CACHE_BACKEND], 'TIMEOUT': 60 * 60, 'KEY_PREFIX': 'fragmentos'},
+}
+
+# Métricas por view (core.metricas): agregados em /metricas/ (staff)
+# Uma query com o mesmo formato repetida METRICAS_N_MAIS_1 vezes na requisição é marcada como N+1
+METRICAS_N_MAIS_1 = int(os.environ.get('METRICAS_N_MAIS_1', 5))
+METRICAS_SERVER_TIMING = DEBUG or os.environ.get('METRICAS_SERVER_TIMING') == '1'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
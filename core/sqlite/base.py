@@ -0,0 +1,15 @@
+"""Backend sqlite3 do Django com modo de transação configurável.
+
+Com TRANSACTION_MODE = 'IMMEDIATE' (ver core.database) todo atomic() começa com
+BEGIN IMMEDIATE: o lock de escrita é pego no início da transação, e o
+busy_timeout consegue esperar por ele. Com o BEGIN padrão (DEFERRED) uma
+transação que lê e depois escreve falha na hora com "database is locked" se
+outro escritor chegou antes, sem esperar o timeout.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        modo = self.settings_dict.get('TRANSACTION_MODE')
+        self.cursor().execute(f'BEGIN {modo}' if modo else 'BEGIN')
@@ -0,0 +1,150 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.http import HttpResponse
+from django.template import engines
+from django.template.backends.django import Template as TemplateDjango
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import ResolverMatch
+
+from extrato.models import Valores
+from perfil.models import Categorias, Conta
+from .dados_de_teste import DadosBasicos
+from .dinheiro import Soma, centavos, para_centavos, para_decimal
+from .metricas import MetricasMiddleware, TemplateMedido, _nome_view, registro
+
+
+class ParaDecimalTests(TestCase):
+    def test_arredonda_meio_para_cima(self):
+        self.assertEqual(para_decimal('2.675'), Decimal('2.68'))
+        self.assertEqual(para_decimal('2.665'), Decimal('2.67'))
+        self.assertEqual(para_decimal('-0.005'), Decimal('-0.01'))
+
+    def test_float_sem_erro_binario(self):
+        # 2.675 em binário é 2.67499999...; o repr preserva o valor digitado
+        self.assertEqual(para_decimal(2.675), Decimal('2.68'))
+        self.assertEqual(para_decimal(0.1 + 0.2), Decimal('0.30'))
+
+    def test_virgula_decimal_e_inteiros(self):
+        self.assertEqual(para_decimal(' 12,5 '), Decimal('12.50'))
+        self.assertEqual(para_decimal(7), Decimal('7.00'))
+
+    def test_valor_invalido(self):
+        for invalido in ('abc', '', None, '1.2.3'):
+            with self.assertRaises(ValueError):
+                para_decimal(invalido)
+
+    def test_para_centavos(self):
+        self.assertEqual(para_centavos('1234.565'), 123457)
+        self.assertEqual(para_centavos(Decimal('0.1')), 10)
+
+
+class CentavosFieldTests(DadosBasicos, TestCase):
+    saldo_conta = '10,10'
+
+    def _coluna(self, tabela, id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT valor FROM {tabela} WHERE id = %s', [id])
+            return cursor.fetchone()[0]
+
+    def test_ida_e_volta(self):
+        self.assertEqual(self._coluna('perfil_conta', self.conta.id), 1010)
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.valor, Decimal('10.10'))
+        self.assertIsInstance(self.conta.valor, Decimal)
+
+    def test_soma_exata(self):
+        for valor in (0.1, 0.2, '0.30', Decimal('1234567.89')):
+            Valores.objects.create(user=self.user, valor=valor, categoria=self.categoria, descricao='x', data=date(2024, 1, 1), conta=self.conta, tipo='S')
+        total = Valores.objects.filter(user=self.user).aggregate(total=Soma('valor'))['total']
+        self.assertEqual(total, Decimal('1234568.49'))
+
+    def test_soma_vazia_usa_default(self):
+        vazio = Valores.objects.none().aggregate(total=Soma('valor', default=0))['total']
+        self.assertEqual(vazio, Decimal('0.00'))
+
+    def test_centavos_em_expressao(self):
+        # Sem centavos() a constante seria somada como se fosse centavos
+        Conta.objects.filter(id=self.conta.id).update(valor=F('valor') + centavos('0.015'))
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.valor, Decimal('10.12'))
+
+    def test_filtro_compara_em_centavos(self):
+        self.assertTrue(Conta.objects.filter(id=self.conta.id, valor=Decimal('10.1')).exists())
+        self.assertTrue(Conta.objects.filter(id=self.conta.id, valor__gt='10.09').exists())
+
+
+class MigracaoCentavosTests(TransactionTestCase):
+    """The *_centavos migrations turn existing float (reais) columns into integer cents."""
+
+    antes = [('perfil', '0011_conta_saldo_inicial'), ('extrato', '0007_valores_fts'), ('contas', '0002_vencimentos')]
+    depois = [('perfil', '0012_centavos'), ('extrato', '0008_centavos'), ('contas', '0003_centavos')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def _migrar(self, alvos):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(alvos)
+        return executor.loader.project_state(alvos).apps
+
+    def test_converte_valores_existentes(self):
+        apps = self._migrar(self.antes)
+        user = apps.get_model('auth', 'User').objects.create(username='migracao')
+        conta = apps.get_model('perfil', 'Conta').objects.create(user_id=user.id, apelido='C', banco='NU', tipo='pf', valor=1234.57, saldo_inicial=0.29)
+        categoria = apps.get_model('perfil', 'Categorias').objects.create(user_id=user.id, categoria='M', valor_planejado=99.99)
+        valor = apps.get_model('extrato', 'Valores').objects.create(
+            user_id=user.id, valor=0.1 + 0.2, categoria_id=categoria.id, descricao='x', data=date(2024, 1, 1), conta_id=conta.id, tipo='S',
+        )
+
+        self._migrar(self.depois)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT valor, saldo_inicial FROM perfil_conta WHERE id = %s', [conta.id])
+            self.assertEqual(cursor.fetchone(), (123457, 29))
+        self.assertEqual(Valores.objects.get(id=valor.id).valor, Decimal('0.30'))
+        self.assertEqual(Categorias.objects.get(id=categoria.id).valor_planejado, Decimal('99.99'))
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        registro.zerar()
+        self.addCleanup(registro.zerar)
+
+    def view(self, request):
+        User.objects.count()
+        return HttpResponse(engines['django'].from_string('{% for i in numeros %}{{ i }}{% endfor %}').render({'numeros': range(50)}, request))
+
+    @override_settings(METRICAS_SERVER_TIMING=True)
+    def test_mede_queries_e_templates_sem_alterar_o_django(self):
+        render = TemplateDjango.__dict__['render']
+        middleware = MetricasMiddleware(self.view)
+        MetricasMiddleware(self.view)
+        self.assertIs(TemplateDjango.__dict__['render'], render)
+        self.assertIsInstance(engines['django'].from_string(''), TemplateMedido)
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        resposta = middleware(request)
+        metricas = registro.como_dict()['sem_rota']
+        self.assertEqual(metricas['requisicoes'], 1)
+        self.assertEqual(metricas['queries_max'], 1)
+        self.assertGreater(metricas['tempo_template_medio_ms'], 0)
+        self.assertIn('tpl;dur=', resposta['Server-Timing'])
+
+    def test_render_fora_de_requisicao_nao_e_medido(self):
+        self.assertEqual(engines['django'].from_string('{{ x }}').render({'x': 1}), '1')
+        self.assertEqual(registro.como_dict(), {})
+
+    def test_nome_da_view_sem_rota_nomeada(self):
+        request = RequestFactory().get('/')
+        self.assertEqual(_nome_view(request), 'sem_rota')
+        request.resolver_match = ResolverMatch(self.view, (), {})
+        self.assertEqual(_nome_view(request), 'core.tests.MetricasTests.view')
+        request.resolver_match = ResolverMatch(self.view, (), {}, url_name='painel', namespaces=['admin'])
+        self.assertEqual(_nome_view(request), 'admin:painel')
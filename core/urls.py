@@ -1,15 +1,21 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
+from .estaticos import estatico
+from .metricas import metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metricas/', metricas, name='metricas'),
     path('perfil/', include('perfil.urls')),
     path('extrato/', include('extrato.urls')),
     path('planejamento/', include('planejamento.urls')),
     path('contas/', include('contas.urls')),
     path('', TemplateView.as_view(template_name='index.html'), name='landing'),
     
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if settings.SERVIR_ESTATICOS:
+    urlpatterns.append(re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), estatico))
\ No newline at end of file
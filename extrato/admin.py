@@ -1,4 +1,48 @@
 from django.contrib import admin
-from .models import  Valores
+from .models import  Valores, ResumoMensal
+from django.db import transaction
+from . import categorizacao, resumo, saldos
+from perfil.cache import invalidar_dados
 
-admin.site.register(Valores)
\ No newline at end of file
+
+@admin.register(Valores)
+class ValoresAdmin(admin.ModelAdmin):
+    # Mantém o ResumoMensal, os saldos das contas e o modelo de categorias em dia também para edições feitas pelo admin
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        antigo = Valores.objects.get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        if antigo is None:
+            resumo.registrar(obj)
+            saldos.aplicar({obj.conta_id: saldos.delta(obj)})
+            categorizacao.aprender([obj])
+        else:
+            resumo.atualizar(antigo, obj)
+            saldos.atualizar(antigo, obj)
+            categorizacao.atualizar(antigo, obj)
+            invalidar_dados(antigo.user_id)
+        invalidar_dados(obj.user_id)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        resumo.remover(obj)
+        saldos.remover(obj)
+        categorizacao.esquecer([obj])
+        super().delete_model(request, obj)
+        invalidar_dados(obj.user_id)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        resumo.remover_queryset(queryset)
+        saldos.remover_queryset(queryset)
+        categorizacao.esquecer_queryset(queryset)
+        users = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in users:
+            invalidar_dados(user_id)
+
+
+@admin.register(ResumoMensal)
+class ResumoMensalAdmin(admin.ModelAdmin):
+    list_display = ('user', 'mes', 'categoria', 'tipo', 'total', 'quantidade')
+    list_filter = ('tipo',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ExtratoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'extrato'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,120 @@
+"""Busca textual em Valores.descricao com um índice FTS5 do SQLite.
+
+A tabela virtual `extrato_valores_fts` (criada na migration 0007, com a coluna
+`usuario` desde a 0010) guarda a descrição e o dono de cada Valores com
+rowid = Valores.id. Ela é mantida pelos sinais de Valores (extrato.signals);
+inserções em lote sem sinais, como a importação de extratos, chamam `indexar`
+explicitamente. Cada palavra digitada vira um prefixo ("merc" encontra
+"Mercado"), sem diferenciar acentos e maiúsculas. O usuário entra no próprio
+MATCH (`usuario : "42"`), então o FTS só devolve as linhas de quem pesquisa.
+
+Em bancos sem FTS5 (ou antes da migration) a busca cai para icontains. Um
+resultado negativo é verificado de novo a cada VERIFICAR_DE_NOVO segundos, e
+um migrate no mesmo processo (post_migrate) descarta o que foi verificado.
+"""
+import re
+import time
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+TABELA = 'extrato_valores_fts'
+VERIFICAR_DE_NOVO = 60
+
+_disponivel = {}
+
+
+def disponivel():
+    """Whether the FTS index exists on the current database."""
+    chave = connection.settings_dict['NAME']
+    existe, verificado_em = _disponivel.get(chave, (None, 0.0))
+    if existe is None or (not existe and time.monotonic() - verificado_em > VERIFICAR_DE_NOVO):
+        existe = connection.vendor == 'sqlite' and TABELA in connection.introspection.table_names()
+        _disponivel[chave] = (existe, time.monotonic())
+    return existe
+
+
+def redefinir(**kwargs):
+    """Forget the cached availability (connected to post_migrate)."""
+    _disponivel.clear()
+
+
+def consulta_fts(texto, user=None):
+    """Turn free text into an FTS5 query: every word as a prefix, all required, optionally only `user`'s rows."""
+    palavras = re.findall(r'\w+', texto or '')
+    if not palavras:
+        return ''
+    consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+    if user is None:
+        return consulta
+    return f'descricao : ({consulta}) AND usuario : "{getattr(user, "pk", user)}"'
+
+
+def filtrar(valores, texto, user=None):
+    """Restrict a Valores queryset to rows whose descricao matches `texto`.
+
+    Pass the `user` the queryset belongs to so the FTS lookup only scans that user's rows.
+    """
+    consulta = consulta_fts(texto, user)
+    if not consulta:
+        return valores
+    if not disponivel():
+        return valores.filter(descricao__icontains=texto)
+    return valores.filter(id__in=RawSQL(f'SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH %s', [consulta]))
+
+
+def com_relevancia(valores, texto, user=None):
+    """filtrar() plus a `relevancia` annotation (bm25, lower is better), ordered by it."""
+    consulta = consulta_fts(texto, user)
+    if not consulta or not disponivel():
+        return filtrar(valores, texto, user)
+    # Peso 0 para a coluna usuario: só a descrição conta na relevância
+    relevancia = RawSQL(
+        f'SELECT bm25({TABELA}, 1.0, 0.0) FROM {TABELA} WHERE {TABELA} MATCH %s AND rowid = extrato_valores.id', [consulta],
+    )
+    return filtrar(valores, texto, user).annotate(relevancia=relevancia).order_by('relevancia', '-data', '-id')
+
+
+def indexar(valores):
+    """Add or refresh the index entries of saved Valores instances."""
+    linhas = [(valor.id, valor.descricao or '', str(valor.user_id or '')) for valor in valores if valor.id is not None]
+    if not linhas or not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABELA} WHERE rowid = %s', [(id,) for id, _, _ in linhas])
+        cursor.executemany(f'INSERT INTO {TABELA}(rowid, descricao, usuario) VALUES (%s, %s, %s)', linhas)
+
+
+def remover(ids):
+    ids = list(ids)
+    if not ids or not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABELA} WHERE rowid = %s', [(id,) for id in ids])
+
+
+def remover_do_usuario(user):
+    """Drop every index entry of `user` in one statement (for bulk deletes that skip the signals)."""
+    if not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABELA} WHERE rowid IN (SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH %s)',
+            [f'usuario : "{getattr(user, "pk", user)}"'],
+        )
+
+
+def reindexar(user=None):
+    """Rebuild the index from Valores, for every user or only for `user` (set-based)."""
+    if not disponivel():
+        return
+    filtro, params = ('WHERE user_id = %s', [getattr(user, 'pk', user)]) if user is not None else ('', [])
+    with connection.cursor() as cursor:
+        if user is None:
+            cursor.execute(f'DELETE FROM {TABELA}')
+        else:
+            cursor.execute(f'DELETE FROM {TABELA} WHERE rowid IN (SELECT id FROM extrato_valores {filtro})', params)
+        cursor.execute(
+            f"INSERT INTO {TABELA}(rowid, descricao, usuario) SELECT id, descricao, COALESCE(user_id, '') FROM extrato_valores {filtro}",
+            params,
+        )
@@ -0,0 +1,204 @@
+"""Categorização automática de movimentações pela descrição (naive Bayes).
+
+O modelo de cada usuário é a tabela TokenCategoria: para cada categoria, em
+quantas descrições já categorizadas aparece cada palavra, mais o total de
+descrições da categoria no token '#'. Ele é atualizado com deltas (um único
+upsert) a cada movimentação gravada, editada ou removida, sem retreino;
+`python manage.py treinar_categorias` o recalcula a partir de Valores.
+
+Sugerir uma categoria lê só as linhas das palavras da descrição (uma consulta
+pelo índice único user/token/categoria), então o custo não cresce com o
+histórico. Com `UserProfile.auto_categoria` ligado, as movimentações sem
+categoria recebem a sugerida quando a probabilidade passa de CONFIANCA_MINIMA.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from perfil.cache import obter_perfil
+from perfil.models import Categorias
+
+from .models import TokenCategoria, Valores
+
+DOCUMENTOS = '#'
+MAXIMO_TOKENS = 12
+TAMANHO_TOKEN = 40
+SUAVIZACAO = 0.5
+CONFIANCA_MINIMA = 0.6
+
+
+def tokens(descricao):
+    """Distinct normalized words of a description (lowercase, no accents, no numbers)."""
+    texto = unicodedata.normalize('NFKD', (descricao or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    vistos = []
+    for palavra in re.findall(r'\w+', texto):
+        # Números (datas, parcelas, códigos de autorização) não ajudam a separar categorias
+        if len(palavra) < 2 or palavra.isdigit():
+            continue
+        palavra = palavra[:TAMANHO_TOKEN]
+        if palavra not in vistos:
+            vistos.append(palavra)
+            if len(vistos) == MAXIMO_TOKENS:
+                break
+    return vistos
+
+
+def contar(linhas, sinal=1):
+    """Count deltas {(user_id, token, categoria_id): n} from (user_id, categoria_id, descricao) rows."""
+    deltas = Counter()
+    for user_id, categoria_id, descricao in linhas:
+        if user_id is None or categoria_id is None:
+            continue
+        for token in (DOCUMENTOS, *tokens(descricao)):
+            deltas[(user_id, token, categoria_id)] += sinal
+    return deltas
+
+
+def _linhas(valores):
+    """(user_id, categoria_id, descricao) of the Valores whose categoria belongs to the same user."""
+    linhas = [
+        (valor.user_id, valor.categoria_id, valor.descricao)
+        for valor in valores
+        if valor.user_id is not None and valor.categoria_id is not None
+    ]
+    if not linhas:
+        return []
+    # Mesmo critério de retreinar (categoria__user=F('user')): uma consulta para todas as linhas
+    donos = dict(Categorias.objects.filter(id__in={categoria_id for _, categoria_id, _ in linhas}).values_list('id', 'user_id'))
+    return [linha for linha in linhas if donos.get(linha[1]) == linha[0]]
+
+
+def aplicar_deltas(deltas):
+    """Apply {(user_id, token, categoria_id): n} to TokenCategoria with a single upsert."""
+    linhas = [(user_id, token, categoria_id, quantidade) for (user_id, token, categoria_id), quantidade in deltas.items() if quantidade]
+    if not linhas:
+        return
+    tabela = connection.ops.quote_name(TokenCategoria._meta.db_table)
+    # ON CONFLICT soma no próprio banco: duas requisições ao mesmo tempo não perdem contagens
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {tabela} (user_id, token, categoria_id, quantidade) VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (user_id, token, categoria_id) DO UPDATE SET quantidade = {tabela}.quantidade + excluded.quantidade',
+            linhas,
+        )
+    removidos = {user_id for user_id, _, _, quantidade in linhas if quantidade < 0}
+    if removidos:
+        TokenCategoria.objects.filter(user_id__in=removidos, quantidade__lte=0).delete()
+
+
+def aprender(valores):
+    """Add saved Valores instances (the categorized ones) to their users' models."""
+    aplicar_deltas(contar(_linhas(valores)))
+
+
+def esquecer(valores):
+    """Remove Valores instances (about to be or already deleted) from the models."""
+    aplicar_deltas(contar(_linhas(valores), sinal=-1))
+
+
+def atualizar(antigo, novo):
+    """Move an edited Valores row from its previous description/category to the new one."""
+    deltas = contar(_linhas([antigo]), sinal=-1)
+    deltas.update(contar(_linhas([novo])))
+    aplicar_deltas(deltas)
+
+
+def esquecer_queryset(valores):
+    """esquecer() for every row of a Valores queryset, reading only the needed columns."""
+    linhas = valores.filter(categoria__user=F('user')).values_list('user_id', 'categoria_id', 'descricao')
+    aplicar_deltas(contar(linhas.iterator(), sinal=-1))
+
+
+def _probabilidades(contagens, palavras):
+    """{categoria_id: probability} for the words of one description, or {} if none of them is known."""
+    documentos = contagens.get(DOCUMENTOS, {})
+    conhecidas = [palavra for palavra in palavras if palavra in contagens]
+    if not documentos or not conhecidas:
+        return {}
+
+    total = sum(documentos.values())
+    pontos = {}
+    for categoria_id, quantidade in documentos.items():
+        denominador = quantidade + 2 * SUAVIZACAO
+        pontos[categoria_id] = math.log(quantidade / total) + sum(
+            math.log((contagens[palavra].get(categoria_id, 0) + SUAVIZACAO) / denominador)
+            for palavra in conhecidas
+        )
+    maximo = max(pontos.values())
+    exponenciais = {categoria_id: math.exp(ponto - maximo) for categoria_id, ponto in pontos.items()}
+    soma = sum(exponenciais.values())
+    return {categoria_id: valor / soma for categoria_id, valor in exponenciais.items()}
+
+
+def _contagens(user, palavras):
+    contagens = defaultdict(dict)
+    linhas = TokenCategoria.objects.filter(user=user, token__in=[DOCUMENTOS, *palavras])
+    for token, categoria_id, quantidade in linhas.values_list('token', 'categoria_id', 'quantidade'):
+        contagens[token][categoria_id] = quantidade
+    return contagens
+
+
+def sugerir_lote(user, descricoes):
+    """(categoria_id, probability) of the most likely category of each description, or (None, 0.0).
+
+    All descriptions are answered with a single query.
+    """
+    palavras = [tokens(descricao) for descricao in descricoes]
+    todas = {palavra for lista in palavras for palavra in lista}
+    contagens = _contagens(user, todas) if todas else {}
+    sugestoes = []
+    for lista in palavras:
+        probabilidades = _probabilidades(contagens, lista)
+        if probabilidades:
+            categoria_id = max(probabilidades, key=probabilidades.get)
+            sugestoes.append((categoria_id, probabilidades[categoria_id]))
+        else:
+            sugestoes.append((None, 0.0))
+    return sugestoes
+
+
+def sugerir(user, descricao):
+    return sugerir_lote(user, [descricao])[0]
+
+
+def ativa(user):
+    return obter_perfil(user).auto_categoria
+
+
+def categorizar(user, valores):
+    """Fill in the category of unsaved, uncategorized Valores when auto_categoria is on; returns how many."""
+    sem_categoria = [valor for valor in valores if valor.categoria_id is None]
+    if not sem_categoria or not ativa(user):
+        return 0
+    atribuidas = 0
+    for valor, (categoria_id, probabilidade) in zip(sem_categoria, sugerir_lote(user, [v.descricao for v in sem_categoria])):
+        if categoria_id is not None and probabilidade >= CONFIANCA_MINIMA:
+            valor.categoria_id = categoria_id
+            atribuidas += 1
+    return atribuidas
+
+
+@transaction.atomic
+def retreinar(user=None):
+    """Rebuild the models from Valores, for every user or only for `user`."""
+    modelos = TokenCategoria.objects.all()
+    # O join com Categorias deixa de fora categorias removidas ou de outro usuário (como _linhas)
+    valores = Valores.objects.filter(user__isnull=False, categoria__user=F('user'))
+    if user is not None:
+        modelos = modelos.filter(user=user)
+        valores = valores.filter(user=user)
+
+    modelos.delete()
+    deltas = contar(valores.values_list('user_id', 'categoria_id', 'descricao').iterator())
+    return len(TokenCategoria.objects.bulk_create(
+        [
+            TokenCategoria(user_id=user_id, token=token, categoria_id=categoria_id, quantidade=quantidade)
+            for (user_id, token, categoria_id), quantidade in deltas.items()
+        ],
+        batch_size=1000,
+    ))
@@ -0,0 +1,278 @@
+"""Importação em lote de extratos bancários (CSV e OFX) para Valores.
+
+Os arquivos são lidos de forma incremental e inseridos com bulk_create em lotes.
+Cada lançamento recebe um hash de conteúdo (Valores.hash_conteudo), o que permite
+reimportar o mesmo extrato, ou extratos sobrepostos, sem duplicar movimentações.
+"""
+import codecs
+import csv
+import hashlib
+import io
+import re
+import unicodedata
+from collections import Counter, namedtuple
+from datetime import date, datetime
+from itertools import islice
+
+from django.db import transaction
+
+from core.dinheiro import ZERO, para_decimal
+
+from . import busca, categorizacao, resumo, saldos
+from .models import Valores
+
+Lancamento = namedtuple('Lancamento', ['data', 'valor', 'tipo', 'descricao', 'identificador'])
+
+TAMANHO_LOTE = 500
+
+
+class ErroImportacao(ValueError):
+    pass
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.importados = 0
+        self.duplicados = 0
+        self.categorizados = 0  # categoria sugerida por extrato.categorizacao
+
+
+def _sem_acento(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().strip().lower()
+
+
+def converter_valor(texto):
+    """Parse '1.234,56', '1,234.56', '-12.50' or 'R$ 10,00' into a Decimal."""
+    texto = texto.replace('R$', '').replace(' ', '').strip()
+    if ',' in texto and '.' in texto:
+        if texto.rfind(',') > texto.rfind('.'):
+            texto = texto.replace('.', '').replace(',', '.')
+        else:
+            texto = texto.replace(',', '')
+    elif ',' in texto:
+        texto = texto.replace(',', '.')
+    return para_decimal(texto)
+
+
+def converter_data(texto):
+    """Parse 'YYYY-MM-DD', 'DD/MM/YYYY' or an OFX date ('YYYYMMDD[HHMMSS...]')."""
+    texto = texto.strip()
+    if re.match(r'^\d{8}', texto):
+        return datetime.strptime(texto[:8], '%Y%m%d').date()
+    if '/' in texto:
+        return datetime.strptime(texto, '%d/%m/%Y').date()
+    return date.fromisoformat(texto)
+
+
+def _tipo(texto, valor):
+    if texto:
+        texto = _sem_acento(texto)
+        if texto in ('e', 'entrada', 'credito', 'c', 'credit'):
+            return 'E'
+        if texto in ('s', 'saida', 'debito', 'd', 'debit'):
+            return 'S'
+    return 'S' if valor < 0 else 'E'
+
+
+COLUNAS_CSV = {
+    'data': ('data', 'date', 'data lancamento'),
+    'descricao': ('descricao', 'historico', 'memo', 'description', 'lancamento'),
+    'valor': ('valor', 'amount', 'valor (r$)'),
+    'tipo': ('tipo', 'type'),
+}
+
+
+def _encoding_csv(arquivo, tamanho_amostra=64 * 1024):
+    """'utf-8-sig' if the start of the file is valid UTF-8, otherwise 'cp1252' (Excel and most bank exports)."""
+    if not arquivo.seekable():
+        return 'utf-8-sig'
+    amostra = arquivo.read(tamanho_amostra)
+    arquivo.seek(0)
+    try:
+        # final=False: um caractere cortado no fim da amostra não conta como erro
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+def ler_csv(arquivo, erros=None):
+    """Yield Lancamento rows from a binary CSV file object, one line at a time.
+
+    Columns are matched by name (data, descricao, valor and optionally tipo; accents
+    and case are ignored). Without a tipo column the sign of valor decides E/S.
+    Invalid rows are skipped and described in `erros`. The file may be UTF-8 or
+    cp1252/latin-1; an undecodable file raises ErroImportacao.
+    """
+    encoding = _encoding_csv(arquivo)
+    # cp1252 tem 5 bytes sem caractere: viram U+FFFD em vez de interromper a importação
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, errors='replace' if encoding == 'cp1252' else 'strict', newline='')
+    try:
+        yield from _lancamentos_csv(texto, erros)
+    except UnicodeDecodeError:
+        raise ErroImportacao('Não foi possível ler o arquivo: salve o CSV em UTF-8 ou Windows-1252 (latin-1).')
+
+
+def _lancamentos_csv(texto, erros):
+    amostra = texto.readline()
+    delimitador = max(',;\t', key=amostra.count)
+    leitor = csv.reader(texto, delimiter=delimitador)
+
+    cabecalho = [_sem_acento(coluna) for coluna in next(csv.reader([amostra], delimiter=delimitador), [])]
+    indices = {}
+    for campo, nomes in COLUNAS_CSV.items():
+        for i, coluna in enumerate(cabecalho):
+            if coluna in nomes:
+                indices[campo] = i
+                break
+    faltando = {'data', 'descricao', 'valor'} - set(indices)
+    if faltando:
+        raise ErroImportacao(f'Colunas obrigatórias ausentes no CSV: {", ".join(sorted(faltando))}')
+
+    for numero, linha in enumerate(leitor, start=2):
+        if not any(linha):
+            continue
+        try:
+            valor = converter_valor(linha[indices['valor']])
+            tipo = _tipo(linha[indices['tipo']] if 'tipo' in indices else '', valor)
+            yield Lancamento(
+                data=converter_data(linha[indices['data']]),
+                valor=abs(valor),
+                tipo=tipo,
+                descricao=linha[indices['descricao']].strip(),
+                identificador=None,
+            )
+        except (ValueError, IndexError) as e:
+            if erros is not None:
+                erros.append(f'Linha {numero}: {e}')
+
+
+def _tags_ofx(arquivo, tamanho_bloco=64 * 1024):
+    """Yield (tag, text) pairs from an OFX (SGML or XML) file, reading it in blocks."""
+    inicio = arquivo.read(tamanho_bloco)
+    encoding = 'cp1252' if b'CHARSET:1252' in inicio else 'utf-8'
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    resto = ''
+    bloco = inicio
+    while bloco:
+        resto += decoder.decode(bloco)
+        partes = resto.split('<')
+        resto = partes.pop()
+        for parte in partes:
+            if '>' in parte:
+                tag, _, conteudo = parte.partition('>')
+                yield tag.strip().upper(), conteudo.strip()
+        bloco = arquivo.read(tamanho_bloco)
+
+    resto += decoder.decode(b'', final=True)
+    if '>' in resto:
+        tag, _, conteudo = resto.partition('>')
+        yield tag.strip().upper(), conteudo.strip()
+
+
+def _lancamento_ofx(transacao, erros):
+    try:
+        valor = converter_valor(transacao['TRNAMT'])
+        return Lancamento(
+            data=converter_data(transacao['DTPOSTED']),
+            valor=abs(valor),
+            tipo='S' if valor < 0 else 'E',
+            descricao=transacao.get('MEMO') or transacao.get('NAME') or '',
+            identificador=transacao.get('FITID'),
+        )
+    except (KeyError, ValueError) as e:
+        if erros is not None:
+            erros.append(f'Transação {transacao.get("FITID", "?")}: {e}')
+
+
+def ler_ofx(arquivo, erros=None):
+    """Yield Lancamento rows from the <STMTTRN> blocks of a binary OFX file object."""
+    transacao = None
+    for tag, conteudo in _tags_ofx(arquivo):
+        # Alguns bancos não fecham <STMTTRN>: a próxima transação ou o fim da lista também encerram a atual
+        if tag in ('STMTTRN', '/STMTTRN', '/BANKTRANLIST') and transacao is not None:
+            lancamento = _lancamento_ofx(transacao, erros)
+            if lancamento is not None:
+                yield lancamento
+            transacao = None
+
+        if tag == 'STMTTRN':
+            transacao = {}
+        elif transacao is not None and not tag.startswith('/') and conteudo:
+            transacao[tag] = conteudo
+
+
+def ler_extrato(arquivo, nome, erros=None):
+    """Pick the parser from the file name (.ofx/.qfx or CSV)."""
+    if nome.lower().endswith(('.ofx', '.qfx')):
+        return ler_ofx(arquivo, erros)
+    return ler_csv(arquivo, erros)
+
+
+def hash_lancamento(conta, lancamento, ocorrencia):
+    """Content hash used to detect a transaction that was already imported.
+
+    OFX transactions carry a bank id (FITID); for CSV rows the n-th occurrence of an
+    identical line is part of the hash, so genuine repeated purchases are kept.
+    """
+    marcador = lancamento.identificador or ocorrencia
+    texto = f'{conta.id}|{lancamento.data.isoformat()}|{lancamento.valor:.2f}|{lancamento.tipo}|{lancamento.descricao}|{marcador}'
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+@transaction.atomic
+def importar(user, conta, lancamentos, tamanho_lote=TAMANHO_LOTE):
+    """Insert `lancamentos` into `conta` in batches, skipping already imported ones.
+
+    Each batch costs one duplicate lookup and one bulk INSERT; the rollup gets one
+    update per month/tipo and the account balance a single F() update at the end (extrato.saldos).
+    The new rows are added to the search index (extrato.busca) batch by batch and,
+    with auto_categoria on, get the category suggested by extrato.categorizacao.
+    """
+    resultado = ResultadoImportacao()
+    ocorrencias = Counter()
+    saldo = ZERO
+
+    lancamentos = iter(lancamentos)
+    while True:
+        lote = list(islice(lancamentos, tamanho_lote))
+        if not lote:
+            break
+
+        por_hash = {}
+        for lancamento in lote:
+            base = (lancamento.data, lancamento.valor, lancamento.tipo, lancamento.descricao)
+            ocorrencias[base] += 1
+            por_hash[hash_lancamento(conta, lancamento, ocorrencias[base])] = lancamento
+
+        existentes = set(
+            Valores.objects.filter(user=user, hash_conteudo__in=list(por_hash)).values_list('hash_conteudo', flat=True)
+        )
+        novos = [
+            Valores(
+                user=user,
+                valor=lancamento.valor,
+                descricao=lancamento.descricao,
+                data=lancamento.data,
+                conta=conta,
+                tipo=lancamento.tipo,
+                hash_conteudo=hash_conteudo,
+            )
+            for hash_conteudo, lancamento in por_hash.items()
+            if hash_conteudo not in existentes
+        ]
+        resultado.duplicados += len(lote) - len(novos)
+        resultado.categorizados += categorizacao.categorizar(user, novos)
+
+        Valores.objects.bulk_create(novos, batch_size=tamanho_lote)
+        resumo.registrar_lote(novos)
+        categorizacao.aprender(novos)
+        # bulk_create não dispara sinais: o índice de busca é atualizado aqui
+        busca.indexar(novos)
+        resultado.importados += len(novos)
+        saldo += sum(v.valor if v.tipo == 'E' else -v.valor for v in novos)
+
+    saldos.aplicar({conta.id: saldo})
+
+    return resultado
@@ -0,0 +1,112 @@
+"""Lançamento de várias movimentações de uma vez (formulário em lote e JSON).
+
+Todas as linhas são validadas contra um único conjunto pré-carregado das contas e
+categorias do usuário; se alguma for inválida nada é gravado. As válidas entram
+com um bulk_create dentro de uma transação, o ResumoMensal e o índice de busca são
+atualizados em lote e cada conta recebe um único UPDATE com o delta somado.
+Linhas sem categoria recebem a sugerida por extrato.categorizacao (auto_categoria).
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+
+from core.dinheiro import ZERO, para_decimal
+from perfil.models import Categorias, Conta
+
+from . import busca, categorizacao, resumo, saldos
+from .models import Valores
+
+MAXIMO_LINHAS = 500
+
+
+class ErroLote(ValueError):
+    def __init__(self, erros):
+        super().__init__('; '.join(erros))
+        self.erros = erros
+
+
+def _inteiro(texto):
+    try:
+        return int(texto)
+    except (TypeError, ValueError):
+        return None
+
+
+def validar(user, itens):
+    """Build unsaved Valores from dicts (valor, data, conta, categoria, descricao, tipo).
+
+    Raises ErroLote listing every invalid line (numbered from 1).
+    """
+    if not itens:
+        raise ErroLote(['Nenhuma movimentação informada.'])
+    if len(itens) > MAXIMO_LINHAS:
+        raise ErroLote([f'No máximo {MAXIMO_LINHAS} movimentações por envio.'])
+
+    contas = {conta.id: conta for conta in Conta.objects.filter(user=user)}
+    categorias = {categoria.id: categoria for categoria in Categorias.objects.filter(user=user)}
+
+    valores = []
+    erros = []
+    for numero, item in enumerate(itens, start=1):
+        problemas = []
+        try:
+            valor = para_decimal(item.get('valor'))
+            if valor <= 0:
+                problemas.append('valor deve ser positivo')
+        except ValueError:
+            problemas.append('valor inválido')
+        try:
+            data = date.fromisoformat(str(item.get('data') or ''))
+        except ValueError:
+            problemas.append('data inválida')
+        tipo = item.get('tipo')
+        if tipo not in ('E', 'S'):
+            problemas.append('tipo deve ser E ou S')
+        conta = contas.get(_inteiro(item.get('conta')))
+        if conta is None:
+            problemas.append('conta não encontrada')
+        categoria = None
+        if item.get('categoria') not in (None, ''):
+            categoria = categorias.get(_inteiro(item.get('categoria')))
+            if categoria is None:
+                problemas.append('categoria não encontrada')
+
+        if problemas:
+            erros.append(f'Linha {numero}: {", ".join(problemas)}')
+            continue
+        valores.append(Valores(
+            user=user,
+            valor=valor,
+            categoria=categoria,
+            descricao=(item.get('descricao') or '').strip(),
+            data=data,
+            conta=conta,
+            tipo=tipo,
+        ))
+
+    if erros:
+        raise ErroLote(erros)
+    return valores
+
+
+@transaction.atomic
+def inserir(user, valores):
+    """Insert validated Valores with one bulk INSERT and one balance UPDATE per account."""
+    categorizacao.categorizar(user, valores)
+    Valores.objects.bulk_create(valores)
+    resumo.registrar_lote(valores)
+    categorizacao.aprender(valores)
+    # bulk_create não dispara sinais: o índice de busca é atualizado aqui
+    busca.indexar(valores)
+
+    deltas = defaultdict(lambda: ZERO)
+    for valor in valores:
+        deltas[valor.conta_id] += saldos.delta(valor)
+    saldos.aplicar(deltas, user=user)
+    return len(valores)
+
+
+def lancar(user, itens):
+    """Validate and insert `itens`; returns how many rows were created."""
+    return inserir(user, validar(user, itens))
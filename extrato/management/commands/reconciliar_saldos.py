@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from extrato.saldos import reconciliar
+from perfil.cache import invalidar_dados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula Conta.valor a partir do saldo inicial e dos Valores lançados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username para reconciliar apenas as contas desse usuário.')
+        parser.add_argument('--verificar', action='store_true', help='Apenas conta as divergências, sem corrigir.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["user"]}" não encontrado.')
+
+        divergentes = reconciliar(user, corrigir=not options['verificar'])
+        if options['verificar']:
+            self.stdout.write(f'{divergentes} conta(s) com saldo divergente.')
+        else:
+            if user is not None:
+                invalidar_dados(user)
+            else:
+                cache.clear()
+            self.stdout.write(self.style.SUCCESS(f'{divergentes} conta(s) corrigida(s).'))
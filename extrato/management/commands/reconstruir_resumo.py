@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from extrato.resumo import reconstruir
+from perfil.cache import invalidar_dados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela ResumoMensal a partir de todos os Valores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username para reconstruir apenas o resumo desse usuário.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["user"]}" não encontrado.')
+
+        linhas = reconstruir(user)
+        if user is not None:
+            invalidar_dados(user)
+        else:
+            cache.clear()
+        self.stdout.write(self.style.SUCCESS(f'Resumo mensal reconstruído: {linhas} linhas.'))
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from extrato.categorizacao import retreinar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o modelo de categorização automática (TokenCategoria) a partir de todos os Valores categorizados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username para treinar apenas o modelo desse usuário.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["user"]}" não encontrado.')
+
+        linhas = retreinar(user)
+        self.stdout.write(self.style.SUCCESS(f'Modelo de categorias treinado: {linhas} linhas.'))
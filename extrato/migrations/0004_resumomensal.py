@@ -0,0 +1,49 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def popular_resumo(apps, schema_editor):
+    Valores = apps.get_model('extrato', 'Valores')
+    ResumoMensal = apps.get_model('extrato', 'ResumoMensal')
+    agg = (
+        Valores.objects.filter(user__isnull=False)
+        .annotate(mes=TruncMonth('data'))
+        .values('user_id', 'mes', 'categoria_id', 'tipo')
+        .annotate(total=Sum('valor'), quantidade=Count('id'))
+        .order_by()
+    )
+    ResumoMensal.objects.bulk_create([ResumoMensal(**item) for item in agg], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0009_alter_conta_icone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('extrato', '0003_alter_valores_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('tipo', models.CharField(choices=[('E', 'Entrada'), ('S', 'Saída')], max_length=1)),
+                ('total', models.FloatField(default=0)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumos', to='perfil.categorias')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='resumomensal',
+            constraint=models.UniqueConstraint(fields=('user', 'mes', 'categoria', 'tipo'), name='resumo_mensal_unico'),
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('extrato', '0004_resumomensal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='valores',
+            index=models.Index(fields=['user', 'data', 'tipo'], name='valores_user_data_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='valores',
+            index=models.Index(fields=['user', 'categoria', 'data'], name='valores_user_cat_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='valores',
+            index=models.Index(fields=['user', 'conta', 'data'], name='valores_user_conta_data_idx'),
+        ),
+    ]
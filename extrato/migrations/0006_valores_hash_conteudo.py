@@ -0,0 +1,22 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('extrato', '0005_valores_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valores',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='valores',
+            index=models.Index(fields=['user', 'hash_conteudo'], name='valores_user_hash_idx'),
+        ),
+    ]
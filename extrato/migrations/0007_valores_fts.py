@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def criar_indice(apps, schema_editor):
+    # FTS5 é do SQLite; em outros bancos a busca usa icontains (ver extrato.busca)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS extrato_valores_fts USING fts5("
+            "descricao, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        cursor.execute('INSERT INTO extrato_valores_fts(rowid, descricao) SELECT id, descricao FROM extrato_valores')
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS extrato_valores_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('extrato', '0006_valores_hash_conteudo'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:53
+
+import core.dinheiro
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('extrato', '0007_valores_fts'),
+    ]
+
+    operations = [
+        core.dinheiro.migracao_para_centavos('extrato', 'ResumoMensal', 'total'),
+        core.dinheiro.migracao_para_centavos('extrato', 'Valores', 'valor'),
+        migrations.AlterField(
+            model_name='resumomensal',
+            name='total',
+            field=core.dinheiro.CentavosField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='valores',
+            name='valor',
+            field=core.dinheiro.CentavosField(),
+        ),
+    ]
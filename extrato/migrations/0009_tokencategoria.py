@@ -0,0 +1,82 @@
+# Generated by Django 4.2.5 on 2026-10-18 16:04
+
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+# Cópia do tokenizador de extrato.categorizacao nesta versão: a migration não muda se ele mudar
+DOCUMENTOS = '#'
+MAXIMO_TOKENS = 12
+TAMANHO_TOKEN = 40
+
+
+def _tokens(descricao):
+    texto = unicodedata.normalize('NFKD', (descricao or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    vistos = []
+    for palavra in re.findall(r'\w+', texto):
+        if len(palavra) < 2 or palavra.isdigit():
+            continue
+        palavra = palavra[:TAMANHO_TOKEN]
+        if palavra not in vistos:
+            vistos.append(palavra)
+            if len(vistos) == MAXIMO_TOKENS:
+                break
+    return vistos
+
+
+def _contar(linhas):
+    contagens = Counter()
+    for user_id, categoria_id, descricao in linhas:
+        for token in (DOCUMENTOS, *_tokens(descricao)):
+            contagens[(user_id, token, categoria_id)] += 1
+    return contagens
+
+
+def treinar(apps, schema_editor):
+    Valores = apps.get_model('extrato', 'Valores')
+    TokenCategoria = apps.get_model('extrato', 'TokenCategoria')
+    linhas = (
+        Valores.objects.filter(user__isnull=False, categoria__user=F('user'))
+        .values_list('user_id', 'categoria_id', 'descricao')
+        .iterator()
+    )
+    TokenCategoria.objects.bulk_create(
+        [
+            TokenCategoria(user_id=user_id, token=token, categoria_id=categoria_id, quantidade=quantidade)
+            for (user_id, token, categoria_id), quantidade in _contar(linhas).items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('perfil', '0012_centavos'),
+        ('extrato', '0008_centavos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=40)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='perfil.categorias')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tokencategoria',
+            constraint=models.UniqueConstraint(fields=('user', 'token', 'categoria'), name='token_categoria_unico'),
+        ),
+        migrations.RunPython(treinar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def recriar(colunas, selecao):
+    def executar(apps, schema_editor):
+        # FTS5 é do SQLite; em outros bancos a busca usa icontains (ver extrato.busca)
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS extrato_valores_fts')
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE extrato_valores_fts USING fts5("
+                f"{colunas}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            cursor.execute(f'INSERT INTO extrato_valores_fts(rowid, {colunas}) SELECT id, {selecao} FROM extrato_valores')
+    return executar
+
+
+class Migration(migrations.Migration):
+    """Adds the owner of each row to the FTS index, so MATCH only returns the searching user's rows."""
+
+    dependencies = [
+        ('extrato', '0009_tokencategoria'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            recriar('descricao, usuario', "descricao, COALESCE(user_id, '')"),
+            recriar('descricao', 'descricao'),
+        ),
+    ]
@@ -1,6 +1,22 @@
 from django.db import models
 from perfil.models import Categorias, Conta
 from django.contrib.auth.models import User
+from datetime import date
+
+from core.dinheiro import CentavosField
+
+
+class ValoresQuerySet(models.QuerySet):
+    def do_mes(self, ano, mes):
+        """Filter rows of the given month using a date range, so (user, data, ...) indexes apply."""
+        inicio = date(ano, mes, 1)
+        fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+        return self.filter(data__gte=inicio, data__lt=fim)
+
+    def do_mes_atual(self):
+        hoje = date.today()
+        return self.do_mes(hoje.year, hoje.month)
+
 
 class Valores(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -9,12 +25,57 @@ class Valores(models.Model):
         ('S', 'Saída')
     )
     
-    valor = models.FloatField()
+    valor = CentavosField()
     categoria = models.ForeignKey(Categorias, on_delete=models.DO_NOTHING, blank=True, null=True)
     descricao = models.TextField()
     data = models.DateField()
     conta = models.ForeignKey(Conta, on_delete=models.DO_NOTHING)
     tipo = models.CharField(max_length=1, choices=choice_tipo)
+    hash_conteudo = models.CharField(max_length=64, blank=True, null=True)  # preenchido na importação de extratos
+
+    objects = ValoresQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'data', 'tipo'], name='valores_user_data_tipo_idx'),
+            models.Index(fields=['user', 'categoria', 'data'], name='valores_user_cat_data_idx'),
+            models.Index(fields=['user', 'conta', 'data'], name='valores_user_conta_data_idx'),
+            models.Index(fields=['user', 'hash_conteudo'], name='valores_user_hash_idx'),
+        ]
 
     def __str__(self):
         return self.descricao
+
+
+class ResumoMensal(models.Model):
+    """Totais de Valores por usuário/mês/categoria/tipo, mantidos incrementalmente (ver extrato.resumo)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    mes = models.DateField()  # primeiro dia do mês
+    categoria = models.ForeignKey(Categorias, on_delete=models.CASCADE, blank=True, null=True, related_name='resumos')
+    tipo = models.CharField(max_length=1, choices=Valores.choice_tipo)
+    total = CentavosField(default=0)
+    quantidade = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'mes', 'categoria', 'tipo'], name='resumo_mensal_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.mes:%m/%Y} {self.categoria} {self.tipo}'
+
+
+class TokenCategoria(models.Model):
+    """Quantas descrições de cada categoria têm cada palavra, por usuário (ver extrato.categorizacao)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    token = models.CharField(max_length=40)  # '#' guarda o total de descrições da categoria
+    categoria = models.ForeignKey(Categorias, on_delete=models.CASCADE, related_name='tokens')
+    quantidade = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'token', 'categoria'], name='token_categoria_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.token} {self.categoria}: {self.quantidade}'
@@ -0,0 +1,114 @@
+"""Manutenção incremental da tabela ResumoMensal.
+
+Toda escrita em Valores (criação, edição, remoção) deve passar por aqui para que
+os totais mensais usados pelos dashboards continuem consistentes. Em caso de
+divergência, `python manage.py reconstruir_resumo` recalcula tudo a partir de Valores.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+from core.dinheiro import ZERO, Soma, centavos
+
+from .models import ResumoMensal, Valores
+
+
+def primeiro_dia_do_mes(data):
+    if isinstance(data, str):
+        data = date.fromisoformat(data)
+    return data.replace(day=1)
+
+
+def _chave(valor):
+    return (valor.user_id, primeiro_dia_do_mes(valor.data), valor.categoria_id, valor.tipo)
+
+
+def aplicar_deltas(deltas):
+    """Apply {(user_id, mes, categoria_id, tipo): (total, quantidade)} to the rollup."""
+    for (user_id, mes, categoria_id, tipo), (total, quantidade) in deltas.items():
+        if not total and not quantidade:
+            continue
+
+        linhas = ResumoMensal.objects.filter(user_id=user_id, mes=mes, categoria_id=categoria_id, tipo=tipo)
+        atualizadas = linhas.update(total=F('total') + centavos(total), quantidade=F('quantidade') + quantidade)
+        if atualizadas:
+            continue
+
+        try:
+            with transaction.atomic():
+                ResumoMensal.objects.create(
+                    user_id=user_id,
+                    mes=mes,
+                    categoria_id=categoria_id,
+                    tipo=tipo,
+                    total=total,
+                    quantidade=quantidade,
+                )
+        except IntegrityError:
+            # Outra requisição criou a linha entre o update e o create
+            linhas.update(total=F('total') + centavos(total), quantidade=F('quantidade') + quantidade)
+
+
+def registrar(valor):
+    """Add a saved Valores instance to the rollup."""
+    aplicar_deltas({_chave(valor): (valor.valor, 1)})
+
+
+def remover(valor):
+    """Subtract a Valores instance (about to be or already deleted) from the rollup."""
+    aplicar_deltas({_chave(valor): (-valor.valor, -1)})
+
+
+def atualizar(antigo, novo):
+    """Move an edited Valores row from its previous rollup bucket to the new one."""
+    deltas = defaultdict(lambda: (ZERO, 0))
+    for instancia, sinal in ((antigo, -1), (novo, 1)):
+        total, quantidade = deltas[_chave(instancia)]
+        deltas[_chave(instancia)] = (total + sinal * instancia.valor, quantidade + sinal)
+    aplicar_deltas(deltas)
+
+
+def registrar_lote(valores):
+    """Add many Valores instances (e.g. from bulk_create) with one update per bucket."""
+    deltas = defaultdict(lambda: (ZERO, 0))
+    for valor in valores:
+        total, quantidade = deltas[_chave(valor)]
+        deltas[_chave(valor)] = (total + valor.valor, quantidade + 1)
+    aplicar_deltas(deltas)
+
+
+def _agrupar(valores):
+    return (
+        valores.annotate(mes=TruncMonth('data'))
+        .values('user_id', 'mes', 'categoria_id', 'tipo')
+        .annotate(total=Soma('valor'), quantidade=Count('id'))
+        .order_by()
+    )
+
+
+def remover_queryset(valores):
+    """Subtract every row of a Valores queryset from the rollup using one grouped query."""
+    deltas = {}
+    for item in _agrupar(valores):
+        chave = (item['user_id'], item['mes'], item['categoria_id'], item['tipo'])
+        deltas[chave] = (-item['total'], -item['quantidade'])
+    aplicar_deltas(deltas)
+
+
+@transaction.atomic
+def reconstruir(user=None):
+    """Rebuild the rollup from scratch, for every user or only for `user`."""
+    resumos = ResumoMensal.objects.all()
+    valores = Valores.objects.filter(user__isnull=False)
+    if user is not None:
+        resumos = resumos.filter(user=user)
+        valores = valores.filter(user=user)
+
+    resumos.delete()
+    return len(ResumoMensal.objects.bulk_create(
+        [ResumoMensal(**item) for item in _agrupar(valores)],
+        batch_size=1000,
+    ))
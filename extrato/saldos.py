@@ -0,0 +1,101 @@
+"""Atualização atômica do saldo das contas (Conta.valor) a partir dos Valores.
+
+Os Valores são o razão: Conta.valor = Conta.saldo_inicial + entradas - saídas.
+Em vez de ler a conta, somar em Python e salvar (o que perde atualizações
+concorrentes), cada escrita aplica um delta com F() em um único UPDATE.
+`python manage.py reconciliar_saldos` recalcula todos os saldos a partir do razão.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce
+
+from core.dinheiro import ZERO, CentavosField, Soma, centavos
+from perfil.models import Conta
+from .models import Valores
+
+LIQUIDO = Soma(Case(
+    When(tipo='E', then=F('valor')),
+    When(tipo='S', then=-F('valor')),
+    default=centavos(0),
+    output_field=CentavosField(),
+))
+
+
+def delta(valor):
+    """Signed effect of a Valores row on its account balance."""
+    if valor.tipo == 'E':
+        return valor.valor
+    if valor.tipo == 'S':
+        return -valor.valor
+    return ZERO
+
+
+def aplicar(deltas, user=None):
+    """Apply {conta_id: delta} with one UPDATE per account.
+
+    With `user`, only that user's accounts are touched and Conta.DoesNotExist is
+    raised if one of them is not found, so the surrounding transaction rolls back.
+    """
+    for conta_id, valor in deltas.items():
+        if not valor:
+            continue
+        contas = Conta.objects.filter(id=conta_id)
+        if user is not None:
+            contas = contas.filter(user=user)
+        if not contas.update(valor=F('valor') + centavos(valor)) and user is not None:
+            raise Conta.DoesNotExist(f'Conta {conta_id} não encontrada.')
+
+
+def registrar(valor):
+    """Apply a newly saved Valores row to its account (which must belong to the row's user)."""
+    aplicar({valor.conta_id: delta(valor)}, user=valor.user_id)
+
+
+def remover(valor):
+    aplicar({valor.conta_id: -delta(valor)})
+
+
+def atualizar(antigo, novo):
+    """Move an edited row's effect, including a change of account."""
+    deltas = defaultdict(lambda: ZERO)
+    deltas[antigo.conta_id] -= delta(antigo)
+    deltas[novo.conta_id] += delta(novo)
+    aplicar(deltas)
+
+
+def remover_queryset(valores):
+    """Revert the effect of every row in a Valores queryset, grouped per account."""
+    liquido = valores.order_by().values('conta_id').annotate(total=LIQUIDO)
+    aplicar({item['conta_id']: -item['total'] for item in liquido})
+
+
+def _saldo_esperado():
+    liquido = (
+        Valores.objects.filter(conta=OuterRef('pk'))
+        .order_by()
+        .values('conta')
+        .annotate(total=LIQUIDO)
+        .values('total')
+    )
+    return F('saldo_inicial') + Coalesce(Subquery(liquido), centavos(0), output_field=CentavosField())
+
+
+@transaction.atomic
+def reconciliar(user=None, corrigir=True):
+    """Recompute Conta.valor from the ledger; returns how many accounts were out of sync.
+
+    Divergent accounts are found and fixed with set-based queries (no per-row Python).
+    Balances are integer cents, so any difference is a real divergence.
+    """
+    contas = Conta.objects.all()
+    if user is not None:
+        contas = contas.filter(user=user)
+
+    divergentes = contas.exclude(valor=_saldo_esperado())
+
+    quantidade = divergentes.count()
+    if corrigir and quantidade:
+        Conta.objects.filter(id__in=divergentes.values('id')).update(valor=_saldo_esperado())
+    return quantidade
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import busca
+from .models import Valores
+
+
+# Mantém o índice de busca (extrato.busca) em dia com Valores.descricao
+@receiver(post_save, sender=Valores)
+def indexar_valor(sender, instance, **kwargs):
+    busca.indexar([instance])
+
+
+@receiver(post_delete, sender=Valores)
+def remover_valor(sender, instance, **kwargs):
+    busca.remover([instance.id])
+
+
+# Um migrate pode criar ou remover a tabela FTS: a disponibilidade é verificada de novo
+post_migrate.connect(busca.redefinir, dispatch_uid='extrato_busca_redefinir')
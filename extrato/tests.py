@@ -1,3 +1,383 @@
-from django.test import TestCase
+import copy
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from core.dados_de_teste import DadosBasicos, nova_categoria, nova_conta, novo_usuario
+from . import busca, categorizacao, lote
+from .importacao import ErroImportacao, Lancamento, importar, ler_csv, ler_ofx
+from .models import ResumoMensal, TokenCategoria, Valores
+
+
+class ValoresIndexTests(DadosBasicos, TestCase):
+    """The hot Valores queries must be answered by the composite indexes, not by a scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Valores.objects.bulk_create([
+            Valores(
+                user=cls.user,
+                valor=i,
+                categoria=cls.categoria,
+                descricao=f'valor {i}',
+                data=date(2024, 1 + i % 12, 1 + i % 28),
+                conta=cls.conta,
+                tipo='S' if i % 2 else 'E',
+            )
+            for i in range(200)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsaIndice(self, queryset, indice):
+        plano = queryset.explain()
+        self.assertIn(indice, plano, plano)
+
+    def test_do_mes_usa_intervalo_de_datas(self):
+        sql = str(Valores.objects.do_mes(2024, 12).query)
+        self.assertNotIn('strftime', sql)
+        self.assertEqual(Valores.objects.do_mes(2024, 12).count(), Valores.objects.filter(data__year=2024, data__month=12).count())
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_filtro_mensal_por_tipo_usa_indice(self):
+        queryset = Valores.objects.filter(user=self.user, tipo='S').do_mes(2024, 3)
+        self.assertUsaIndice(queryset, 'valores_user_data_tipo_idx')
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_filtro_por_categoria_usa_indice(self):
+        queryset = Valores.objects.filter(user=self.user, categoria=self.categoria).do_mes(2024, 3)
+        self.assertUsaIndice(queryset, 'valores_user_cat_data_idx')
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_filtro_por_conta_usa_indice(self):
+        queryset = Valores.objects.filter(user=self.user, conta=self.conta).do_mes(2024, 3)
+        self.assertUsaIndice(queryset, 'valores_user_conta_data_idx')
+
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+CHARSET:1252
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105120000[-3:BRT]<TRNAMT>-45.90<FITID>A1<MEMO>Padaria Pão Quente
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>1500.00<FITID>A2<NAME>Salario</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+""".encode('cp1252')
+
+
+class LeituraExtratoTests(TestCase):
+    def test_csv_com_ponto_e_virgula_e_sinal(self):
+        arquivo = io.BytesIO('Data;Histórico;Valor (R$)\n05/01/2024;Mercado;-1.234,56\n06/01/2024;Pix;10,00\n'.encode())
+        self.assertEqual(list(ler_csv(arquivo)), [
+            Lancamento(date(2024, 1, 5), Decimal('1234.56'), 'S', 'Mercado', None),
+            Lancamento(date(2024, 1, 6), Decimal('10.00'), 'E', 'Pix', None),
+        ])
+
+    def test_csv_coluna_tipo_e_linha_invalida(self):
+        arquivo = io.BytesIO(b'data,descricao,valor,tipo\n2024-01-05,Luz,100.00,debito\n2024-13-01,Errada,1,credito\n')
+        erros = []
+        self.assertEqual([l.tipo for l in ler_csv(arquivo, erros)], ['S'])
+        self.assertEqual(len(erros), 1)
+        self.assertIn('Linha 3', erros[0])
+
+    def test_csv_em_cp1252(self):
+        arquivo = io.BytesIO('data;descrição;valor\n05/01/2024;Padaria São João;-12,50\n'.encode('cp1252'))
+        self.assertEqual([l.descricao for l in ler_csv(arquivo)], ['Padaria São João'])
+
+    def test_csv_sem_coluna_obrigatoria(self):
+        with self.assertRaises(ErroImportacao):
+            list(ler_csv(io.BytesIO(b'data,valor\n2024-01-05,1\n')))
+
+    def test_ofx_sgml_sem_fechamento(self):
+        self.assertEqual(list(ler_ofx(io.BytesIO(OFX))), [
+            Lancamento(date(2024, 1, 5), Decimal('45.90'), 'S', 'Padaria Pão Quente', 'A1'),
+            Lancamento(date(2024, 1, 6), Decimal('1500.00'), 'E', 'Salario', 'A2'),
+        ])
+
+
+class ImportacaoTests(DadosBasicos, TestCase):
+    saldo_conta = 100
+
+    def lancamentos(self, quantidade, inicio=0):
+        return [
+            Lancamento(date(2024, 1 + i % 2, 1 + i % 28), Decimal('1.00'), 'S' if i % 3 else 'E', f'compra {i}', None)
+            for i in range(inicio, inicio + quantidade)
+        ]
+
+    def test_reimportar_nao_duplica(self):
+        primeira = importar(self.user, self.conta, self.lancamentos(10))
+        segunda = importar(self.user, self.conta, self.lancamentos(12))
+        self.assertEqual((primeira.importados, primeira.duplicados), (10, 0))
+        self.assertEqual((segunda.importados, segunda.duplicados), (2, 10))
+        self.assertEqual(Valores.objects.filter(user=self.user).count(), 12)
+
+    def test_linhas_identicas_repetidas_sao_mantidas(self):
+        repetida = Lancamento(date(2024, 1, 5), Decimal('5.00'), 'S', 'Cafe', None)
+        self.assertEqual(importar(self.user, self.conta, [repetida, repetida]).importados, 2)
+        self.assertEqual(importar(self.user, self.conta, [repetida, repetida]).duplicados, 2)
+
+    def test_lotes_de_500(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = importar(self.user, self.conta, iter(self.lancamentos(1201)))
+        self.assertEqual(resultado.importados, 1201)
+        # Uma busca de duplicados por lote: 500 + 500 + 201
+        buscas = [q for q in consultas.captured_queries if q['sql'].startswith('SELECT') and 'hash_conteudo' in q['sql']]
+        self.assertEqual(len(buscas), 3)
+
+    def test_resumo_e_saldo_atualizados(self):
+        importar(self.user, self.conta, [
+            Lancamento(date(2024, 1, 5), Decimal('30.10'), 'S', 'Mercado', None),
+            Lancamento(date(2024, 1, 9), Decimal('0.20'), 'S', 'Pao', None),
+            Lancamento(date(2024, 2, 1), Decimal('1000.00'), 'E', 'Salario', None),
+        ])
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.valor, Decimal('1069.70'))
+        resumos = {(r.mes, r.tipo): (r.total, r.quantidade) for r in ResumoMensal.objects.filter(user=self.user)}
+        self.assertEqual(resumos, {
+            (date(2024, 1, 1), 'S'): (Decimal('30.30'), 2),
+            (date(2024, 2, 1), 'E'): (Decimal('1000.00'), 1),
+        })
+
+
+class LoteTests(DadosBasicos, TestCase):
+    saldo_conta = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outro = novo_usuario('outro')
+        cls.poupanca = nova_conta(cls.user, apelido='Poupança')
+        cls.alheia = nova_conta(cls.outro, apelido='Outra')
+
+    def item(self, **campos):
+        return {'valor': '10,00', 'data': '2024-01-05', 'conta': self.conta.id, 'categoria': self.categoria.id, 'descricao': 'feira', 'tipo': 'S', **campos}
+
+    def test_valida_cada_linha(self):
+        itens = [
+            self.item(),
+            self.item(valor='-1', tipo='X'),
+            self.item(data='05/01/2024', conta=self.alheia.id),
+            self.item(categoria='999999'),
+        ]
+        with self.assertRaises(lote.ErroLote) as contexto:
+            lote.lancar(self.user, itens)
+        erros = contexto.exception.erros
+        self.assertEqual([erro.split(':')[0] for erro in erros], ['Linha 2', 'Linha 3', 'Linha 4'])
+        self.assertIn('valor deve ser positivo', erros[0])
+        self.assertIn('tipo deve ser E ou S', erros[0])
+        self.assertIn('conta não encontrada', erros[1])
+        self.assertIn('categoria não encontrada', erros[2])
+        self.assertFalse(Valores.objects.filter(user=self.user).exists())
+
+    def test_limite_de_linhas(self):
+        with self.assertRaises(lote.ErroLote):
+            lote.lancar(self.user, [self.item()] * (lote.MAXIMO_LINHAS + 1))
+
+    def test_falha_desfaz_o_lote_inteiro(self):
+        with mock.patch('extrato.lote.saldos.aplicar', side_effect=RuntimeError('falhou')):
+            with self.assertRaises(RuntimeError):
+                lote.lancar(self.user, [self.item(), self.item(tipo='E')])
+        self.assertFalse(Valores.objects.filter(user=self.user).exists())
+        self.assertFalse(ResumoMensal.objects.filter(user=self.user).exists())
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.valor, Decimal('100.00'))
+
+    def test_resumo_e_saldos(self):
+        itens = [
+            self.item(valor='30.10'),
+            self.item(valor='0.20', data='2024-01-20'),
+            self.item(valor='1000', tipo='E', categoria='', data='2024-02-01'),
+            self.item(valor='50', tipo='E', conta=self.poupanca.id),
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(lote.lancar(self.user, itens), 4)
+        # Um UPDATE de saldo por conta, com os deltas somados
+        updates = [q for q in consultas.captured_queries if q['sql'].startswith('UPDATE "perfil_conta"')]
+        self.assertEqual(len(updates), 2)
+
+        self.conta.refresh_from_db()
+        self.poupanca.refresh_from_db()
+        self.assertEqual(self.conta.valor, Decimal('1069.70'))
+        self.assertEqual(self.poupanca.valor, Decimal('50.00'))
+        resumos = {(r.mes, r.categoria_id, r.tipo): (r.total, r.quantidade) for r in ResumoMensal.objects.filter(user=self.user)}
+        self.assertEqual(resumos, {
+            (date(2024, 1, 1), self.categoria.id, 'S'): (Decimal('30.30'), 2),
+            (date(2024, 2, 1), None, 'E'): (Decimal('1000.00'), 1),
+            (date(2024, 1, 1), self.categoria.id, 'E'): (Decimal('50.00'), 1),
+        })
+
+    def test_json(self):
+        self.client.force_login(self.user)
+        criado = self.client.post('/extrato/lancar_lote/', {'transacoes': [self.item()]}, content_type='application/json')
+        self.assertEqual(criado.status_code, 201)
+        self.assertEqual(criado.json(), {'criados': 1})
+        invalido = self.client.post('/extrato/lancar_lote/', {'transacoes': [self.item(valor='x')]}, content_type='application/json')
+        self.assertEqual(invalido.status_code, 400)
+        self.assertEqual(invalido.json(), {'erros': ['Linha 1: valor inválido']})
+
+
+class BuscaTests(DadosBasicos, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outro = novo_usuario('busca_outro')
+        cls.conta_outro = nova_conta(cls.outro)
+
+    def setUp(self):
+        if not busca.disponivel():
+            self.skipTest('SQLite sem FTS5')
+
+    def criar(self, descricao, user=None, conta=None):
+        return Valores.objects.create(
+            user=user or self.user, valor=1, descricao=descricao, data=date(2024, 1, 5), conta=conta or self.conta, tipo='S',
+        )
+
+    def buscar(self, texto, user=None):
+        user = user or self.user
+        return set(busca.filtrar(Valores.objects.filter(user=user), texto, user).values_list('id', flat=True))
+
+    def indexados(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid, descricao, usuario FROM {busca.TABELA}')
+            return {linha[0]: linha[1:] for linha in cursor.fetchall()}
+
+    def test_insercao_edicao_e_remocao_sincronizam_o_indice(self):
+        valor = self.criar('Supermercado Pão de Açúcar')
+        self.assertEqual(self.indexados()[valor.id], ('Supermercado Pão de Açúcar', str(self.user.id)))
+        self.assertEqual(self.buscar('pao acu'), {valor.id})
+
+        valor.descricao = 'Farmácia'
+        valor.save()
+        self.assertEqual(self.buscar('pao'), set())
+        self.assertEqual(self.buscar('farmacia'), {valor.id})
+
+        id = valor.id
+        valor.delete()
+        self.assertNotIn(id, self.indexados())
+
+    def test_match_restrito_ao_usuario(self):
+        meu = self.criar('Mercado Extra')
+        self.criar('Mercado Extra', user=self.outro, conta=self.conta_outro)
+        self.assertEqual(
+            set(busca.filtrar(Valores.objects.all(), 'mercado', self.user).values_list('id', flat=True)), {meu.id},
+        )
+        self.assertIn('usuario : "', busca.consulta_fts('mercado', self.user))
+
+    def test_relevancia(self):
+        exato = self.criar('uber uber')
+        parcial = self.criar('uber eats restaurante')
+        ordem = list(busca.com_relevancia(Valores.objects.filter(user=self.user), 'uber', self.user).values_list('id', flat=True))
+        self.assertEqual(ordem, [exato.id, parcial.id])
+
+    def test_sem_fts_usa_icontains(self):
+        valor = self.criar('Padaria Central')
+        with mock.patch('extrato.busca.disponivel', return_value=False):
+            self.assertEqual(self.buscar('central'), {valor.id})
+            self.assertNotIn('MATCH', str(busca.filtrar(Valores.objects.all(), 'central', self.user).query))
+
+    def test_disponibilidade_verificada_de_novo(self):
+        busca.redefinir()
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {busca.TABELA} RENAME TO fts_fora')
+            self.assertFalse(busca.disponivel())
+            cursor.execute(f'ALTER TABLE fts_fora RENAME TO {busca.TABELA}')
+        # O negativo fica guardado até passar VERIFICAR_DE_NOVO (ou um post_migrate)
+        self.assertFalse(busca.disponivel())
+        agora = busca.time.monotonic()
+        with mock.patch('extrato.busca.time.monotonic', return_value=agora + busca.VERIFICAR_DE_NOVO + 1):
+            self.assertTrue(busca.disponivel())
+
+
+class CategorizacaoTests(DadosBasicos, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outro = novo_usuario('categorizacao_outro')
+        cls.transporte = nova_categoria(cls.user, 'Transporte')
+        cls.alheia = nova_categoria(cls.outro, 'Alheia')
+
+    def criar(self, descricao, categoria):
+        return Valores.objects.create(
+            user=self.user, valor=1, categoria=categoria, descricao=descricao, data=date(2024, 1, 5), conta=self.conta, tipo='S',
+        )
+
+    def modelo(self):
+        return {
+            (token, categoria_id): quantidade
+            for token, categoria_id, quantidade in TokenCategoria.objects.filter(user=self.user).values_list('token', 'categoria_id', 'quantidade')
+        }
+
+    def test_insercao_edicao_e_remocao(self):
+        feira = self.criar('Feira 12/03 Feira', self.categoria)
+        categorizacao.aprender([feira, self.criar('Feira livre', self.categoria)])
+        self.assertEqual(self.modelo(), {
+            ('#', self.categoria.id): 2, ('feira', self.categoria.id): 2, ('livre', self.categoria.id): 1,
+        })
+
+        antigo = copy.copy(feira)
+        feira.descricao, feira.categoria = 'Uber', self.transporte
+        feira.save()
+        categorizacao.atualizar(antigo, feira)
+        self.assertEqual(self.modelo(), {
+            ('#', self.categoria.id): 1, ('feira', self.categoria.id): 1, ('livre', self.categoria.id): 1,
+            ('#', self.transporte.id): 1, ('uber', self.transporte.id): 1,
+        })
+
+        # Contagens que chegam a zero são apagadas
+        categorizacao.esquecer([feira])
+        feira.delete()
+        self.assertEqual(self.modelo(), {('#', self.categoria.id): 1, ('feira', self.categoria.id): 1, ('livre', self.categoria.id): 1})
+
+    def test_categoria_de_outro_usuario_nao_conta(self):
+        categorizacao.aprender([self.criar('Padaria', self.alheia)])
+        self.assertEqual(TokenCategoria.objects.count(), 0)
+
+    def test_retreinar_reproduz_as_contagens_incrementais(self):
+        valores = [
+            self.criar('Uber viagem', self.transporte),
+            self.criar('Posto Shell', self.transporte),
+            self.criar('Mercado Extra', self.categoria),
+            self.criar('Extra hiper', self.categoria),
+            self.criar('Sem categoria', None),
+            self.criar('Padaria', self.alheia),
+        ]
+        categorizacao.aprender(valores)
+        antigo = copy.copy(valores[3])
+        valores[3].categoria = self.transporte
+        valores[3].save()
+        categorizacao.atualizar(antigo, valores[3])
+        categorizacao.esquecer_queryset(Valores.objects.filter(id=valores[0].id))
+        valores[0].delete()
+
+        incremental = self.modelo()
+        categorizacao.retreinar(self.user)
+        self.assertEqual(self.modelo(), incremental)
+
+    def test_confianca_minima(self):
+        valores = [
+            Valores(user=self.user, valor=1, descricao=descricao, data=date(2024, 1, 5), conta=self.conta, tipo='S')
+            for descricao in ('uber', 'mercado', 'desconhecido')
+        ]
+        sugestoes = [
+            (self.transporte.id, categorizacao.CONFIANCA_MINIMA),
+            (self.categoria.id, categorizacao.CONFIANCA_MINIMA - 0.01),
+            (None, 0.0),
+        ]
+        with mock.patch('extrato.categorizacao.sugerir_lote', return_value=sugestoes):
+            self.assertEqual(categorizacao.categorizar(self.user, valores), 1)
+        self.assertEqual([valor.categoria_id for valor in valores], [self.transporte.id, None, None])
+
+    def test_sugestao_pelas_palavras(self):
+        categorizacao.aprender([self.criar('Uber viagem', self.transporte) for _ in range(3)] + [self.criar('Mercado Extra', self.categoria)])
+        categoria_id, probabilidade = categorizacao.sugerir(self.user, 'UBER *viagem 123')
+        self.assertEqual(categoria_id, self.transporte.id)
+        self.assertGreaterEqual(probabilidade, categorizacao.CONFIANCA_MINIMA)
+        self.assertEqual(categorizacao.sugerir(self.user, 'nada conhecido'), (None, 0.0))
+        with mock.patch('extrato.categorizacao.ativa', return_value=False):
+            self.assertEqual(categorizacao.categorizar(self.user, [Valores(user=self.user, descricao='uber')]), 0)
@@ -4,5 +4,9 @@ from . import views
 urlpatterns = [
     path('novo_valor/', views.novo_valor, name="novo_valor"),
     path('view_extrato/', views.view_extrato, name="view_extrato"),
+    path('importar_extrato/', views.importar_extrato, name="importar_extrato"),
+    path('lancar_lote/', views.lancar_lote, name="lancar_lote"),
+    path('buscar/', views.buscar, name="buscar_valores"),
+    path('sugerir_categoria/', views.sugerir_categoria, name="sugerir_categoria"),
     # path('exportar_pdf/', views.exportar_pdf, name="exportar_pdf"),
 ]
\ No newline at end of file
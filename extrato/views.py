@@ -1,13 +1,20 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, FileResponse, JsonResponse
 from perfil.models import Categorias, Conta
 from .models import Valores
+from . import busca, categorizacao, resumo, saldos
+from django.db import transaction
+from .importacao import importar, ler_extrato, ErroImportacao
+from .lote import ErroLote, lancar
+from perfil.cache import invalidar_dados
+from core.dinheiro import para_decimal
 from django.contrib import messages
 from django.contrib.messages import constants
-from datetime import datetime
 from django.template.loader import render_to_string
 import os
 from django.conf import settings
+from django.contrib.auth.decorators import login_required
+import json
 # from weasyprint import HTML
 from io import BytesIO
 
@@ -26,7 +33,11 @@ def novo_valor(request):
         conta = request.POST.get('conta')
         tipo = request.POST.get('tipo')
 
-        valor = valor.replace(',', '.')
+        try:
+            valor = para_decimal(valor)
+        except ValueError:
+            messages.add_message(request, constants.ERROR, 'Informe um valor válido')
+            return redirect('/extrato/novo_valor')
 
         # Categoria é opcional, apenas atribui se foi selecionada
         valores = Valores(
@@ -38,23 +49,119 @@ def novo_valor(request):
             conta_id=conta,
             tipo=tipo,
         )
+        automatica = categorizacao.categorizar(request.user, [valores])
 
-        valores.save()
-
-        conta = Conta.objects.get(id=conta)
+        # Saldo atualizado com F() no mesmo UPDATE (sem ler a conta); a conta deve ser do usuário
+        try:
+            with transaction.atomic():
+                valores.save()
+                resumo.registrar(valores)
+                saldos.registrar(valores)
+                categorizacao.aprender([valores])
+        except Conta.DoesNotExist:
+            messages.add_message(request, constants.ERROR, 'Conta não encontrada')
+            return redirect('/extrato/novo_valor')
+        invalidar_dados(request.user)
+        if automatica:
+            messages.add_message(request, constants.INFO, f'Categoria "{valores.categoria}" atribuída automaticamente')
 
         if tipo == "E":
-            conta.valor += float(valor)
             messages.add_message(request, constants.SUCCESS, 'Entrada cadastrada com sucesso')    
 
         elif tipo == "S":
-            conta.valor -= float(valor)
             messages.add_message(request, constants.SUCCESS, 'Saída cadastrada com sucesso')
-        
-        conta.save()
 
         return redirect('/extrato/novo_valor')
     
+def importar_extrato(request):
+    contas = Conta.objects.filter(user=request.user)
+
+    if request.method == "GET":
+        return render(request, 'importar_extrato.html', {'contas': contas})
+
+    arquivo = request.FILES.get('arquivo')
+    conta = contas.filter(id=request.POST.get('conta') or None).first()
+    if not arquivo or conta is None:
+        messages.add_message(request, constants.ERROR, 'Selecione a conta e o arquivo do extrato.')
+        return redirect('/extrato/importar_extrato/')
+
+    erros = []
+    try:
+        resultado = importar(request.user, conta, ler_extrato(arquivo.file, arquivo.name, erros))
+    except ErroImportacao as e:
+        messages.add_message(request, constants.ERROR, str(e))
+        return redirect('/extrato/importar_extrato/')
+    invalidar_dados(request.user)
+
+    messages.add_message(request, constants.SUCCESS, f'{resultado.importados} movimentações importadas, {resultado.duplicados} já existentes ignoradas.')
+    if resultado.categorizados:
+        messages.add_message(request, constants.INFO, f'{resultado.categorizados} movimentações categorizadas automaticamente.')
+    if erros:
+        messages.add_message(request, constants.WARNING, f'{len(erros)} linhas ignoradas: ' + '; '.join(erros[:5]))
+
+    return redirect('/extrato/importar_extrato/')
+
+CAMPOS_LOTE = ('valor', 'data', 'conta', 'categoria', 'descricao', 'tipo')
+
+def _itens_do_formulario(post):
+    # Uma linha por índice das listas do formulário; linhas sem valor nem descrição são ignoradas
+    colunas = {campo: post.getlist(campo) for campo in CAMPOS_LOTE}
+    linhas = max((len(valores) for valores in colunas.values()), default=0)
+    itens = []
+    for i in range(linhas):
+        item = {campo: valores[i] if i < len(valores) else '' for campo, valores in colunas.items()}
+        if item['valor'].strip() or item['descricao'].strip():
+            itens.append(item)
+    return itens
+
+@login_required
+def lancar_lote(request):
+    """Many Valores at once: a multi-row form, or JSON {"transacoes": [{valor, data, conta, categoria, descricao, tipo}, ...]}."""
+    if request.method == "GET":
+        contas = Conta.objects.filter(user=request.user)
+        categorias = Categorias.objects.filter(user=request.user)
+        return render(request, 'lancar_lote.html', {'contas': contas, 'categorias': categorias, 'linhas': range(10)})
+
+    if request.content_type == 'application/json':
+        try:
+            corpo = json.loads(request.body)
+            itens = corpo['transacoes'] if isinstance(corpo, dict) else corpo
+            if not isinstance(itens, list) or not all(isinstance(item, dict) for item in itens):
+                raise ValueError
+        except (ValueError, KeyError):
+            return JsonResponse({'erros': ['JSON inválido: envie {"transacoes": [...]}.']}, status=400)
+        try:
+            criados = lancar(request.user, itens)
+        except ErroLote as e:
+            return JsonResponse({'erros': e.erros}, status=400)
+        invalidar_dados(request.user)
+        return JsonResponse({'criados': criados}, status=201)
+
+    try:
+        criados = lancar(request.user, _itens_do_formulario(request.POST))
+    except ErroLote as e:
+        messages.add_message(request, constants.ERROR, 'Nenhuma movimentação foi salva. ' + '; '.join(e.erros[:10]))
+        return redirect('/extrato/lancar_lote/')
+    invalidar_dados(request.user)
+
+    messages.add_message(request, constants.SUCCESS, f'{criados} movimentações cadastradas com sucesso')
+    return redirect('/extrato/lancar_lote/')
+
+def buscar(request):
+    """Best matches of ?q= in the user's descriptions, ranked (used by the relatorios search box)."""
+    valores = busca.com_relevancia(Valores.objects.filter(user=request.user), request.GET.get('q', ''), request.user)[:10]
+    return JsonResponse({'resultados': [
+        {'id': valor.id, 'descricao': valor.descricao, 'data': valor.data.isoformat(), 'valor': valor.valor, 'tipo': valor.tipo}
+        for valor in valores
+    ]})
+
+def sugerir_categoria(request):
+    """Most likely category for ?descricao= (used by the novo_valor form to preselect it)."""
+    categoria_id, probabilidade = categorizacao.sugerir(request.user, request.GET.get('descricao', ''))
+    if probabilidade < categorizacao.CONFIANCA_MINIMA:
+        categoria_id = None
+    return JsonResponse({'categoria': categoria_id, 'probabilidade': round(probabilidade, 3)})
+
 def view_extrato(request):
     contas = Conta.objects.filter(user=request.user)
     categorias = Categorias.objects.filter(user=request.user)
@@ -62,7 +169,7 @@ def view_extrato(request):
     conta_get = request.GET.get('conta')
     categoria_get = request.GET.get('categoria')
 
-    valores = Valores.objects.filter(user=request.user, data__month=datetime.now().month)
+    valores = Valores.objects.filter(user=request.user).do_mes_atual()
 
     if conta_get:
         valores = valores.filter(conta__id=conta_get)
@@ -1,5 +1,24 @@
 from django.contrib import admin
+from .cache import invalidar_dados
 from .models import Conta, Categorias
 
-admin.site.register(Conta)
-admin.site.register(Categorias)
\ No newline at end of file
+
+class InvalidaDadosAdmin(admin.ModelAdmin):
+    # Nomes de contas e categorias aparecem nas páginas em cache e nos PDFs (perfil.cache)
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidar_dados(obj.user_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidar_dados(obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        users = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in users:
+            invalidar_dados(user_id)
+
+
+admin.site.register(Conta, InvalidaDadosAdmin)
+admin.site.register(Categorias, InvalidaDadosAdmin)
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""Harness de benchmark das páginas financeiras (comando `benchmark`).
+
+Cada página é requisitada pelo test Client do Django, autenticado como um usuário
+(normalmente um gerado por `gerar_dados`), medindo tempo total, tempo e número de
+queries e tamanho da resposta. A primeira requisição é feita com o cache vazio
+(fria) e as seguintes medem o caminho quente.
+
+`medir_templates` compara só o tempo de renderização (medido por core.metricas)
+de home, gerenciar e relatórios sem cache, com o cached loader e com o loader
+mais o cache de fragmentos (sidebar).
+"""
+import statistics
+import subprocess
+import time
+from copy import deepcopy
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core.metricas import registro
+from extrato.models import Valores
+
+from .relatorios import filtrar_valores, gerar_pdf
+
+
+def _inicio_do_ano():
+    return date.today().replace(month=1, day=1).isoformat()
+
+
+def paginas():
+    """(nome, url, GET params) of every benchmarked page."""
+    ano = {'start_date': _inicio_do_ano()}
+    return [
+        ('home', '/perfil/home/', {}),
+        ('dashboard', '/perfil/dashboard/', {}),
+        ('gerenciar', '/perfil/gerenciar/', {}),
+        ('relatorios', '/perfil/relatorios/', {}),
+        ('relatorios_busca', '/perfil/relatorios/', {**ano, 'search': 'mercado'}),
+        ('ver_planejamento', '/planejamento/ver_planejamento/', {}),
+        ('ver_contas', '/contas/ver_contas/', {}),
+        ('export_csv', '/perfil/relatorios/export_csv/', ano),
+        ('export_pdf', '/perfil/relatorios/export_pdf/', ano),
+    ]
+
+
+def _consumir(resposta):
+    if resposta.streaming:
+        return sum(len(parte) for parte in resposta.streaming_content)
+    return len(resposta.content)
+
+
+def _percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+def _resumo(tempos, queries, tempo_db, tamanho, status):
+    return {
+        'status': status,
+        'queries': queries,
+        'tempo_db_ms': round(tempo_db, 2),
+        'bytes': tamanho,
+        'frio_ms': round(tempos[0], 2),
+        'min_ms': round(min(tempos[1:] or tempos), 2),
+        'mediana_ms': round(statistics.median(tempos[1:] or tempos), 2),
+        'p95_ms': round(_percentil(tempos[1:] or tempos, 95), 2),
+        'max_ms': round(max(tempos), 2),
+    }
+
+
+def medir(client, url, params, repeticoes):
+    """Request `url` 1 + `repeticoes` times; the first one runs with an empty cache."""
+    cache.clear()
+    tempos = []
+    for _ in range(repeticoes + 1):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            resposta = client.get(url, params)
+            tamanho = _consumir(resposta)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    tempo_db = sum(float(q['time']) for q in capturadas.captured_queries) * 1000
+    return _resumo(tempos, len(capturadas), tempo_db, tamanho, resposta.status_code)
+
+
+def medir_gerar_pdf(user, repeticoes):
+    """Time the PDF build itself (the export view only queues it)."""
+    valores = filtrar_valores(user, {'start_date': _inicio_do_ano()})
+    tempos = []
+    for _ in range(repeticoes + 1):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            tamanho = len(gerar_pdf(valores))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    tempo_db = sum(float(q['time']) for q in capturadas.captured_queries) * 1000
+    return _resumo(tempos, len(capturadas), tempo_db, tamanho, None)
+
+
+CENARIOS_TEMPLATES = [
+    # (nome, cached loader, cache de fragmentos)
+    ('sem cache', False, False),
+    ('loader em cache', True, False),
+    ('loader + fragmentos', True, True),
+]
+PAGINAS_TEMPLATES = ('home', 'gerenciar', 'relatorios')
+
+
+def _config_templates(em_cache):
+    templates = deepcopy(settings.TEMPLATES)
+    loaders = settings.TEMPLATES_LOADERS_BASE
+    templates[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', loaders)] if em_cache else loaders
+    return templates
+
+
+def _config_caches(fragmentos):
+    caches = deepcopy(settings.CACHES)
+    if not fragmentos:
+        caches['fragmentos'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    return caches
+
+
+def _tempo_template(client, url, view):
+    registro.zerar()
+    client.get(url)
+    return registro.como_dict()[view]['tempo_template_medio_ms']
+
+
+def medir_templates(user, repeticoes=20):
+    """Median render time (ms) of each page per template caching scenario."""
+    client = Client()
+    client.force_login(user)
+    urls = {nome: url for nome, url, _ in paginas()}
+
+    resultados = {}
+    for cenario, loader, fragmentos in CENARIOS_TEMPLATES:
+        # Trocar TEMPLATES/CACHES recria os engines e os caches (o primeiro render compila e aquece)
+        with override_settings(TEMPLATES=_config_templates(loader), CACHES=_config_caches(fragmentos)):
+            resultados[cenario] = {}
+            for nome in PAGINAS_TEMPLATES:
+                tempos = [_tempo_template(client, urls[nome], nome) for _ in range(repeticoes + 1)]
+                resultados[cenario][nome] = round(statistics.median(tempos[1:]), 2)
+    return resultados
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(user, repeticoes=5, filtro=None, pdf=True):
+    """Run the benchmark for `user` and return the results dict (JSON serializable)."""
+    client = Client()
+    client.force_login(user)
+
+    resultados = {}
+    # Sem threads da fila durante a medição: o export só enfileira e o PDF é medido à parte
+    with override_settings(RELATORIOS_PDF_WORKERS=0):
+        for nome, url, params in paginas():
+            if filtro and nome not in filtro:
+                continue
+            resultados[nome] = medir(client, url, params, repeticoes)
+        if pdf and (not filtro or 'gerar_pdf' in filtro):
+            resultados['gerar_pdf'] = medir_gerar_pdf(user, max(1, repeticoes // 2))
+
+    return {
+        'commit': commit_atual(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'banco': connection.vendor,
+        'usuario': user.username,
+        'transacoes': Valores.objects.filter(user=user).count(),
+        'repeticoes': repeticoes,
+        'resultados': resultados,
+    }
+
+
+def comparar(anterior, atual, campo='mediana_ms'):
+    """Yield (pagina, antes, depois, variacao %) for pages present in both runs."""
+    for nome, dados in atual['resultados'].items():
+        antes = anterior.get('resultados', {}).get(nome, {}).get(campo)
+        depois = dados.get(campo)
+        if antes is None or depois is None:
+            continue
+        variacao = (depois - antes) / antes * 100 if antes else 0
+        yield nome, antes, depois, variacao
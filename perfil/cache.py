@@ -0,0 +1,106 @@
+"""Cache por usuário das páginas de resumo (home e dashboard) e do perfil.
+
+Cada usuário tem uma versão de dados no cache. As chaves dos resultados incluem
+essa versão, então qualquer escrita (novo valor, conta, categoria, planejamento)
+só precisa chamar `invalidar_dados(user)`: as entradas antigas deixam de ser
+lidas e expiram sozinhas pelo TIMEOUT do backend.
+
+O UserProfile, usado em todas as páginas (sidebar), fica como uma cópia no cache
+até ser salvo por editar_perfil/configuracoes (`invalidar_perfil`). O HTML da
+sidebar fica no cache de fragmentos ({% cache %}) sob `chave_sidebar`, que muda
+com a versão do perfil e com o manifest dos estáticos.
+"""
+import time
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+
+from .models import UserProfile
+
+
+def _chave_versao(user_id):
+    return f'dados:{user_id}:versao'
+
+
+def _user_id(user):
+    return getattr(user, 'pk', user)
+
+
+def _versao(chave):
+    versao = cache.get(chave)
+    if versao is None:
+        # Começa em um valor baseado no tempo: se a chave sumir do cache (expirou,
+        # reinício do locmem), a nova versão não colide com chaves antigas
+        cache.add(chave, time.time_ns(), timeout=None)
+        versao = cache.get(chave)
+    return versao
+
+
+def _incrementar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, time.time_ns(), timeout=None)
+
+
+def versao_dados(user):
+    """Current data version of `user` (a user or a user id)."""
+    return _versao(_chave_versao(_user_id(user)))
+
+
+def invalidar_dados(user):
+    """Bump the data version of `user`, so cached pages are recomputed on the next hit."""
+    _incrementar(_chave_versao(_user_id(user)))
+
+
+def em_cache(user, nome, periodo, calcular):
+    """Return `calcular()` cached under user, page name, period and data version."""
+    user_id = _user_id(user)
+    chave = f'{nome}:{user_id}:{periodo}:{versao_dados(user_id)}'
+    dados = cache.get(chave)
+    if dados is None:
+        dados = calcular()
+        cache.set(chave, dados)
+    return dados
+
+
+def _chave_perfil(user_id):
+    return f'perfil:{user_id}'
+
+
+def obter_perfil(user):
+    """UserProfile snapshot of `user` from the cache, creating the profile if missing.
+
+    The snapshot is read-only in practice: views that change the profile load it
+    from the database and call `invalidar_perfil` after saving.
+    """
+    user_id = _user_id(user)
+    perfil = cache.get(_chave_perfil(user_id))
+    if perfil is None:
+        perfil, _ = UserProfile.objects.get_or_create(user_id=user_id)
+        cache.set(_chave_perfil(user_id), perfil)
+    return perfil
+
+
+def versao_perfil(user):
+    return _versao(f'perfil:{_user_id(user)}:versao')
+
+
+def invalidar_perfil(user):
+    user_id = _user_id(user)
+    cache.delete(_chave_perfil(user_id))
+    _incrementar(f'perfil:{user_id}:versao')
+
+
+def chave_sidebar(user):
+    """Vary-on value of the cached sidebar fragment: user, profile version and static manifest."""
+    # Depois de um collectstatic os nomes com hash mudam: o fragmento antigo não pode ser reaproveitado
+    manifest = getattr(staticfiles_storage, 'manifest_hash', '')
+    return f'{_user_id(user)}:{versao_perfil(user)}:{manifest}'
+
+
+def perfil_da_requisicao(request):
+    """The profile of the logged in user, looked up at most once per request."""
+    if not hasattr(request, '_perfil'):
+        request._perfil = obter_perfil(request.user) if request.user.is_authenticated else None
+    return request._perfil
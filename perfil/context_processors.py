@@ -1,9 +1,18 @@
-from .models import UserProfile
+from django.utils.functional import SimpleLazyObject
+
+from .cache import chave_sidebar, perfil_da_requisicao
 
 
 def user_profile(request):
-    """Add user_profile to all templates, creating it if missing for authenticated users."""
+    """Add user_profile to all templates, creating it if missing for authenticated users.
+
+    The profile is resolved lazily (only templates that use it pay for it) and comes
+    from the per-user cache snapshot (perfil.cache.obter_perfil). `sidebar_chave`
+    keys the cached sidebar fragment; on a hit the profile is not loaded at all.
+    """
     profile = None
+    chave = ''
     if request.user.is_authenticated:
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
-    return {'user_profile': profile}
+        profile = SimpleLazyObject(lambda: perfil_da_requisicao(request))
+        chave = SimpleLazyObject(lambda: chave_sidebar(request.user))
+    return {'user_profile': profile, 'sidebar_chave': chave}
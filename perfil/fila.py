@@ -0,0 +1,146 @@
+"""Fila local (no banco de dados) para gerar PDFs de relatório fora da requisição.
+
+Não há broker externo: cada pedido é uma linha de RelatorioPDF com status
+'pendente'. Um pool de threads do próprio processo web (RELATORIOS_PDF_WORKERS)
+e/ou o comando `processar_relatorios` reservam as linhas com um UPDATE atômico
+e gravam o PDF em MEDIA_ROOT/relatorios, nomeado pelo hash dos filtros.
+
+Os pedidos só existem na memória do pool: se o processo reinicia entre o commit
+e a reserva (ou morre gerando o PDF), a linha fica em 'pendente'/'processando'.
+Linhas sem atualização há mais de RELATORIOS_PDF_TIMEOUT segundos voltam para a
+fila quando o mesmo relatório é pedido de novo, e `recuperar_travados` (chamado
+pelo comando a cada volta) faz o mesmo para todas.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import RelatorioPDF
+from .relatorios import chave_filtros, filtrar_valores, gerar_pdf, versao_relatorio
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    global _executor
+    workers = getattr(settings, 'RELATORIOS_PDF_WORKERS', 2)
+    if not workers:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='relatorio-pdf')
+    return _executor
+
+
+def _limite_travado():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'RELATORIOS_PDF_TIMEOUT', 600))
+
+
+def _travado(relatorio):
+    return relatorio.status in ('pendente', 'processando') and relatorio.atualizado_em < _limite_travado()
+
+
+def _submeter(relatorio_id):
+    executor = _get_executor()
+    if executor is not None:
+        transaction.on_commit(lambda: executor.submit(_processar_em_thread, relatorio_id))
+
+
+def _reenfileirar(relatorio):
+    """Put a stuck job back in the queue. Returns False if another request already did."""
+    # O filtro por status/atualizado_em garante que só uma requisição reenfileira
+    reenfileirado = RelatorioPDF.objects.filter(
+        id=relatorio.id, status=relatorio.status, atualizado_em=relatorio.atualizado_em,
+    ).update(status='pendente', atualizado_em=timezone.now()) == 1
+    if reenfileirado:
+        logger.warning('Relatório %s parado em %s, voltou para a fila', relatorio.id, relatorio.status)
+        relatorio.refresh_from_db()
+        _submeter(relatorio.id)
+    return reenfileirado
+
+
+def recuperar_travados():
+    """Requeue every job stuck in 'pendente'/'processando' past RELATORIOS_PDF_TIMEOUT; returns how many."""
+    return RelatorioPDF.objects.filter(
+        status__in=('pendente', 'processando'), atualizado_em__lt=_limite_travado(),
+    ).update(status='pendente', atualizado_em=timezone.now())
+
+
+def enfileirar(user, filtros):
+    """Return the RelatorioPDF for `user`/`filtros`, queueing a new one if needed.
+
+    A finished artifact (or one already in progress) with the same filters and the
+    same data version is reused, so repeated exports do not rebuild the PDF. A job
+    stuck for longer than RELATORIOS_PDF_TIMEOUT is put back in the queue.
+    """
+    chave = chave_filtros(user, filtros)
+    versao = versao_relatorio(user)
+
+    relatorio = (
+        RelatorioPDF.objects
+        .filter(user=user, chave=chave, versao=versao)
+        .exclude(status='erro')
+        .order_by('-criado_em')
+        .first()
+    )
+    if relatorio is not None:
+        if _travado(relatorio):
+            _reenfileirar(relatorio)
+        return relatorio
+
+    relatorio = RelatorioPDF.objects.create(user=user, chave=chave, versao=versao, filtros=filtros)
+    _submeter(relatorio.id)
+    return relatorio
+
+
+def reservar(relatorio_id):
+    """Atomically move a pending job to 'processando'. Returns False if another worker got it."""
+    return RelatorioPDF.objects.filter(id=relatorio_id, status='pendente').update(status='processando', atualizado_em=timezone.now()) == 1
+
+
+def processar(relatorio_id):
+    """Build one queued PDF. Returns True if this call built it."""
+    if not reservar(relatorio_id):
+        return False
+
+    relatorio = RelatorioPDF.objects.select_related('user').get(id=relatorio_id)
+    try:
+        conteudo = gerar_pdf(filtrar_valores(relatorio.user, relatorio.filtros))
+        relatorio.arquivo.save(f'{relatorio.chave}-{relatorio.versao[:12]}.pdf', ContentFile(conteudo), save=False)
+        relatorio.status = 'pronto'
+        relatorio.save(update_fields=['arquivo', 'status', 'atualizado_em'])
+    except Exception as e:
+        logger.exception('Erro ao gerar relatório %s', relatorio_id)
+        relatorio.status = 'erro'
+        relatorio.erro = str(e)
+        relatorio.save(update_fields=['status', 'erro', 'atualizado_em'])
+        return True
+
+    _descartar_versoes_antigas(relatorio)
+    return True
+
+
+def _descartar_versoes_antigas(relatorio):
+    antigos = RelatorioPDF.objects.filter(user=relatorio.user, chave=relatorio.chave).exclude(id=relatorio.id).exclude(status__in=('pendente', 'processando'))
+    for antigo in antigos:
+        if antigo.arquivo:
+            antigo.arquivo.delete(save=False)
+    antigos.delete()
+
+
+def _processar_em_thread(relatorio_id):
+    close_old_connections()
+    try:
+        processar(relatorio_id)
+    finally:
+        connections.close_all()
+
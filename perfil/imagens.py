@@ -0,0 +1,140 @@
+"""Processamento das imagens enviadas (ícone da conta e foto de perfil).
+
+No upload a imagem é aberta uma única vez com o Pillow, girada conforme o EXIF e
+regravada sem metadados (EXIF, GPS, perfis ICC). Além da imagem principal
+(no máximo LADO_MAXIMO px) são geradas variantes pequenas em WebP e JPEG para as
+páginas, que nunca servem o original.
+
+Os nomes dos arquivos são o hash do conteúdo enviado: o mesmo arquivo enviado de
+novo (por outro usuário, ou em outra conta) reaproveita o que já está no storage.
+Nos templates, `{% load imagens %}` e `campo|variante:'p'` (WebP) ou
+`campo|variante:'p.jpg'` dão a URL de uma variante.
+"""
+import hashlib
+import posixpath
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+LADO_MAXIMO = 1024
+TAMANHO_MAXIMO = 10 * 1024 * 1024
+QUALIDADE_WEBP = 80
+QUALIDADE_JPEG = 85
+
+# rótulo -> lado em px (2x o tamanho exibido, para telas de alta densidade)
+VARIANTES = {
+    'icones': {'p': 64, 'g': 128},
+    'perfis': {'p': 80, 'g': 240},
+}
+# Fotos de perfil são exibidas em círculo: as variantes são recortadas em quadrado
+RECORTE_QUADRADO = {'perfis'}
+
+_NOME_PROCESSADO = re.compile(r'(?P<base>[0-9a-f]{32})\.(?:jpg|png)')
+
+
+class ErroImagem(ValueError):
+    pass
+
+
+def _hash(arquivo):
+    sha = hashlib.sha256()
+    for parte in arquivo.chunks():
+        sha.update(parte)
+    arquivo.seek(0)
+    return sha.hexdigest()[:32]
+
+
+def _abrir(arquivo):
+    if arquivo.size > TAMANHO_MAXIMO:
+        raise ErroImagem(f'Imagem maior que {TAMANHO_MAXIMO // (1024 * 1024)} MB.')
+    try:
+        imagem = Image.open(arquivo)
+        imagem.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ErroImagem('Arquivo de imagem inválido.')
+    finally:
+        arquivo.seek(0)
+    imagem = ImageOps.exif_transpose(imagem)
+    tem_alfa = imagem.mode in ('RGBA', 'LA', 'PA') or (imagem.mode == 'P' and 'transparency' in imagem.info)
+    return imagem.convert('RGBA' if tem_alfa else 'RGB')
+
+
+def _sem_alfa(imagem):
+    if imagem.mode != 'RGBA':
+        return imagem
+    fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+    fundo.paste(imagem, mask=imagem.getchannel('A'))
+    return fundo
+
+
+def _gravar(nome, imagem, formato, **opcoes):
+    if default_storage.exists(nome):
+        return
+    buffer = BytesIO()
+    # Sem exif=/icc_profile=: o arquivo gravado não leva metadados
+    imagem.save(buffer, formato, **opcoes)
+    default_storage.save(nome, ContentFile(buffer.getvalue()))
+
+
+def _reduzir(imagem, lado, quadrado):
+    if quadrado:
+        return ImageOps.fit(imagem, (lado, lado), Image.LANCZOS)
+    return ImageOps.contain(imagem, (lado, lado), Image.LANCZOS) if max(imagem.size) > lado else imagem
+
+
+def _base(nome):
+    """Content hash of a file named by processar() ('<pasta>/<hash>.jpg'), or None."""
+    encontrado = _NOME_PROCESSADO.fullmatch(posixpath.basename(nome or ''))
+    return encontrado and encontrado.group('base')
+
+
+def nome_variante(nome, rotulo, extensao='webp'):
+    base = _base(nome)
+    if base is None:
+        raise ValueError(f'{nome} não foi gerado por processar()')
+    return posixpath.join(posixpath.dirname(nome), f'{base}_{rotulo}.{extensao}')
+
+
+def _gerar(imagem, nome, pasta):
+    principal = _reduzir(imagem, LADO_MAXIMO, quadrado=False)
+    if nome.endswith('.png'):
+        _gravar(nome, principal, 'PNG', optimize=True)
+    else:
+        _gravar(nome, principal, 'JPEG', quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+
+    for rotulo, lado in VARIANTES[pasta].items():
+        variante = _reduzir(imagem, lado, pasta in RECORTE_QUADRADO)
+        _gravar(nome_variante(nome, rotulo, 'webp'), variante, 'WEBP', quality=QUALIDADE_WEBP, method=6)
+        _gravar(nome_variante(nome, rotulo, 'jpg'), _sem_alfa(variante), 'JPEG', quality=QUALIDADE_JPEG, optimize=True)
+
+
+def processar(arquivo, pasta):
+    """Store an uploaded image and its variants under `pasta`; returns the name for the ImageField.
+
+    Raises ErroImagem for files Pillow can't read or that are too large.
+    """
+    imagem = _abrir(arquivo)
+    # PNG só quando há transparência (ícones); o resto vira JPEG
+    extensao = 'png' if imagem.mode == 'RGBA' else 'jpg'
+    nome = posixpath.join(pasta, f'{_hash(arquivo)}.{extensao}')
+    _gerar(imagem, nome, pasta)
+    return nome
+
+
+def processado(nome):
+    """Whether `nome` was stored by processar(): hash name and its variants on disk."""
+    # Um upload antigo pode ter um nome parecido (ex.: '<hash>.jpg' sem variantes)
+    return _base(nome) is not None and default_storage.exists(nome_variante(nome, 'p'))
+
+
+def url_variante(campo, rotulo='p'):
+    """URL of a variant ('p', 'g', 'p.jpg'...) of an image field; the original for unprocessed files."""
+    if not campo:
+        return ''
+    if not processado(campo.name):
+        return campo.url
+    rotulo, _, extensao = rotulo.partition('.')
+    return default_storage.url(nome_variante(campo.name, rotulo, extensao or 'webp'))
@@ -0,0 +1,62 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from perfil import benchmark, sinteticos
+
+
+class Command(BaseCommand):
+    help = 'Mede tempo e queries de home, dashboard, relatórios, planejamento, contas e exportações; grava o resultado em JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username medido (padrão: o primeiro usuário sintético).')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Requisições quentes por página (além da primeira, fria).')
+        parser.add_argument('--paginas', nargs='*', help='Mede apenas estas páginas (nomes da saída).')
+        parser.add_argument('--sem-pdf', action='store_true', help='Não mede a geração do PDF.')
+        parser.add_argument('--templates', action='store_true', help='Compara também o tempo de renderização com e sem cache de templates.')
+        parser.add_argument('--saida', default='benchmark.json', help='Arquivo JSON de resultado ("-" para stdout).')
+        parser.add_argument('--comparar', help='JSON de uma execução anterior para mostrar a variação.')
+        parser.add_argument('--limite', type=float, default=20.0, help='Variação (%%) da mediana marcada como regressão.')
+
+    def handle(self, *args, **options):
+        username = options['user']
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.filter(username__startswith=f'{sinteticos.PREFIXO}_').order_by('id').first()
+        if user is None:
+            raise CommandError('Usuário não encontrado. Rode "python manage.py gerar_dados" ou informe --user.')
+
+        resultado = benchmark.executar(user, options['repeticoes'], options['paginas'], pdf=not options['sem_pdf'])
+
+        self.stdout.write(f'{user.username}: {resultado["transacoes"]} valores, commit {resultado["commit"] or "?"}')
+        self.stdout.write(f'{"página":<18}{"status":>7}{"queries":>9}{"db ms":>10}{"frio ms":>10}{"mediana":>10}{"p95":>10}{"bytes":>11}')
+        for nome, r in resultado['resultados'].items():
+            self.stdout.write(
+                f'{nome:<18}{r["status"] or "-":>7}{r["queries"]:>9}{r["tempo_db_ms"]:>10.1f}'
+                f'{r["frio_ms"]:>10.1f}{r["mediana_ms"]:>10.1f}{r["p95_ms"]:>10.1f}{r["bytes"]:>11}'
+            )
+
+        if options['templates']:
+            resultado['templates'] = benchmark.medir_templates(user, max(options['repeticoes'], 10))
+            self.stdout.write('\nRenderização (mediana, ms):')
+            self.stdout.write(f'{"cenário":<22}' + ''.join(f'{nome:>12}' for nome in benchmark.PAGINAS_TEMPLATES))
+            for cenario, tempos in resultado['templates'].items():
+                self.stdout.write(f'{cenario:<22}' + ''.join(f'{tempos[nome]:>12.2f}' for nome in benchmark.PAGINAS_TEMPLATES))
+
+        if options['comparar']:
+            with open(options['comparar']) as arquivo:
+                anterior = json.load(arquivo)
+            self.stdout.write(f'\nComparação com {anterior.get("commit") or options["comparar"]} (mediana):')
+            for nome, antes, depois, variacao in benchmark.comparar(anterior, resultado):
+                linha = f'{nome:<18}{antes:>10.1f} -> {depois:>10.1f} ms ({variacao:+.1f}%)'
+                self.stdout.write(self.style.ERROR(linha) if variacao > options['limite'] else linha)
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['saida'] == '-':
+            self.stdout.write(texto)
+        else:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(texto)
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {options["saida"]}.'))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perfil import sinteticos
+
+
+class Command(BaseCommand):
+    help = 'Gera usuários, contas, categorias, valores e contas a pagar sintéticos para benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transacoes', type=int, default=10000, help='Total de Valores gerados (ex.: 1000 a 10000000).')
+        parser.add_argument('--usuarios', type=int, default=1, help='Quantidade de usuários; as transações são divididas entre eles.')
+        parser.add_argument('--meses', type=int, default=24, help='Período coberto, terminando no mês atual.')
+        parser.add_argument('--contas', type=int, default=3, help='Contas bancárias por usuário.')
+        parser.add_argument('--contas-pagar', type=int, default=8, help='Contas a pagar por usuário.')
+        parser.add_argument('--lote', type=int, default=5000, help='Linhas por bulk_create.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefixo', default=sinteticos.PREFIXO, help='Prefixo dos usernames gerados (<prefixo>_N, senha = prefixo).')
+        parser.add_argument('--limpar', action='store_true', help='Remove antes os usuários sintéticos com o mesmo prefixo.')
+
+    def handle(self, *args, **options):
+        if options['usuarios'] < 1 or options['transacoes'] < 0:
+            raise CommandError('Use --usuarios >= 1 e --transacoes >= 0.')
+
+        if options['limpar']:
+            removidos = sinteticos.remover_usuarios(options['prefixo'])
+            self.stdout.write(f'{removidos} usuário(s) sintético(s) removido(s).')
+
+        inicio = time.perf_counter()
+        progresso = sinteticos.gerar(
+            usuarios=options['usuarios'],
+            transacoes=options['transacoes'],
+            meses=options['meses'],
+            contas=options['contas'],
+            contas_pagar=options['contas_pagar'],
+            lote=options['lote'],
+            seed=options['seed'],
+            prefixo=options['prefixo'],
+        )
+        total = 0
+        anterior = {}
+        for username, inseridos in progresso:
+            total += inseridos - anterior.get(username, 0)
+            anterior[username] = inseridos
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{username}: {inseridos} valores')
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} valores para {len(anterior)} usuário(s) em {segundos:.1f}s ({total / max(segundos, 1e-9):.0f} linhas/s).'
+        ))
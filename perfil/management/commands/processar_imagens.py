@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from perfil.cache import invalidar_dados, invalidar_perfil
+from perfil.imagens import ErroImagem, processado, processar
+from perfil.models import Conta, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes (WebP/JPEG, sem metadados) das imagens enviadas antes do processamento no upload.'
+
+    def handle(self, *args, **options):
+        processadas = 0
+        for modelo, campo, pasta, invalidar in (
+            (Conta, 'icone', 'icones', invalidar_dados),
+            (UserProfile, 'foto_perfil', 'perfis', invalidar_perfil),
+        ):
+            for instancia in modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True}).iterator():
+                arquivo = getattr(instancia, campo)
+                if processado(arquivo.name):
+                    continue
+                try:
+                    with arquivo.open('rb'):
+                        nome = processar(arquivo, pasta)
+                except (ErroImagem, FileNotFoundError) as e:
+                    self.stderr.write(f'{modelo.__name__} {instancia.pk}: {arquivo.name} ignorado ({e})')
+                    continue
+                modelo.objects.filter(pk=instancia.pk).update(**{campo: nome})
+                invalidar(instancia.user_id)
+                processadas += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{processadas} imagem(ns) processada(s).'))
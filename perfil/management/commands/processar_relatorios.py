@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from perfil.fila import processar, recuperar_travados
+from perfil.models import RelatorioPDF
+
+
+class Command(BaseCommand):
+    help = 'Worker da fila de relatórios PDF: gera os pedidos pendentes em um pool de threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Quantidade de threads no pool.')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas à fila.')
+        parser.add_argument('--uma-vez', action='store_true', help='Processa os pendentes atuais e sai.')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                recuperados = recuperar_travados()
+                if recuperados:
+                    self.stdout.write(f'{recuperados} relatório(s) parado(s) de volta na fila.')
+                pendentes = list(
+                    RelatorioPDF.objects.filter(status='pendente').order_by('criado_em').values_list('id', flat=True)
+                )
+                gerados = sum(executor.map(self._processar, pendentes))
+                if gerados:
+                    self.stdout.write(f'{gerados} relatório(s) gerado(s).')
+
+                if options['uma_vez']:
+                    break
+                time.sleep(options['intervalo'])
+
+    def _processar(self, relatorio_id):
+        try:
+            return processar(relatorio_id)
+        finally:
+            connections.close_all()
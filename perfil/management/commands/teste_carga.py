@@ -0,0 +1,144 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from random import Random
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from core.database import configurar_sqlite
+
+ALIAS = 'teste_carga'
+CONTAS = 200
+
+# O que o Django usa sem configuração: rollback journal, BEGIN DEFERRED e timeout de 5 s
+PADRAO = {
+    'OPTIONS': {'timeout': 5},
+    'TRANSACTION_MODE': None,
+    'PRAGMAS': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+}
+
+
+def _p95(amostras):
+    if not amostras:
+        return 0.0
+    return statistics.quantiles(amostras, n=20)[-1] if len(amostras) > 1 else amostras[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga concorrente no SQLite: escritores (lê o saldo, insere e atualiza, como um novo valor) '
+        'e leitores (agregados mensais) em threads, comparando o perfil padrão do Django com o de core.database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8)
+        parser.add_argument('--leitores', type=int, default=8)
+        parser.add_argument('--segundos', type=float, default=10.0, help='Duração de cada perfil.')
+        parser.add_argument('--linhas', type=int, default=50000, help='Movimentações pré-carregadas.')
+        parser.add_argument('--perfil', choices=['padrao', 'otimizado', 'ambos'], default='ambos')
+
+    def handle(self, *args, **options):
+        perfis = ['padrao', 'otimizado'] if options['perfil'] == 'ambos' else [options['perfil']]
+
+        self.stdout.write(f'{"perfil":<11}{"escritas/s":>12}{"leituras/s":>12}{"locked":>9}{"p95 escrita":>14}{"p95 leitura":>14}')
+        for perfil in perfis:
+            with tempfile.TemporaryDirectory() as pasta:
+                r = self._executar(perfil, os.path.join(pasta, 'carga.sqlite3'), options)
+            self.stdout.write(
+                f'{perfil:<11}{r["escritas"] / options["segundos"]:>12.0f}{r["leituras"] / options["segundos"]:>12.0f}'
+                f'{r["locked"]:>9}{_p95(r["tempos_escrita"]):>12.1f}ms{_p95(r["tempos_leitura"]):>12.1f}ms'
+            )
+
+    def _registrar_banco(self, perfil, caminho):
+        configuracao = configurar_sqlite(caminho)
+        if perfil == 'padrao':
+            configuracao.update(PADRAO)
+        connections.settings[ALIAS] = configuracao
+        connections.configure_settings(connections.settings)
+
+    def _preparar(self, linhas):
+        rnd = Random(0)
+        with transaction.atomic(using=ALIAS), connections[ALIAS].cursor() as cursor:
+            cursor.execute('CREATE TABLE conta (id INTEGER PRIMARY KEY, saldo REAL NOT NULL)')
+            cursor.execute('CREATE TABLE movimento (id INTEGER PRIMARY KEY, conta_id INTEGER, valor REAL, data TEXT)')
+            cursor.execute('CREATE INDEX movimento_conta_data ON movimento (conta_id, data)')
+            cursor.executemany('INSERT INTO conta (id, saldo) VALUES (%s, 0)', [(i,) for i in range(1, CONTAS + 1)])
+            cursor.executemany(
+                'INSERT INTO movimento (conta_id, valor, data) VALUES (%s, %s, %s)',
+                [(rnd.randint(1, CONTAS), rnd.uniform(-300, 300), f'2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}') for _ in range(linhas)],
+            )
+        connections[ALIAS].close()
+        # A conexão desta thread fica presa ao arquivo deste perfil; o próximo perfil cria outra
+        del connections[ALIAS]
+
+    def _escritor(self, semente, fim, resultado):
+        rnd = Random(semente)
+        try:
+            while time.perf_counter() < fim:
+                conta = rnd.randint(1, CONTAS)
+                valor = rnd.uniform(-300, 300)
+                inicio = time.perf_counter()
+                try:
+                    # Mesmo padrão de uma escrita da aplicação: lê, insere e atualiza dentro de um atomic()
+                    with transaction.atomic(using=ALIAS), connections[ALIAS].cursor() as cursor:
+                        cursor.execute('SELECT saldo FROM conta WHERE id = %s', [conta])
+                        cursor.fetchone()
+                        cursor.execute('INSERT INTO movimento (conta_id, valor, data) VALUES (%s, %s, %s)', [conta, valor, '2024-12-01'])
+                        cursor.execute('UPDATE conta SET saldo = saldo + %s WHERE id = %s', [valor, conta])
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    resultado['locked'] += 1
+                    continue
+                resultado['tempos_escrita'].append((time.perf_counter() - inicio) * 1000)
+                resultado['escritas'] += 1
+        finally:
+            connections[ALIAS].close()
+
+    def _leitor(self, semente, fim, resultado):
+        rnd = Random(semente)
+        try:
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    with connections[ALIAS].cursor() as cursor:
+                        cursor.execute(
+                            'SELECT substr(data, 1, 7), SUM(valor) FROM movimento WHERE conta_id = %s GROUP BY 1',
+                            [rnd.randint(1, CONTAS)],
+                        )
+                        cursor.fetchall()
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    resultado['locked'] += 1
+                    continue
+                resultado['tempos_leitura'].append((time.perf_counter() - inicio) * 1000)
+                resultado['leituras'] += 1
+        finally:
+            connections[ALIAS].close()
+
+    def _executar(self, perfil, caminho, options):
+        self._registrar_banco(perfil, caminho)
+        self._preparar(options['linhas'])
+
+        fim = time.perf_counter() + options['segundos']
+        resultados = []
+        threads = []
+        for i in range(options['escritores'] + options['leitores']):
+            resultado = {'escritas': 0, 'leituras': 0, 'locked': 0, 'tempos_escrita': [], 'tempos_leitura': []}
+            resultados.append(resultado)
+            alvo = self._escritor if i < options['escritores'] else self._leitor
+            threads.append(threading.Thread(target=alvo, args=(i, fim, resultado)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = {'escritas': 0, 'leituras': 0, 'locked': 0, 'tempos_escrita': [], 'tempos_leitura': []}
+        for resultado in resultados:
+            for chave, valor in resultado.items():
+                total[chave] += valor
+        return total
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('perfil', '0009_alter_conta_icone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatorioPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64)),
+                ('versao', models.CharField(max_length=64)),
+                ('filtros', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('pronto', 'Pronto'), ('erro', 'Erro')], default='pendente', max_length=12)),
+                ('arquivo', models.FileField(blank=True, null=True, upload_to='relatorios')),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'chave', 'versao'], name='relatorio_user_chave_idx'), models.Index(fields=['status', 'criado_em'], name='relatorio_status_idx')],
+            },
+        ),
+    ]
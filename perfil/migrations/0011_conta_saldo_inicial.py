@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:38
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def calcular_saldo_inicial(apps, schema_editor):
+    # saldo_inicial = saldo atual - (entradas - saídas) já lançadas na conta
+    Conta = apps.get_model('perfil', 'Conta')
+    Valores = apps.get_model('extrato', 'Valores')
+    liquido = (
+        Valores.objects.filter(conta=OuterRef('pk'))
+        .values('conta')
+        .annotate(total=Sum(Case(
+            When(tipo='E', then=F('valor')),
+            When(tipo='S', then=-F('valor')),
+            default=Value(0.0),
+        )))
+        .values('total')
+    )
+    Conta.objects.update(saldo_inicial=F('valor') - Coalesce(Subquery(liquido), Value(0.0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0010_relatoriopdf'),
+        ('extrato', '0006_valores_hash_conteudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conta',
+            name='saldo_inicial',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(calcular_saldo_inicial, migrations.RunPython.noop),
+    ]
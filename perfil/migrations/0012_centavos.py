@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:53
+
+import core.dinheiro
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0011_conta_saldo_inicial'),
+    ]
+
+    operations = [
+        # Reais (float) -> centavos ainda na coluna antiga; o AlterField converte o tipo
+        core.dinheiro.migracao_para_centavos('perfil', 'Categorias', 'valor_planejado'),
+        core.dinheiro.migracao_para_centavos('perfil', 'Conta', 'saldo_inicial', 'valor'),
+        migrations.AlterField(
+            model_name='categorias',
+            name='valor_planejado',
+            field=core.dinheiro.CentavosField(),
+        ),
+        migrations.AlterField(
+            model_name='conta',
+            name='saldo_inicial',
+            field=core.dinheiro.CentavosField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='conta',
+            name='valor',
+            field=core.dinheiro.CentavosField(),
+        ),
+    ]
@@ -1,26 +1,55 @@
 from django.db import models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
 from datetime import datetime
 from django.contrib.auth.models import User
 
+from core.dinheiro import CentavosField, Soma
+
+
+class CategoriasQuerySet(models.QuerySet):
+    def com_gastos(self, mes=None):
+        """Annotate gasto_mes and percentual_gasto for every categoria in a single query.
+
+        `mes` is the first day of the month to consider (default: current month).
+        """
+        if mes is None:
+            mes = datetime.now().date().replace(day=1)
+
+        gasto = Soma('resumos__total', filter=Q(resumos__mes=mes, resumos__user=F('user')), default=0)
+        return self.annotate(gasto_mes=gasto).annotate(
+            percentual_gasto=Case(
+                When(valor_planejado__gt=0, then=Cast(F('gasto_mes') * 100 / F('valor_planejado'), IntegerField())),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+
+
 class Categorias(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     categoria = models.CharField(max_length=50)
     essencial = models.BooleanField(default=False)
-    valor_planejado = models.FloatField()
+    valor_planejado = CentavosField()
+
+    objects = CategoriasQuerySet.as_manager()
     
     def __str__(self):
         return self.categoria
     
     def total_gasto(self):
-        from extrato.models import Valores
-        valores = Valores.objects.filter(categoria__id=self.id, user=self.user).filter(data__month=datetime.now().month)
-        total_valor = 0
-        for valor in valores:
-            total_valor += valor.valor
-        return total_valor
+        # Já anotado por Categorias.objects.com_gastos(): evita uma query por categoria
+        if hasattr(self, 'gasto_mes'):
+            return self.gasto_mes
+
+        from extrato.models import ResumoMensal
+        mes_atual = datetime.now().date().replace(day=1)
+        return ResumoMensal.objects.filter(categoria__id=self.id, user=self.user, mes=mes_atual).aggregate(total=Soma('total', default=0))['total']
 
     def calcula_percentual_gasto_por_categoria(self):
-        
+        if hasattr(self, 'percentual_gasto'):
+            return self.percentual_gasto
+
         try:
             return int((self.total_gasto() * 100) / self.valor_planejado)
         except:
@@ -44,7 +73,8 @@ class Conta(models.Model):
     apelido = models.CharField(max_length=50)
     banco = models.CharField(max_length=2, choices=banco_choices)
     tipo = models.CharField(max_length=2, choices=tipo_choices)
-    valor = models.FloatField()
+    valor = CentavosField()
+    saldo_inicial = CentavosField(default=0)  # saldo no cadastro; valor = saldo_inicial + entradas - saídas
     icone = models.ImageField(upload_to='icones', blank=True, null=True)
 
     def __str__(self):
@@ -72,4 +102,32 @@ class UserProfile(models.Model):
     two_factor_enabled = models.BooleanField(default=False)
     
     def __str__(self):
-        return f"Perfil de {self.user.username}"
\ No newline at end of file
+        return f"Perfil de {self.user.username}"
+
+class RelatorioPDF(models.Model):
+    """PDF de relatório gerado em segundo plano (fila local, ver perfil.fila)."""
+    status_choices = (
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('pronto', 'Pronto'),
+        ('erro', 'Erro'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    chave = models.CharField(max_length=64)  # hash do usuário + filtros
+    versao = models.CharField(max_length=64)  # versão dos dados do usuário (perfil.relatorios.versao_relatorio)
+    filtros = models.JSONField(default=dict)
+    status = models.CharField(max_length=12, choices=status_choices, default='pendente')
+    arquivo = models.FileField(upload_to='relatorios', blank=True, null=True)
+    erro = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'chave', 'versao'], name='relatorio_user_chave_idx'),
+            models.Index(fields=['status', 'criado_em'], name='relatorio_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'Relatório {self.id} de {self.user} ({self.status})'
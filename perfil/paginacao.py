@@ -0,0 +1,119 @@
+"""Paginação por cursor (keyset) para listas de Valores.
+
+Em vez de OFFSET + COUNT, cada página filtra a partir da última linha vista
+usando a ordenação (campo, id). O custo de uma página profunda é o mesmo da
+primeira, e o índice (user, data, ...) de Valores é aproveitado.
+"""
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _codificar(direcao, valor, pk):
+    texto = f'{direcao}|{valor.isoformat() if hasattr(valor, "isoformat") else valor}|{pk}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar(cursor, campo_modelo):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direcao, valor, pk = texto.split('|')
+        if direcao not in ('n', 'p'):
+            raise ValueError(direcao)
+        return direcao, campo_modelo.to_python(valor), int(pk)
+    except (ValueError, ValidationError, binascii.Error, UnicodeDecodeError) as e:
+        raise CursorInvalido(cursor) from e
+
+
+class PaginaCursor:
+    """One page of a keyset pagination; iterable like a Paginator page."""
+
+    def __init__(self, object_list, proximo_cursor, cursor_anterior, total_aproximado=None, total_exato=True):
+        self.object_list = object_list
+        self.proximo_cursor = proximo_cursor
+        self.cursor_anterior = cursor_anterior
+        self.total_aproximado = total_aproximado
+        self.total_exato = total_exato
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.proximo_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def conta_aproximado(queryset, limite=1000):
+    """Count at most `limite` rows. Returns (total, exato); exato is False when the limit was hit."""
+    total = queryset.order_by()[:limite + 1].count()
+    if total > limite:
+        return limite, False
+    return total, True
+
+
+def paginar_por_cursor(queryset, ordem='-data', cursor=None, por_pagina=20, contar=False):
+    """Return a PaginaCursor of `queryset` ordered by (`ordem`, id).
+
+    `ordem` is a field name, optionally prefixed with '-' for descending order.
+    With `contar=True` the page also carries an approximate total (see conta_aproximado).
+    Raises CursorInvalido for a malformed cursor.
+    """
+    decrescente = ordem.startswith('-')
+    campo = ordem.lstrip('-')
+    campo_modelo = queryset.model._meta.get_field(campo)
+    base = queryset
+
+    direcao = 'n'
+    if cursor:
+        direcao, valor, pk = _decodificar(cursor, campo_modelo)
+        # 'n' avança no sentido da ordenação; 'p' volta no sentido contrário
+        para_tras = direcao == 'p'
+        lookup = 'gt' if decrescente == para_tras else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{campo}__{lookup}': valor}) | Q(**{campo: valor, f'id__{lookup}': pk})
+        )
+
+    ordenacao = [ordem, '-id' if decrescente else 'id']
+    if direcao == 'p':
+        ordenacao = [o[1:] if o.startswith('-') else f'-{o}' for o in ordenacao]
+
+    linhas = list(queryset.order_by(*ordenacao)[:por_pagina + 1])
+    ha_mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if direcao == 'p':
+        linhas.reverse()
+
+    proximo = anterior = None
+    if linhas:
+        primeira, ultima = linhas[0], linhas[-1]
+        if direcao == 'n':
+            if ha_mais:
+                proximo = _codificar('n', getattr(ultima, campo), ultima.pk)
+            if cursor:
+                anterior = _codificar('p', getattr(primeira, campo), primeira.pk)
+        else:
+            proximo = _codificar('n', getattr(ultima, campo), ultima.pk)
+            if ha_mais:
+                anterior = _codificar('p', getattr(primeira, campo), primeira.pk)
+
+    pagina = PaginaCursor(linhas, proximo, anterior)
+    if contar:
+        pagina.total_aproximado, pagina.total_exato = conta_aproximado(base)
+    return pagina
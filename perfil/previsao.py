@@ -0,0 +1,199 @@
+"""Previsão de fluxo de caixa: saldo diário de cada conta nos próximos meses.
+
+A previsão parte do saldo atual (Conta.valor) e soma, dia a dia:
+
+- as contas a pagar (ContaPagar) em cada vencimento a partir de
+  `proximo_vencimento` (as vencidas entram no primeiro dia), na conta que mais
+  recebe saídas da categoria da conta a pagar;
+- o perfil mensal do histórico: a média por mês das entradas e saídas de cada
+  conta em cada dia do mês, nos últimos MESES_HISTORICO meses completos;
+- o planejamento: numa categoria com valor_planejado, as saídas previstas somam o
+  planejado em vez da média histórica. Das duas formas, o que já está nas contas a
+  pagar da categoria é descontado, para não contar a mesma despesa duas vezes.
+
+O histórico vem de duas consultas agrupadas (nada de ORM por linha) e a projeção
+é feita sobre listas de deltas diários em centavos, acumuladas por conta. O
+resultado fica no cache por usuário (perfil.cache), então volta a ser calculado
+só quando os dados mudam ou o dia vira.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.db.models import Min
+from django.db.models.functions import ExtractDay
+
+from contas.models import ContaPagar
+from contas.vencimentos import vencimento_seguinte
+from core.dinheiro import Soma, de_centavos, para_centavos
+from extrato.models import Valores
+
+from .cache import em_cache
+from .models import Categorias, Conta
+
+MESES_HISTORICO = 6
+MESES_PADRAO = 3
+MESES_MAXIMO = 12
+
+
+def _somar_meses(data, meses):
+    total = data.year * 12 + data.month - 1 + meses
+    ano, mes = divmod(total, 12)
+    return date(ano, mes + 1, min(data.day, calendar.monthrange(ano, mes + 1)[1]))
+
+
+def _meses_entre(inicio, fim):
+    return (fim.year - inicio.year) * 12 + fim.month - inicio.month
+
+
+def _historico(user, hoje):
+    """Monthly means in cents: {(conta_id, categoria_id, tipo, dia): media} and the number of months used."""
+    fim = hoje.replace(day=1)
+    inicio = _somar_meses(fim, -MESES_HISTORICO)
+    valores = Valores.objects.filter(user=user, data__gte=inicio, data__lt=fim)
+
+    primeiro = valores.aggregate(primeiro=Min('data'))['primeiro']
+    if primeiro is None:
+        return {}, 0
+    # Usuário com menos histórico que a janela: a média é sobre os meses que ele tem
+    meses = _meses_entre(primeiro.replace(day=1), fim)
+
+    agrupado = (
+        valores.annotate(dia=ExtractDay('data'))
+        .values('conta_id', 'categoria_id', 'tipo', 'dia')
+        .annotate(total=Soma('valor'))
+        .order_by()
+    )
+    return {
+        (item['conta_id'], item['categoria_id'], item['tipo'], item['dia']): para_centavos(item['total']) / meses
+        for item in agrupado
+    }, meses
+
+
+def _conta_por_categoria(historico, contas):
+    """Account that takes most of each category's saídas, and the one with most saídas overall."""
+    por_categoria = defaultdict(lambda: defaultdict(float))
+    geral = defaultdict(float)
+    for (conta_id, categoria_id, tipo, _), media in historico.items():
+        if tipo == 'S':
+            por_categoria[categoria_id][conta_id] += media
+            geral[conta_id] += media
+    principal = max(geral, key=geral.get) if geral else contas[0].id
+    escolhida = {categoria_id: max(totais, key=totais.get) for categoria_id, totais in por_categoria.items()}
+    return escolhida, principal
+
+
+def _perfis_diarios(historico, categorias, fixas, conta_categoria, conta_principal, contas):
+    """Expected net flow (cents) of each account on each day of the month: {conta_id: [0] + 31 days}."""
+    perfis = {conta.id: [0.0] * 32 for conta in contas}
+
+    media_categoria = defaultdict(float)
+    for (_, categoria_id, tipo, _), media in historico.items():
+        if tipo == 'S':
+            media_categoria[categoria_id] += media
+
+    # Fator que leva a média histórica da categoria ao alvo (planejado ou histórico) menos as contas fixas
+    fator = {}
+    for categoria in categorias:
+        planejado = para_centavos(categoria.valor_planejado)
+        alvo = planejado if planejado > 0 else media_categoria[categoria.id]
+        restante = max(0.0, alvo - fixas.get(categoria.id, 0))
+        if media_categoria[categoria.id] > 0:
+            fator[categoria.id] = restante / media_categoria[categoria.id]
+        elif restante > 0:
+            # Planejado sem histórico: distribuído igualmente pelo mês (os dias que passam
+            # do fim do mês caem no último, então o mês soma exatamente o restante)
+            conta_id = conta_categoria.get(categoria.id, conta_principal)
+            for dia in range(1, 32):
+                perfis[conta_id][dia] -= restante / 31
+
+    for (conta_id, categoria_id, tipo, dia), media in historico.items():
+        if conta_id not in perfis:
+            continue
+        if tipo == 'E':
+            perfis[conta_id][dia] += media
+        else:
+            perfis[conta_id][dia] -= media * fator.get(categoria_id, 1.0)
+    return perfis
+
+
+def _por_tamanho_do_mes(perfil):
+    """The 31-day profile folded for months of 28 to 31 days (days past the end fall on the last day)."""
+    return {
+        tamanho: perfil[:tamanho] + [sum(perfil[tamanho:])]
+        for tamanho in (28, 29, 30, 31)
+    }
+
+
+def calcular(user, meses=MESES_PADRAO, hoje=None):
+    """Daily projected balance of each account from tomorrow to `meses` months ahead."""
+    hoje = hoje or date.today()
+    fim = _somar_meses(hoje, meses)
+    datas = [hoje + timedelta(days=i) for i in range(1, (fim - hoje).days + 1)]
+
+    contas = list(Conta.objects.filter(user=user).order_by('id'))
+    if not contas:
+        return {'inicio': hoje.isoformat(), 'meses': meses, 'datas': [], 'contas': [], 'total': [], 'contas_a_pagar': [], 'historico_meses': 0}
+
+    categorias = list(Categorias.objects.filter(user=user))
+    contas_pagar = list(ContaPagar.objects.filter(user=user, proximo_vencimento__isnull=False))
+    historico, meses_historico = _historico(user, hoje)
+    conta_categoria, conta_principal = _conta_por_categoria(historico, contas)
+
+    fixas = defaultdict(int)
+    for conta_pagar in contas_pagar:
+        fixas[conta_pagar.categoria_id] += para_centavos(conta_pagar.valor)
+
+    perfis = _perfis_diarios(historico, categorias, fixas, conta_categoria, conta_principal, contas)
+    dobrados = {conta_id: _por_tamanho_do_mes(perfil) for conta_id, perfil in perfis.items()}
+
+    # Deltas diários por conta: o perfil do dia do mês de cada data
+    deltas = {
+        conta_id: [dobrado[calendar.monthrange(dia.year, dia.month)[1]][dia.day] for dia in datas]
+        for conta_id, dobrado in dobrados.items()
+    }
+
+    indice = {dia: i for i, dia in enumerate(datas)}
+    eventos = []
+    for conta_pagar in contas_pagar:
+        conta_id = conta_categoria.get(conta_pagar.categoria_id, conta_principal)
+        valor = para_centavos(conta_pagar.valor)
+        vencimento = conta_pagar.proximo_vencimento
+        while vencimento <= fim:
+            # Vencida e não paga: sai logo no primeiro dia da previsão
+            i = indice.get(vencimento, 0)
+            deltas[conta_id][i] -= valor
+            eventos.append((datas[i], conta_pagar.titulo, valor))
+            vencimento = vencimento_seguinte(conta_pagar.dia_pagamento, vencimento)
+
+    series = []
+    total = [0] * len(datas)
+    for conta in contas:
+        saldos = list(accumulate(deltas[conta.id], initial=para_centavos(conta.valor)))[1:]
+        saldos = [round(saldo) for saldo in saldos]
+        total = [a + b for a, b in zip(total, saldos)]
+        series.append({'id': conta.id, 'apelido': conta.apelido, 'saldos': [float(de_centavos(s)) for s in saldos]})
+
+    menor = min(range(len(total)), key=total.__getitem__) if total else None
+    eventos.sort()
+    return {
+        'inicio': hoje.isoformat(),
+        'meses': meses,
+        'historico_meses': meses_historico,
+        'datas': [dia.isoformat() for dia in datas],
+        'contas': series,
+        'total': [float(de_centavos(s)) for s in total],
+        'saldo_final': float(de_centavos(total[-1])) if total else 0.0,
+        'menor_saldo': {'data': datas[menor].isoformat(), 'valor': float(de_centavos(total[menor]))} if menor is not None else None,
+        'contas_a_pagar': [
+            {'data': dia.isoformat(), 'titulo': titulo, 'valor': float(de_centavos(valor))}
+            for dia, titulo, valor in eventos[:10]
+        ],
+    }
+
+
+def previsao(user, meses=MESES_PADRAO, hoje=None):
+    """calcular() cached per user, day and horizon (recomputed when the user's data changes)."""
+    hoje = hoje or date.today()
+    return em_cache(user, 'previsao', f'{hoje.isoformat()}:{meses}', lambda: calcular(user, meses, hoje))
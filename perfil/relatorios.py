@@ -0,0 +1,182 @@
+"""Filtros e exportação dos relatórios de movimentações."""
+import csv
+import hashlib
+import json
+from datetime import date, datetime
+from io import BytesIO
+
+from django.utils.dateparse import parse_date
+
+from extrato import busca
+from extrato.models import Valores
+
+from .cache import versao_dados
+
+CABECALHO = ['Conta', 'Categoria', 'Data', 'Tipo', 'Valor', 'Descrição']
+CAMPOS_FILTRO = ('conta', 'categoria', 'start_date', 'end_date', 'search')
+
+
+def _data(texto):
+    try:
+        return parse_date(texto) if texto else None
+    except ValueError:
+        return None
+
+
+def filtrar_valores(user, params):
+    """Return the user's Valores matching the relatorios filters in `params` (a QueryDict).
+
+    Without start_date/end_date the current month is used; with either of them the
+    range is arbitrary (e.g. a whole year for exports).
+    """
+    valores = Valores.objects.filter(user=user)
+
+    start_date = _data(params.get('start_date'))
+    end_date = _data(params.get('end_date'))
+    if start_date or end_date:
+        if start_date:
+            valores = valores.filter(data__gte=start_date)
+        if end_date:
+            valores = valores.filter(data__lte=end_date)
+    else:
+        valores = valores.do_mes_atual()
+
+    conta_get = params.get('conta')
+    categoria_get = params.get('categoria')
+    search = params.get('search')
+
+    if conta_get:
+        valores = valores.filter(conta__id=conta_get)
+    if categoria_get:
+        valores = valores.filter(categoria__id=categoria_get)
+    if search:
+        valores = busca.filtrar(valores, search, user)
+
+    return valores
+
+
+class _Eco:
+    """File-like object whose write() just returns the line, for csv.writer in a generator."""
+
+    def write(self, value):
+        return value
+
+
+def linhas_csv(valores, chunk_size=2000):
+    """Yield the CSV export of `valores` line by line, with constant memory.
+
+    Related names come from the same query (no per-row lookups) and rows are
+    fetched from the database cursor in chunks of `chunk_size`.
+    """
+    writer = csv.writer(_Eco())
+    yield writer.writerow(CABECALHO)
+
+    linhas = valores.order_by('data', 'id').values_list(
+        'conta__apelido', 'categoria__categoria', 'data', 'tipo', 'valor', 'descricao',
+    )
+    for conta, categoria, data, tipo, valor, descricao in linhas.iterator(chunk_size=chunk_size):
+        yield writer.writerow([conta, categoria or 'Sem categoria', data, tipo, valor, descricao])
+
+
+def normalizar_filtros(params):
+    """Return the relatorios filters of `params` as a plain dict with an explicit date range.
+
+    The implicit "current month" is made explicit so that a job queued now still
+    covers the same period when a worker builds it later.
+    """
+    filtros = {campo: params.get(campo) for campo in CAMPOS_FILTRO if params.get(campo)}
+    if not (_data(filtros.get('start_date')) or _data(filtros.get('end_date'))):
+        hoje = date.today()
+        inicio = hoje.replace(day=1)
+        fim = date(hoje.year + 1, 1, 1) if hoje.month == 12 else date(hoje.year, hoje.month + 1, 1)
+        filtros['start_date'] = inicio.isoformat()
+        filtros['end_date'] = date.fromordinal(fim.toordinal() - 1).isoformat()
+    return filtros
+
+
+def chave_filtros(user, filtros):
+    """Hash identifying a user + filter set; used to name and reuse cached artifacts."""
+    texto = json.dumps({'user': user.pk, 'filtros': filtros}, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def versao_relatorio(user):
+    """Fingerprint of the data a report of `user` is built from.
+
+    Comes from the user's data version (perfil.cache), which every write bumps:
+    new, edited or deleted rows, and renamed accounts or categories (the PDF shows their names).
+    """
+    texto = f'{user.pk}:{versao_dados(user)}'
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def gerar_pdf(valores):
+    """Build the relatorios PDF for `valores` and return its bytes."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib import colors
+
+    # Related names come from the same query: no per-row conta/categoria lookups
+    linhas = list(valores.order_by('data', 'id').values_list(
+        'conta__apelido', 'categoria__categoria', 'data', 'tipo', 'valor', 'descricao',
+    ))
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+
+    # Add title
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#064E3B'),
+        spaceAfter=12,
+        alignment=1  # Center
+    )
+    elements.append(Paragraph('Relatório de Movimentações', title_style))
+    elements.append(Spacer(1, 12))
+
+    # Add info
+    info_style = styles['Normal']
+    info_text = f'<b>Data de Geração:</b> {datetime.now().strftime("%d/%m/%Y %H:%M")}<br/><b>Total de Movimentações:</b> {len(linhas)}'
+    elements.append(Paragraph(info_text, info_style))
+    elements.append(Spacer(1, 12))
+
+    # Create table data
+    table_data = [CABECALHO]
+
+    for conta, categoria, data, tipo, valor, descricao in linhas:
+        table_data.append([
+            str(conta),
+            str(categoria) if categoria else 'Sem categoria',
+            data.strftime('%d/%m/%Y'),
+            'Saída' if tipo == 'S' else 'Entrada',
+            f'R$ {valor:.2f}',
+            str(descricao)[:30]
+        ])
+
+    if not linhas:
+        table_data.append(['', '', '', '', '', 'Nenhuma movimentação encontrada'])
+
+    # Create table with style
+    table = Table(table_data, colWidths=[1.2*inch, 1.2*inch, 1*inch, 0.8*inch, 1*inch, 1.8*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#064E3B')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')])
+    ]))
+
+    elements.append(table)
+
+    doc.build(elements)
+    return buffer.getvalue()
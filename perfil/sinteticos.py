@@ -0,0 +1,169 @@
+"""Geração de dados sintéticos (usuários, contas, categorias, valores e contas a pagar).
+
+Usado pelo comando `gerar_dados` para popular um banco de benchmark em escalas de
+mil a dez milhões de movimentações. Os Valores são gerados por um gerador e
+inseridos com bulk_create em lotes, então a memória não cresce com a escala; o
+ResumoMensal, os saldos e o índice de busca são recalculados no final com as
+rotinas set-based de extrato.resumo, extrato.saldos e extrato.busca.
+"""
+import random
+from datetime import date, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from contas.models import ContaPaga, ContaPagar
+from core.dinheiro import para_decimal
+from contas.vencimentos import vencimento_em
+from extrato import busca, categorizacao, resumo, saldos
+from extrato.models import Valores
+
+from .models import Categorias, Conta
+
+PREFIXO = 'bench'
+
+# (nome, essencial, valor médio de uma saída, peso na escolha)
+CATEGORIAS = [
+    ('Moradia', True, 1800, 1),
+    ('Mercado', True, 180, 8),
+    ('Transporte', True, 35, 10),
+    ('Saúde', True, 150, 2),
+    ('Educação', True, 600, 1),
+    ('Contas de casa', True, 220, 3),
+    ('Restaurantes', False, 70, 8),
+    ('Lazer', False, 90, 4),
+    ('Assinaturas', False, 40, 3),
+    ('Compras', False, 160, 5),
+    ('Viagens', False, 900, 1),
+    ('Pets', False, 120, 2),
+]
+
+DESCRICOES = {
+    'Moradia': ['Aluguel', 'Condomínio', 'IPTU'],
+    'Mercado': ['Supermercado', 'Feira', 'Padaria', 'Hortifruti'],
+    'Transporte': ['Uber', '99', 'Combustível', 'Metrô', 'Estacionamento'],
+    'Saúde': ['Farmácia', 'Consulta', 'Plano de saúde', 'Exames'],
+    'Educação': ['Mensalidade', 'Curso online', 'Livros'],
+    'Contas de casa': ['Energia', 'Água', 'Internet', 'Gás', 'Celular'],
+    'Restaurantes': ['iFood', 'Almoço', 'Jantar', 'Cafeteria', 'Lanchonete'],
+    'Lazer': ['Cinema', 'Show', 'Bar', 'Ingresso'],
+    'Assinaturas': ['Netflix', 'Spotify', 'Academia', 'Nuvem'],
+    'Compras': ['Roupas', 'Eletrônicos', 'Presentes', 'Casa e decoração'],
+    'Viagens': ['Passagem aérea', 'Hotel', 'Aluguel de carro'],
+    'Pets': ['Ração', 'Veterinário', 'Pet shop'],
+}
+
+ENTRADAS = [('Salário', 6500), ('Freelance', 1200), ('Rendimentos', 90), ('Reembolso', 150), ('Pix recebido', 200)]
+
+BANCOS = [codigo for codigo, _ in Conta.banco_choices]
+
+CONTAS_PAGAR = [
+    ('Aluguel', 'Moradia', 1800), ('Energia', 'Contas de casa', 210), ('Internet', 'Contas de casa', 120),
+    ('Plano de saúde', 'Saúde', 450), ('Academia', 'Assinaturas', 110), ('Streaming', 'Assinaturas', 55),
+    ('Escola', 'Educação', 900), ('Condomínio', 'Moradia', 600), ('Celular', 'Contas de casa', 60),
+    ('Seguro do carro', 'Transporte', 230),
+]
+
+
+def _valor(media, rnd):
+    # Distribuição assimétrica: muitos gastos pequenos e alguns grandes
+    return para_decimal(max(1.0, rnd.lognormvariate(0, 0.6) * media * 0.85))
+
+
+def _valores(user, contas, categorias, quantidade, inicio, dias, rnd):
+    """Yield `quantidade` unsaved Valores for `user`, spread over `dias` days from `inicio`."""
+    pesos = [peso for _, _, _, peso in CATEGORIAS]
+    for _ in range(quantidade):
+        data = inicio + timedelta(days=rnd.randrange(dias))
+        conta = rnd.choice(contas)
+        if rnd.random() < 0.12:
+            descricao, media = rnd.choice(ENTRADAS)
+            yield Valores(user=user, valor=_valor(media, rnd), categoria=None, descricao=descricao, data=data, conta=conta, tipo='E')
+        else:
+            nome, _, media, _ = rnd.choices(CATEGORIAS, weights=pesos)[0]
+            descricao = rnd.choice(DESCRICOES[nome])
+            yield Valores(user=user, valor=_valor(media, rnd), categoria=categorias[nome], descricao=descricao, data=data, conta=conta, tipo='S')
+
+
+@transaction.atomic
+def remover_usuarios(prefixo=PREFIXO):
+    """Delete the synthetic users (and their data) created with `prefixo`."""
+    users = User.objects.filter(username__startswith=f'{prefixo}_')
+    # Valores tem receivers de post_delete (índice de busca): o delete() do ORM carregaria
+    # e apagaria linha a linha. Um DELETE direto e a limpeza do índice por usuário resolvem
+    # em poucos comandos; ResumoMensal, contas e o modelo de categorias saem em cascata com o usuário.
+    user_ids = list(users.values_list('id', flat=True))
+    for user_id in user_ids:
+        busca.remover_do_usuario(user_id)
+    if user_ids:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Valores._meta.db_table} WHERE user_id IN ({", ".join(["%s"] * len(user_ids))})', user_ids,
+            )
+    # Valores e ContaPagar usam DO_NOTHING: precisam sair antes das contas e categorias
+    ContaPaga.objects.filter(conta__user__in=users).delete()
+    ContaPagar.objects.filter(user__in=users).delete()
+    return users.delete()[1].get('auth.User', 0)
+
+
+def gerar(usuarios=1, transacoes=1000, meses=24, contas=3, contas_pagar=8, lote=5000, seed=42, prefixo=PREFIXO):
+    """Create synthetic data and yield (username, inserted rows) as progress.
+
+    `transacoes` is the total number of Valores, split evenly between the users.
+    The generated data is deterministic for a given `seed`.
+    """
+    rnd = random.Random(seed)
+    senha = make_password(prefixo)
+    hoje = date.today()
+    inicio = (hoje.replace(day=1) - timedelta(days=31 * (meses - 1))).replace(day=1)
+    dias = (hoje - inicio).days + 1
+
+    por_usuario, resto = divmod(transacoes, usuarios)
+    # Continua do maior sufixo: usuários apagados à mão deixam buracos na numeração
+    sufixos = User.objects.filter(username__startswith=f'{prefixo}_').values_list('username', flat=True)
+    inicial = max((int(sufixo) for sufixo in (nome[len(prefixo) + 1:] for nome in sufixos) if sufixo.isdigit()), default=0)
+
+    for i in range(usuarios):
+        username = f'{prefixo}_{inicial + i + 1}'
+        with transaction.atomic():
+            user = User.objects.create(username=username, email=f'{username}@example.com', password=senha)
+            lista_contas = []
+            for n in range(contas):
+                saldo = para_decimal(rnd.uniform(500, 20000))
+                lista_contas.append(Conta(user=user, apelido=f'Conta {n + 1}', banco=rnd.choice(BANCOS), tipo='pf', valor=saldo, saldo_inicial=saldo))
+            Conta.objects.bulk_create(lista_contas)
+            lista_contas = list(Conta.objects.filter(user=user))
+
+            categorias = {}
+            for nome, essencial, media, _ in CATEGORIAS:
+                categorias[nome] = Categorias(user=user, categoria=nome, essencial=essencial, valor_planejado=media * 4)
+            Categorias.objects.bulk_create(categorias.values())
+            categorias = {c.categoria: c for c in Categorias.objects.filter(user=user)}
+
+            contas_a_pagar = []
+            for titulo, categoria, valor in CONTAS_PAGAR[:contas_pagar]:
+                dia = rnd.randint(1, 31)
+                contas_a_pagar.append(ContaPagar(
+                    user=user, titulo=titulo, categoria=categorias[categoria], descricao=titulo, valor=valor,
+                    dia_pagamento=dia, proximo_vencimento=vencimento_em(dia, hoje.year, hoje.month),
+                ))
+            ContaPagar.objects.bulk_create(contas_a_pagar)
+
+        quantidade = por_usuario + (1 if i < resto else 0)
+        valores = _valores(user, lista_contas, categorias, quantidade, inicio, dias, rnd)
+        inseridos = 0
+        while True:
+            bloco = list(islice(valores, lote))
+            if not bloco:
+                break
+            Valores.objects.bulk_create(bloco, batch_size=lote)
+            inseridos += len(bloco)
+            yield username, inseridos
+
+        resumo.reconstruir(user)
+        saldos.reconciliar(user)
+        busca.reindexar(user)
+        categorizacao.retreinar(user)
+        yield username, inseridos
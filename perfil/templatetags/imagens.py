@@ -0,0 +1,11 @@
+from django import template
+
+from perfil.imagens import url_variante
+
+register = template.Library()
+
+
+@register.filter
+def variante(campo, rotulo='p'):
+    """URL of a pre-generated variant of an image field: {{ conta.icone|variante:'p.jpg' }}."""
+    return url_variante(campo, rotulo)
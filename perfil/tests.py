@@ -1,3 +1,327 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from contas.models import ContaPagar
+from core.dados_de_teste import DadosBasicos, nova_categoria, nova_conta, novo_usuario
+from extrato.models import Valores
+from . import imagens, previsao, sinteticos
+from .cache import invalidar_dados
+from .fila import enfileirar, recuperar_travados
+from .paginacao import CursorInvalido, _codificar, _decodificar, conta_aproximado, paginar_por_cursor
+from .models import Categorias, Conta, RelatorioPDF
+
+
+@override_settings(RELATORIOS_PDF_WORKERS=0)
+class RelatorioPDFTests(DadosBasicos, TestCase):
+    """An exported PDF is reused only while the user's data has not changed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.valor = Valores.objects.create(
+            user=cls.user, valor=10, categoria=cls.categoria, descricao='feira', data=date(2024, 1, 5), conta=cls.conta, tipo='S',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_mesmos_dados_reaproveitam_o_pedido(self):
+        self.assertEqual(enfileirar(self.user, {}).id, enfileirar(self.user, {}).id)
+
+    def test_renomear_categoria_gera_nova_versao(self):
+        antes = enfileirar(self.user, {})
+        self.client.post(f'/perfil/update_categoria/{self.categoria.id}', {'categoria': 'Feira'})
+        self.assertNotEqual(enfileirar(self.user, {}).versao, antes.versao)
+
+    def _parar(self, relatorio, status, minutos):
+        # atualizado_em tem auto_now: só um update direto consegue envelhecer a linha
+        RelatorioPDF.objects.filter(id=relatorio.id).update(status=status, atualizado_em=timezone.now() - timedelta(minutes=minutos))
+
+    @override_settings(RELATORIOS_PDF_TIMEOUT=600)
+    def test_pedido_travado_volta_para_a_fila(self):
+        relatorio = enfileirar(self.user, {})
+        self._parar(relatorio, 'processando', 30)
+
+        reaproveitado = enfileirar(self.user, {})
+        self.assertEqual(reaproveitado.id, relatorio.id)
+        self.assertEqual(reaproveitado.status, 'pendente')
+        self.assertGreater(reaproveitado.atualizado_em, timezone.now() - timedelta(minutes=1))
+
+    @override_settings(RELATORIOS_PDF_TIMEOUT=600)
+    def test_recuperar_travados_ignora_pedidos_recentes(self):
+        travado = enfileirar(self.user, {})
+        self._parar(travado, 'processando', 30)
+        recente = enfileirar(self.user, {'search': 'feira'})
+        self._parar(recente, 'processando', 1)
+
+        self.assertEqual(recuperar_travados(), 1)
+        self.assertEqual(RelatorioPDF.objects.get(id=travado.id).status, 'pendente')
+        self.assertEqual(RelatorioPDF.objects.get(id=recente.id).status, 'processando')
+
+
+class PrevisaoTests(DadosBasicos, TestCase):
+    """Forecast from 2026-01-21 to 2026-02-20 (hoje = 2026-01-20, one month)."""
+
+    hoje = date(2026, 1, 20)
+    saldo_conta = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lazer = nova_categoria(cls.user, 'Lazer')
+
+    def historico(self, meses, dia, valor, tipo, categoria=None):
+        Valores.objects.bulk_create([
+            Valores(user=self.user, valor=valor, categoria=categoria, descricao='x', data=date(2025, mes, dia), conta=self.conta, tipo=tipo)
+            for mes in meses
+        ])
+
+    def saldo(self, resultado, dia):
+        return resultado['total'][resultado['datas'].index(dia)]
+
+    def test_projeta_o_perfil_diario_do_historico(self):
+        # Só dois meses de histórico: a média é sobre eles, não sobre a janela de seis
+        self.historico((11, 12), 5, 3000, 'E')
+        resultado = previsao.calcular(self.user, 1, self.hoje)
+
+        self.assertEqual(resultado['historico_meses'], 2)
+        self.assertEqual((resultado['datas'][0], resultado['datas'][-1]), ('2026-01-21', '2026-02-20'))
+        self.assertEqual(self.saldo(resultado, '2026-02-04'), 1000.0)
+        self.assertEqual(self.saldo(resultado, '2026-02-05'), 4000.0)
+        self.assertEqual(resultado['contas'][0]['saldos'], resultado['total'])
+
+    def test_contas_vencidas_ou_de_hoje_entram_no_primeiro_dia(self):
+        ContaPagar.objects.create(user=self.user, titulo='Luz', categoria=self.categoria, descricao='', valor=100, dia_pagamento=10, proximo_vencimento=date(2026, 1, 10))
+        ContaPagar.objects.create(user=self.user, titulo='Internet', categoria=self.categoria, descricao='', valor=50, dia_pagamento=20, proximo_vencimento=self.hoje)
+        resultado = previsao.calcular(self.user, 1, self.hoje)
+
+        self.assertEqual(resultado['total'][0], 850.0)
+        self.assertEqual(
+            [(conta['data'], conta['titulo']) for conta in resultado['contas_a_pagar']],
+            [('2026-01-21', 'Internet'), ('2026-01-21', 'Luz'), ('2026-02-10', 'Luz'), ('2026-02-20', 'Internet')],
+        )
+        self.assertEqual(resultado['saldo_final'], 700.0)
+
+    def test_planejado_substitui_o_historico_e_desconta_contas_fixas(self):
+        Categorias.objects.filter(id=self.lazer.id).update(valor_planejado=900)
+        meses = range(7, 13)
+        self.historico(meses, 15, 600, 'S', self.categoria)
+        self.historico(meses, 15, 300, 'S', self.lazer)
+        ContaPagar.objects.create(user=self.user, titulo='Feira', categoria=self.categoria, descricao='', valor=200, dia_pagamento=28, proximo_vencimento=date(2026, 1, 28))
+        resultado = previsao.calcular(self.user, 1, self.hoje)
+
+        self.assertEqual(self.saldo(resultado, '2026-01-28'), 800.0)
+        # Mercado: média histórica 600 - 200 da conta fixa; Lazer: planejado 900 no lugar dos 300
+        self.assertEqual(self.saldo(resultado, '2026-02-14'), 800.0)
+        self.assertEqual(self.saldo(resultado, '2026-02-15'), -500.0)
+        self.assertEqual(resultado['menor_saldo'], {'data': '2026-02-15', 'valor': -500.0})
+
+    def test_planejado_sem_historico_se_espalha_pelo_mes(self):
+        Categorias.objects.filter(id=self.lazer.id).update(valor_planejado=310)
+        resultado = previsao.calcular(self.user, 1, self.hoje)
+
+        self.assertEqual(resultado['total'][0], 990.0)
+        # 31 dias de 10,00
+        self.assertEqual(resultado['saldo_final'], 690.0)
+
+    def test_sem_contas(self):
+        vazio = novo_usuario('sem_contas')
+        self.assertEqual(previsao.calcular(vazio, 3, self.hoje)['datas'], [])
+
+
+class ImagensTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        configuracao = override_settings(MEDIA_ROOT=media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def arquivo(self, modo='RGB', tamanho=(40, 20), formato='JPEG', **opcoes):
+        buffer = BytesIO()
+        Image.new(modo, tamanho, (200, 0, 0, 128) if modo == 'RGBA' else (200, 0, 0)).save(buffer, formato, **opcoes)
+        return SimpleUploadedFile(f'foto.{formato.lower()}', buffer.getvalue())
+
+    def abrir(self, nome):
+        with default_storage.open(nome) as arquivo:
+            imagem = Image.open(arquivo)
+            imagem.load()
+        return imagem
+
+    def test_gira_pelo_exif_e_remove_metadados(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: girar 90°
+        exif[0x010F] = 'Camera'
+        nome = imagens.processar(self.arquivo(exif=exif.tobytes()), 'icones')
+
+        self.assertRegex(nome, r'^icones/[0-9a-f]{32}\.jpg$')
+        principal = self.abrir(nome)
+        self.assertEqual(principal.size, (20, 40))
+        self.assertEqual(dict(principal.getexif()), {})
+        self.assertNotIn('icc_profile', principal.info)
+        self.assertEqual(self.abrir(imagens.nome_variante(nome, 'p')).format, 'WEBP')
+
+    def test_transparencia_vira_png(self):
+        nome = imagens.processar(self.arquivo('RGBA', formato='PNG'), 'icones')
+        self.assertTrue(nome.endswith('.png'))
+        self.assertEqual(self.abrir(nome).mode, 'RGBA')
+        # A variante JPEG não tem alfa: o fundo fica branco
+        self.assertEqual(self.abrir(imagens.nome_variante(nome, 'p', 'jpg')).mode, 'RGB')
+
+    def test_mesmo_conteudo_reaproveita_os_arquivos(self):
+        nome = imagens.processar(self.arquivo(), 'perfis')
+        arquivos = default_storage.listdir('perfis')[1]
+        self.assertEqual(imagens.processar(self.arquivo(), 'perfis'), nome)
+        self.assertEqual(default_storage.listdir('perfis')[1], arquivos)
+        self.assertEqual(len(arquivos), 5)  # principal + p/g em WebP e JPEG
+
+    def test_arquivo_invalido(self):
+        with self.assertRaises(imagens.ErroImagem):
+            imagens.processar(SimpleUploadedFile('foto.jpg', b'nada'), 'icones')
+
+    def test_variantes_e_arquivos_antigos(self):
+        nome = imagens.processar(self.arquivo(), 'perfis')
+        self.assertEqual(imagens.url_variante(Conta(icone=nome).icone, 'g.jpg'), default_storage.url(imagens.nome_variante(nome, 'g', 'jpg')))
+
+        # Nomes de uploads anteriores ao processamento usam o original
+        base = nome.split('/')[1][:32]
+        for antigo in (f'perfis/avatar_{base}.jpg', f'perfis/{"0" * 32}.jpg', ''):
+            campo = Conta(icone=antigo).icone
+            self.assertFalse(imagens.processado(antigo))
+            self.assertEqual(imagens.url_variante(campo), campo.url if antigo else '')
+
+    def test_comando_processa_imagens_antigas(self):
+        antigo = default_storage.save('icones/antigo.png', ContentFile(self.arquivo(formato='PNG').read()))
+        conta = nova_conta(novo_usuario('imagens'), icone=antigo)
+
+        call_command('processar_imagens', stdout=StringIO())
+        conta.refresh_from_db()
+        self.assertTrue(imagens.processado(conta.icone.name))
+        self.assertTrue(conta.icone.name.endswith('.jpg'))
+
+
+class SinteticosTests(TestCase):
+    def gerar(self, usuarios):
+        list(sinteticos.gerar(usuarios=usuarios, transacoes=20 * usuarios, meses=2, contas_pagar=2, prefixo='teste'))
+
+    def test_numeracao_continua_do_maior_sufixo(self):
+        self.gerar(3)
+        User.objects.get(username='teste_2').delete()
+        self.gerar(1)
+        self.assertEqual(
+            sorted(User.objects.filter(username__startswith='teste_').values_list('username', flat=True)),
+            ['teste_1', 'teste_3', 'teste_4'],
+        )
+
+    def test_remover_usuarios(self):
+        outro = novo_usuario('outro')
+        conta = nova_conta(outro)
+        Valores.objects.create(user=outro, valor=1, descricao='x', data=date(2024, 1, 5), conta=conta, tipo='S')
+        self.gerar(2)
+
+        self.assertEqual(sinteticos.remover_usuarios('teste'), 2)
+        self.assertEqual(list(Valores.objects.values_list('user', flat=True)), [outro.id])
+        self.assertFalse(User.objects.filter(username__startswith='teste_').exists())
+
+
+class PaginacaoTests(DadosBasicos, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Datas e valores repetidos: o desempate é sempre pelo id
+        dados = [(6, '3.00'), (5, '10.50'), (5, '0.10'), (5, '10.50'), (5, '2.00'), (4, '10.50'), (5, '0.20')]
+        Valores.objects.bulk_create([
+            Valores(user=cls.user, valor=valor, descricao='x', data=date(2024, 1, dia), conta=cls.conta, tipo='S')
+            for dia, valor in dados
+        ])
+        cls.valores = Valores.objects.filter(user=cls.user)
+
+    def percorrer(self, ordem):
+        """Ids of every page going forward, then of every page going back from the last one."""
+        paginas = [paginar_por_cursor(self.valores, ordem, por_pagina=2)]
+        while paginas[-1].has_next:
+            paginas.append(paginar_por_cursor(self.valores, ordem, paginas[-1].proximo_cursor, por_pagina=2))
+        voltando = [paginas[-1]]
+        while voltando[-1].has_previous:
+            voltando.append(paginar_por_cursor(self.valores, ordem, voltando[-1].cursor_anterior, por_pagina=2))
+        ids = lambda lista: [[valor.id for valor in pagina] for pagina in lista]
+        return ids(paginas), ids(reversed(voltando))
+
+    def test_datas_iguais_desempatam_pelo_id(self):
+        esperado = list(self.valores.order_by('-data', '-id').values_list('id', flat=True))
+        ida, volta = self.percorrer('-data')
+        self.assertEqual(sum(ida, []), esperado)
+        self.assertEqual(volta, ida)
+        self.assertEqual([len(pagina) for pagina in ida], [2, 2, 2, 1])
+
+    def test_ordem_por_valor(self):
+        esperado = list(self.valores.order_by('valor', 'id').values_list('id', flat=True))
+        ida, volta = self.percorrer('valor')
+        self.assertEqual(sum(ida, []), esperado)
+        self.assertEqual(volta, ida)
+
+        # O valor do cursor volta como Decimal pelo CentavosField.to_python
+        cursor = _codificar('n', Decimal('10.50'), 1)
+        self.assertEqual(_decodificar(cursor, Valores._meta.get_field('valor')), ('n', Decimal('10.50'), 1))
+
+    def test_cursor_invalido(self):
+        valido = paginar_por_cursor(self.valores, '-data', por_pagina=2).proximo_cursor
+        alterado = _codificar('x', date(2024, 1, 5), 1)
+        for cursor in ('lixo', valido[:-3], alterado, _codificar('n', 'ontem', 1), _codificar('n', date(2024, 1, 5), 'um')):
+            with self.assertRaises(CursorInvalido, msg=cursor):
+                paginar_por_cursor(self.valores, '-data', cursor)
+
+    def test_total_aproximado(self):
+        self.assertEqual(conta_aproximado(self.valores, limite=3), (3, False))
+        self.assertEqual(conta_aproximado(self.valores, limite=7), (7, True))
+        pagina = paginar_por_cursor(self.valores, '-data', por_pagina=2, contar=True)
+        self.assertEqual((pagina.total_aproximado, pagina.total_exato), (7, True))
+
+
+class GraficosETagTests(TestCase):
+    """The chart JSON endpoints answer 304 until the user's data version changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = novo_usuario('graficos')
+        cls.outro = novo_usuario('graficos_outro')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_revalidacao(self):
+        for url in ('/perfil/graficos/categorias/?year=2024&month=1', '/perfil/graficos/evolucao/?year=2024'):
+            with self.subTest(url=url):
+                resposta = self.client.get(url)
+                self.assertEqual(resposta.status_code, 200)
+                etag = resposta['ETag']
+                self.assertIn('no-cache', resposta['Cache-Control'])
+
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+                # Dados de outro usuário não mudam o ETag deste
+                invalidar_dados(self.outro)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+                invalidar_dados(self.user)
+                resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_etag_depende_do_periodo(self):
+        janeiro = self.client.get('/perfil/graficos/categorias/?year=2024&month=1')['ETag']
+        resposta = self.client.get('/perfil/graficos/categorias/?year=2024&month=2', HTTP_IF_NONE_MATCH=janeiro)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['month'], 2)
@@ -18,9 +18,14 @@ urlpatterns = [
     path('categorias/', views.categorias, name="categorias"),
     path('deletar_categoria/<int:id>', views.deletar_categoria, name="deletar_categoria"),
     path('dashboard/', views.dashboard, name="dashboard"),
+    path('graficos/categorias/', views.graficos_categorias, name="graficos_categorias"),
+    path('graficos/evolucao/', views.graficos_evolucao, name="graficos_evolucao"),
+    path('graficos/previsao/', views.graficos_previsao, name="graficos_previsao"),
     path('relatorios/', views.relatorios, name="relatorios"),
     path('relatorios/export_csv/', views.relatorios_export_csv, name='relatorios_export_csv'),
     path('relatorios/export_pdf/', views.relatorios_export_pdf, name='relatorios_export_pdf'),
+    path('relatorios/pdf/<int:id>/status/', views.relatorio_pdf_status, name='relatorio_pdf_status'),
+    path('relatorios/pdf/<int:id>/download/', views.relatorio_pdf_download, name='relatorio_pdf_download'),
     path('adicionar_valor/', views.adicionar_valor, name="adicionar_valor"),
     path('adicionar_entrada/', views.adicionar_entrada, name="adicionar_entrada"),
     path('adicionar_saida/', views.adicionar_saida, name="adicionar_saida"),
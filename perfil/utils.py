@@ -1,19 +1,104 @@
-from extrato.models import Valores
-from datetime import datetime
+from extrato.models import ResumoMensal
+from datetime import datetime, date
+from django.db.models import Q, QuerySet
+
+from core.dinheiro import ZERO, Soma
+
+MESES_NOMES = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
 
 def calcula_total(obj, campo):
-    total = 0
+    """Sum the money field `campo` over obj, exactly (Decimal).
+
+    Querysets are summed by the database over integer cents; other iterables in Python.
+    """
+    if isinstance(obj, QuerySet):
+        return obj.aggregate(total=Soma(campo, default=0))['total']
+
+    total = ZERO
     for i in obj:
         total += getattr(i, campo)
 
     return total
 
-def calcula_equilibrio_financeiro(user):
-    gastos_essenciais = Valores.objects.filter(user=user, data__month=datetime.now().month).filter(tipo='S').filter(categoria__essencial=True)
-    gastos_nao_essenciais = Valores.objects.filter(user=user, data__month=datetime.now().month).filter(tipo='S').filter(categoria__essencial=False)
+def calcula_evolucao_mensal(user, ano_inicial, ano_final=None):
+    """Return monthly labels and entradas/gastos totals from ano_inicial to ano_final (inclusive).
+
+    All months come from a single grouped query over ResumoMensal, pivoted on `tipo`
+    with conditional sums. Months without movement are filled with 0.
+    """
+    if ano_final is None:
+        ano_final = ano_inicial
+
+    agg = (
+        ResumoMensal.objects
+        .filter(user=user, mes__year__gte=ano_inicial, mes__year__lte=ano_final)
+        .values('mes')
+        .annotate(
+            entradas=Soma('total', filter=Q(tipo='E')),
+            gastos=Soma('total', filter=Q(tipo='S')),
+        )
+        .order_by('mes')
+    )
+    totais = {(item['mes'].year, item['mes'].month): item for item in agg}
+
+    meses_labels = []
+    entradas_data = []
+    gastos_data = []
+    for ano in range(ano_inicial, ano_final + 1):
+        for m in range(1, 13):
+            if ano_inicial == ano_final:
+                meses_labels.append(MESES_NOMES[m - 1])
+            else:
+                meses_labels.append(f'{MESES_NOMES[m - 1]}/{ano}')
+
+            item = totais.get((ano, m), {})
+            # Séries do Chart.js: o float só aparece aqui, na saída
+            entradas_data.append(float(item.get('entradas') or 0))
+            gastos_data.append(float(item.get('gastos') or 0))
+
+    return meses_labels, entradas_data, gastos_data
+
+def calcula_totais_do_mes(user, ano, mes):
+    """Return a month's entradas, saidas and the essenciais/nao_essenciais split of saídas.
+
+    Everything comes from one conditional-aggregate query over ResumoMensal; totals are exact Decimals.
+    """
+    return ResumoMensal.objects.filter(user=user, mes=date(ano, mes, 1)).aggregate(
+        entradas=Soma('total', filter=Q(tipo='E'), default=0),
+        saidas=Soma('total', filter=Q(tipo='S'), default=0),
+        essenciais=Soma('total', filter=Q(tipo='S', categoria__essencial=True), default=0),
+        nao_essenciais=Soma('total', filter=Q(tipo='S', categoria__essencial=False), default=0),
+    )
+
+def calcula_gastos_por_categoria(user, ano, mes):
+    """Return chart labels and values of the month's saídas grouped by categoria, largest first."""
+    agg = (
+        ResumoMensal.objects
+        .filter(user=user, mes=date(ano, mes, 1), tipo='S')
+        .values('categoria__categoria')
+        .annotate(total=Soma('total'))
+        .order_by('-total')
+    )
+
+    labels = []
+    values = []
+    for item in agg:
+        labels.append(item['categoria__categoria'] or 'Sem categoria')
+        values.append(float(item['total'] or 0))
+
+    return labels, values
+
+def calcula_equilibrio_financeiro(user, totais=None):
+    """Return the percentage of the current month's saídas in essential and non-essential categories.
+
+    `totais` may be a calcula_totais_do_mes() result already fetched by the caller.
+    """
+    if totais is None:
+        hoje = datetime.now()
+        totais = calcula_totais_do_mes(user, hoje.year, hoje.month)
 
-    total_gastos_essenciais = calcula_total(gastos_essenciais, 'valor')
-    total_gastos_nao_essenciais = calcula_total(gastos_nao_essenciais, 'valor')
+    total_gastos_essenciais = totais['essenciais']
+    total_gastos_nao_essenciais = totais['nao_essenciais']
 
     total = total_gastos_essenciais + total_gastos_nao_essenciais
     try:
@@ -22,4 +107,4 @@ def calcula_equilibrio_financeiro(user):
 
         return percentual_gastos_essenciais, percentual_gastos_nao_essenciais
     except:
-        return 0, 0
\ No newline at end of file
+        return 0, 0
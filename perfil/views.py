@@ -1,36 +1,36 @@
-from django.shortcuts import render, redirect
-from django.http import HttpResponse, HttpResponseRedirect
-from django.core.paginator import Paginator
-import csv
-from .models import Conta, Categorias, UserProfile
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.http import HttpResponseRedirect, StreamingHttpResponse, FileResponse, JsonResponse
+from .models import Conta, Categorias, UserProfile, RelatorioPDF
 from django.contrib import messages
 from django.contrib.messages import constants
-from .utils import calcula_total, calcula_equilibrio_financeiro
+from .relatorios import filtrar_valores, linhas_csv, normalizar_filtros
+from .fila import enfileirar
+from . import imagens, previsao
+from .paginacao import paginar_por_cursor, CursorInvalido
+from .cache import em_cache, invalidar_dados, invalidar_perfil, perfil_da_requisicao, versao_dados
+from core.dinheiro import para_decimal
+from .utils import calcula_total, calcula_equilibrio_financeiro, calcula_evolucao_mensal, calcula_totais_do_mes, calcula_gastos_por_categoria
 from extrato.models import Valores
-from datetime import datetime
-from django.db.models import Sum
+from extrato import categorizacao, resumo, saldos
+from django.db import transaction
+from datetime import date, datetime
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 
-def get_evolution_data(year: int, user):
-    """Return monthly labels and totals for entradas and gastos for a given year."""
-    meses_nomes = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    meses_labels = []
-    entradas_data = []
-    gastos_data = []
+def get_evolution_data(year: int, user, end_year: int = None):
+    """Return monthly labels and totals for entradas and gastos for a given year (or range of years)."""
+    return calcula_evolucao_mensal(user, year, end_year)
 
-    for m in range(1, 13):
-        meses_labels.append(meses_nomes[m - 1])
-
-        entradas_total = Valores.objects.filter(user=user, data__year=year, data__month=m, tipo='E').aggregate(total=Sum('valor'))
-        gastos_total = Valores.objects.filter(user=user, data__year=year, data__month=m, tipo='S').aggregate(total=Sum('valor'))
-
-        entradas_data.append(float(entradas_total['total'] or 0))
-        gastos_data.append(float(gastos_total['total'] or 0))
-
-    return meses_labels, entradas_data, gastos_data
+def querystring_sem_cursor(request):
+    """Current GET params without 'cursor', for building pagination links."""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    return params.urlencode()
 
 def login_view(request):
     if request.method == 'POST':
@@ -92,77 +92,76 @@ def logout_view(request):
 def landing(request):
     return render(request, 'index.html')
 
-@login_required(login_url='login')
-def home(request):
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-    meses_labels, entradas_data, gastos_data = get_evolution_data(current_year, request.user)
-
-    valores = Valores.objects.filter(user=request.user, data__month=current_month)
-    entradas = valores.filter(tipo='E')
-    saidas = valores.filter(tipo='S')
+def _dados_home(user, ano, mes):
+    """Everything home.html shows for `user` in ano/mes, as plain (cacheable) data."""
+    meses_labels, entradas_data, gastos_data = get_evolution_data(ano, user)
 
-    total_entradas = calcula_total(entradas, 'valor')
-    total_saidas = calcula_total(saidas, 'valor')
+    totais = calcula_totais_do_mes(user, ano, mes)
+    total_entradas = totais['entradas']
+    total_saidas = totais['saidas']
 
-    contas = Conta.objects.filter(user=request.user)
+    contas = list(Conta.objects.filter(user=user))
     total_contas = calcula_total(contas, 'valor')
     
-    # Calcular saldo geral: Saldo das contas + Entradas - Saídas
-    saldo_geral = float(total_contas) + float(total_entradas) - float(total_saidas)
+    # Calcular saldo geral: Saldo das contas + Entradas - Saídas (Decimal, sem erro de arredondamento)
+    saldo_geral = total_contas + total_entradas - total_saidas
 
-    percentual_gastos_essenciais, percentual_gastos_nao_essenciais = calcula_equilibrio_financeiro(request.user)
+    percentual_gastos_essenciais, percentual_gastos_nao_essenciais = calcula_equilibrio_financeiro(user, totais)
 
     # Gastos por categoria (mês atual)
-    queryset = Valores.objects.filter(user=request.user, data__year=current_year, data__month=current_month, tipo='S')
-    agg = queryset.values('categoria__categoria').annotate(total=Sum('valor')).order_by('-total')
-
-    labels = []
-    values = []
-    for item in agg:
-        labels.append(item['categoria__categoria'] or 'Sem categoria')
-        total = item['total'] or 0
-        try:
-            values.append(float(total))
-        except Exception:
-            values.append(0.0)
+    labels, values = calcula_gastos_por_categoria(user, ano, mes)
 
     # generate colors (cycle palette)
     palette = ['#10B981', '#06b6d4', '#f97316', '#ef4444', '#60a5fa', '#7c3aed', '#f59e0b', '#14b8a6']
     colors = [palette[i % len(palette)] for i in range(len(labels))]
 
     # Get user's categorias for planning display
-    categorias = Categorias.objects.filter(user=request.user)
+    categorias = list(Categorias.objects.filter(user=user))
 
-    return render(request, 'home.html', {
+    return {
         'contas' : contas, 
         'total_contas' : total_contas,
         'total_entradas': total_entradas,
         'total_saidas': total_saidas,
-        'saldo_geral': round(saldo_geral, 2),
+        'saldo_geral': saldo_geral,
         'percentual_gastos_essenciais': int(percentual_gastos_essenciais),
         'percentual_gastos_nao_essenciais': int(percentual_gastos_nao_essenciais),
         'meses_labels': meses_labels,
         'entradas_data': entradas_data,
         'gastos_data': gastos_data,
-        'selected_year': current_year,
+        'selected_year': ano,
         'labels': labels,
         'values': values,
         'colors': colors,
         'categorias': categorias,
-        })
+        }
+
+
+@login_required(login_url='login')
+def home(request):
+    current_year = datetime.now().year
+    current_month = datetime.now().month
+    dados = em_cache(request.user, 'home', f'{current_year}-{current_month}', lambda: _dados_home(request.user, current_year, current_month))
+    return render(request, 'home.html', dados)
 
 def gerenciar(request):
     contas = Conta.objects.filter(user=request.user)
     categorias = Categorias.objects.filter(user=request.user)
     total_contas = calcula_total(contas, 'valor')
-    valores = Valores.objects.filter(user=request.user).select_related('categoria', 'conta').order_by('-data')
+    valores = Valores.objects.filter(user=request.user).select_related('categoria', 'conta')
+
+    try:
+        valores_page = paginar_por_cursor(valores, '-data', request.GET.get('cursor'), por_pagina=50)
+    except CursorInvalido:
+        valores_page = paginar_por_cursor(valores, '-data', por_pagina=50)
 
     return render(request, 'gerenciar.html', {
         'contas' : contas,
         'total_contas' : total_contas,
         'categorias' : categorias,
-        'valores': valores,
+        'valores': valores_page,
+        'page_obj': valores_page,
+        'querystring': querystring_sem_cursor(request),
     })
 
 def cadastrar_banco(request):
@@ -176,16 +175,31 @@ def cadastrar_banco(request):
         messages.add_message(request, constants.ERROR, 'Preencha todos os campos!')
         return redirect('/perfil/gerenciar/')
 
+    try:
+        valor = para_decimal(valor)
+    except ValueError:
+        messages.add_message(request, constants.ERROR, 'Informe um valor válido!')
+        return redirect('/perfil/gerenciar/')
+
+    if icone:
+        try:
+            icone = imagens.processar(icone, 'icones')
+        except imagens.ErroImagem as e:
+            messages.add_message(request, constants.ERROR, f'Ícone não enviado: {e}')
+            return redirect('/perfil/gerenciar/')
+
     conta = Conta(
         user=request.user,
         apelido=apelido,
         banco=banco,
         tipo=tipo,
         valor=valor,
+        saldo_inicial=valor,
         icone=icone
     )
     
     conta.save()
+    invalidar_dados(request.user)
     messages.add_message(request, constants.SUCCESS, 'Conta cadastrada com sucesso!')
     return redirect('/perfil/gerenciar/')
 
@@ -193,9 +207,14 @@ def deletar_banco(request, id):
     try:
         conta = Conta.objects.get(id=id, user=request.user)
         # Deletar todos os valores associados a esta conta
-        Valores.objects.filter(conta=conta).delete()
+        valores = Valores.objects.filter(conta=conta)
+        with transaction.atomic():
+            resumo.remover_queryset(valores)
+            categorizacao.esquecer_queryset(valores)
+            valores.delete()
         # Depois deletar a conta
         conta.delete()
+        invalidar_dados(request.user)
         
         messages.add_message(request, constants.SUCCESS, 'Conta removida com sucesso')
     except Exception as e:
@@ -215,6 +234,7 @@ def cadastrar_categoria(request):
     )
 
     categoria.save()
+    invalidar_dados(request.user)
     messages.add_message(request, constants.SUCCESS, 'Categoria cadastrada com sucesso')
     referer = request.META.get('HTTP_REFERER', '/perfil/gerenciar/')
     return redirect(referer)
@@ -233,18 +253,20 @@ def update_categoria(request, id):
             categoria.categoria = nome
 
         try:
-            categoria.valor_planejado = float(valor_planejado) if valor_planejado not in (None, '') else 0
+            categoria.valor_planejado = para_decimal(valor_planejado) if valor_planejado not in (None, '') else 0
         except ValueError:
             categoria.valor_planejado = 0
 
         categoria.essencial = essencial
         categoria.save()
+        invalidar_dados(request.user)
         referer = request.META.get('HTTP_REFERER', '/perfil/categorias/')
         return redirect(referer)
 
     # Default: toggle essencial (backwards-compatible)
     categoria.essencial = not categoria.essencial
     categoria.save()
+    invalidar_dados(request.user)
     referer = request.META.get('HTTP_REFERER', '/perfil/gerenciar/')
     return redirect(referer)
 
@@ -263,96 +285,128 @@ def deletar_categoria(request, id):
 
     categoria = Categorias.objects.get(id=id, user=request.user)
     categoria.delete()
+    invalidar_dados(request.user)
     messages.add_message(request, constants.SUCCESS, 'Categoria removida com sucesso')
     referer = request.META.get('HTTP_REFERER', '/perfil/gerenciar/')
     return redirect(referer)
 
-def dashboard(request):
-    """Dashboard view: aggregate expenses by category for a selected month/year.
-
-    Query params:
-    - month (1-12) default: current month
-    - year default: current year
-
-    Returns: template with labels, values and color list for Chart.js
-    """
-    # parse period params
+def _periodo(request):
+    """(year, month) from the ?year= and ?month= params, defaulting to the current ones."""
     try:
         month = int(request.GET.get('month') or datetime.now().month)
     except ValueError:
         month = datetime.now().month
+    if not 1 <= month <= 12:
+        month = datetime.now().month
 
     try:
         year = int(request.GET.get('year') or datetime.now().year)
     except ValueError:
         year = datetime.now().year
+    return year, month
 
-    # aggregate using ORM for performance
-    queryset = Valores.objects.filter(user=request.user, data__year=year, data__month=month, tipo='S')
-    agg = queryset.values('categoria__categoria').annotate(total=Sum('valor')).order_by('-total')
 
-    labels = []
-    values = []
-    for item in agg:
-        labels.append(item['categoria__categoria'] or 'Sem categoria')
-        # Sum may be Decimal; convert to float for JS
-        total = item['total'] or 0
-        try:
-            values.append(float(total))
-        except Exception:
-            values.append(0.0)
+def _serie_categorias(user, ano, mes):
+    """Expenses per category of ano/mes (bar chart), cached per data version."""
+    def calcular():
+        # aggregate from the monthly rollup (ResumoMensal)
+        labels, values = calcula_gastos_por_categoria(user, ano, mes)
 
-    # generate colors (cycle palette)
-    palette = ['#10B981', '#06b6d4', '#f97316', '#ef4444', '#60a5fa', '#7c3aed', '#f59e0b', '#14b8a6']
-    colors = [palette[i % len(palette)] for i in range(len(labels))]
+        # generate colors (cycle palette)
+        palette = ['#10B981', '#06b6d4', '#f97316', '#ef4444', '#60a5fa', '#7c3aed', '#f59e0b', '#14b8a6']
+        colors = [palette[i % len(palette)] for i in range(len(labels))]
+        return {'labels': labels, 'values': values, 'colors': colors}
+
+    return em_cache(user, 'categorias', f'{ano}-{mes}', calcular)
+
+
+def _serie_evolucao(user, ano):
+    """Monthly entradas/gastos of `ano` (line chart), cached per data version."""
+    def calcular():
+        meses_labels, entradas_data, gastos_data = get_evolution_data(ano, user)
+        return {'meses_labels': meses_labels, 'entradas_data': entradas_data, 'gastos_data': gastos_data}
+
+    return em_cache(user, 'evolucao', ano, calcular)
+
+
+def dashboard(request):
+    """Dashboard view: aggregate expenses by category for a selected month/year.
+
+    Query params:
+    - month (1-12) default: current month
+    - year default: current year
 
-    # Get evolution data for all 12 months of the year (shared with home)
-    meses_labels, entradas_data, gastos_data = get_evolution_data(year, request.user)
+    Returns: template with labels, values and color list for Chart.js
+    """
+    year, month = _periodo(request)
 
     return render(request, 'dashboard.html', {
-        'labels': labels,
-        'values': values,
-        'colors': colors,
+        **_serie_categorias(request.user, year, month),
+        **_serie_evolucao(request.user, year),
         'selected_month': month,
         'selected_year': year,
-        'meses_labels': meses_labels,
-        'entradas_data': entradas_data,
-        'gastos_data': gastos_data,
     })
 
 
-def relatorios(request):
-    # Reuse extrato's listing logic to show values filtered by conta/categoria
-    from extrato.models import Valores
-    contas = Conta.objects.filter(user=request.user)
-    categorias = Categorias.objects.filter(user=request.user)
+# As séries dos gráficos também saem em JSON; o ETag muda com a versão dos dados do
+# usuário (perfil.cache), então o navegador revalida e recebe 304 enquanto nada mudou.
+def _etag_categorias(request):
+    year, month = _periodo(request)
+    return f'categorias-{request.user.pk}-{year}-{month}-{versao_dados(request.user)}'
 
-    conta_get = request.GET.get('conta')
-    categoria_get = request.GET.get('categoria')
 
-    # Additional filters: date range, search, sort
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    search = request.GET.get('search')
-    sort = request.GET.get('sort')
-    page_number = request.GET.get('page')
+def _etag_evolucao(request):
+    year, _ = _periodo(request)
+    return f'evolucao-{request.user.pk}-{year}-{versao_dados(request.user)}'
+
+
+@login_required(login_url='login')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_categorias)
+def graficos_categorias(request):
+    year, month = _periodo(request)
+    return JsonResponse({'year': year, 'month': month, **_serie_categorias(request.user, year, month)})
+
+
+@login_required(login_url='login')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_evolucao)
+def graficos_evolucao(request):
+    year, _ = _periodo(request)
+    return JsonResponse({'year': year, **_serie_evolucao(request.user, year)})
+
+
+def _meses_previsao(request):
+    """Forecast horizon from ?meses=, clamped to 1..MESES_MAXIMO."""
+    try:
+        meses = int(request.GET.get('meses') or previsao.MESES_PADRAO)
+    except ValueError:
+        meses = previsao.MESES_PADRAO
+    return min(max(meses, 1), previsao.MESES_MAXIMO)
 
-    valores = Valores.objects.filter(user=request.user, data__month=datetime.now().month)
 
-    if conta_get:
-        valores = valores.filter(conta__id=conta_get)
+def _etag_previsao(request):
+    # A previsão começa amanhã: além dos dados, muda quando o dia vira
+    return f'previsao-{request.user.pk}-{date.today().isoformat()}-{_meses_previsao(request)}-{versao_dados(request.user)}'
+
+
+@login_required(login_url='login')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_previsao)
+def graficos_previsao(request):
+    return JsonResponse(previsao.previsao(request.user, _meses_previsao(request)))
 
-    if categoria_get:
-        valores = valores.filter(categoria__id=categoria_get)
 
-    if start_date:
-        valores = valores.filter(data__gte=start_date)
+def relatorios(request):
+    contas = Conta.objects.filter(user=request.user)
+    categorias = Categorias.objects.filter(user=request.user)
 
-    if end_date:
-        valores = valores.filter(data__lte=end_date)
+    sort = request.GET.get('sort')
+    cursor = request.GET.get('cursor')
 
-    if search:
-        valores = valores.filter(descricao__icontains=search)
+    # Filters: conta, categoria, date range (default: current month), search
+    valores = filtrar_valores(request.user, request.GET)
+    valores = valores.select_related('conta', 'categoria')
 
     # Sorting
     valid_sorts = {
@@ -361,151 +415,53 @@ def relatorios(request):
         'valor': 'valor',
         '-valor': '-valor'
     }
-    if sort in valid_sorts:
-        valores = valores.order_by(valid_sorts[sort])
-    else:
-        valores = valores.order_by('-data')
+    ordem = valid_sorts.get(sort, '-data')
 
-    # Pagination
-    paginator = Paginator(valores, 20)
-    valores_page = paginator.get_page(page_number)
+    # Keyset pagination on (ordem, id): deep pages cost the same as the first one
+    try:
+        valores_page = paginar_por_cursor(valores, ordem, cursor, por_pagina=20, contar=True)
+    except CursorInvalido:
+        valores_page = paginar_por_cursor(valores, ordem, por_pagina=20, contar=True)
 
     return render(request, 'relatorios.html', {
         'valores': valores_page,
         'contas': contas,
         'categorias': categorias,
-        'paginator': paginator,
         'page_obj': valores_page,
+        'querystring': querystring_sem_cursor(request),
     })
 
 
 def relatorios_export_csv(request):
-    from extrato.models import Valores
-    valores = Valores.objects.filter(data__month=datetime.now().month)
-
-    conta_get = request.GET.get('conta')
-    categoria_get = request.GET.get('categoria')
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    search = request.GET.get('search')
-
-    if conta_get:
-        valores = valores.filter(conta__id=conta_get)
-    if categoria_get:
-        valores = valores.filter(categoria__id=categoria_get)
-    if start_date:
-        valores = valores.filter(data__gte=start_date)
-    if end_date:
-        valores = valores.filter(data__lte=end_date)
-    if search:
-        valores = valores.filter(descricao__icontains=search)
-
-    # Create CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="relatorios.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Conta', 'Categoria', 'Data', 'Tipo', 'Valor', 'Descrição'])
-    for v in valores:
-        writer.writerow([str(v.conta), str(v.categoria), v.data, v.tipo, v.valor, v.descricao])
+    valores = filtrar_valores(request.user, request.GET)
 
+    # Stream the CSV so memory stays constant regardless of the number of rows
+    response = StreamingHttpResponse(linhas_csv(valores), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="relatorios.csv"'
     return response
 
 
 def relatorios_export_pdf(request):
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib import colors
-    from io import BytesIO
-    from datetime import datetime
-    from extrato.models import Valores
-
-    # Get data with filters
-    valores = Valores.objects.filter(user=request.user, data__month=datetime.now().month)
-    conta_get = request.GET.get('conta')
-    categoria_get = request.GET.get('categoria')
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    search = request.GET.get('search')
-
-    if conta_get:
-        valores = valores.filter(conta__id=conta_get, conta__user=request.user)
-    if categoria_get:
-        valores = valores.filter(categoria__id=categoria_get, categoria__user=request.user)
-    if start_date:
-        valores = valores.filter(data__gte=start_date)
-    if end_date:
-        valores = valores.filter(data__lte=end_date)
-    if search:
-        valores = valores.filter(descricao__icontains=search)
-
-    # Create PDF in memory
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-
-    # Add title
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#064E3B'),
-        spaceAfter=12,
-        alignment=1  # Center
-    )
-    elements.append(Paragraph('Relatório de Movimentações', title_style))
-    elements.append(Spacer(1, 12))
+    """Queue the PDF export (or reuse a cached one) and show a page that waits for it."""
+    relatorio = enfileirar(request.user, normalizar_filtros(request.GET))
+    if relatorio.status == 'pronto':
+        return redirect('relatorio_pdf_download', id=relatorio.id)
 
-    # Add info
-    info_style = styles['Normal']
-    info_text = f'<b>Data de Geração:</b> {datetime.now().strftime("%d/%m/%Y %H:%M")}<br/><b>Total de Movimentações:</b> {valores.count()}'
-    elements.append(Paragraph(info_text, info_style))
-    elements.append(Spacer(1, 12))
+    return render(request, 'relatorio_pdf.html', {'relatorio': relatorio})
 
-    # Create table data
-    table_data = [['Conta', 'Categoria', 'Data', 'Tipo', 'Valor', 'Descrição']]
-    
-    for valor in valores:
-        tipo = 'Saída' if valor.tipo == 'S' else 'Entrada'
-        categoria_nome = str(valor.categoria.categoria) if valor.categoria else 'Sem categoria'
-        table_data.append([
-            str(valor.conta.apelido),
-            categoria_nome,
-            valor.data.strftime('%d/%m/%Y'),
-            tipo,
-            f'R$ {valor.valor:.2f}',
-            str(valor.descricao)[:30]
-        ])
-
-    if not valores.exists():
-        table_data.append(['', '', '', '', '', 'Nenhuma movimentação encontrada'])
-
-    # Create table with style
-    table = Table(table_data, colWidths=[1.2*inch, 1.2*inch, 1*inch, 0.8*inch, 1*inch, 1.8*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#064E3B')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')])
-    ]))
-
-    elements.append(table)
-
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="relatorios.pdf"'
-    return response
+
+def relatorio_pdf_status(request, id):
+    relatorio = get_object_or_404(RelatorioPDF, id=id, user=request.user)
+    return JsonResponse({
+        'id': relatorio.id,
+        'status': relatorio.status,
+        'download_url': reverse('relatorio_pdf_download', args=[relatorio.id]) if relatorio.status == 'pronto' else None,
+    })
+
+
+def relatorio_pdf_download(request, id):
+    relatorio = get_object_or_404(RelatorioPDF, id=id, user=request.user, status='pronto')
+    return FileResponse(relatorio.arquivo.open('rb'), as_attachment=True, filename='relatorios.pdf', content_type='application/pdf')
 
 def adicionar_valor(request):
     if request.method == 'POST':
@@ -525,26 +481,25 @@ def adicionar_valor(request):
             if categoria_id:
                 categoria = Categorias.objects.get(id=categoria_id, user=request.user)
             
-            conta = Conta.objects.get(id=conta_id, user=request.user)
-            
             novo_valor = Valores(
                 user=request.user,
-                valor=valor,
+                valor=para_decimal(valor),
                 categoria=categoria,
                 descricao=descricao,
                 data=data,
-                conta=conta,
+                conta_id=conta_id,
                 tipo=tipo
             )
-            novo_valor.save()
-            
-            # Update conta balance
-            valor_float = float(valor)
-            if tipo == "E":
-                conta.valor += valor_float
-            elif tipo == "S":
-                conta.valor -= valor_float
-            conta.save()
+            automatica = categorizacao.categorizar(request.user, [novo_valor])
+            # Saldo atualizado com F() no mesmo UPDATE (sem ler a conta); a conta deve ser do usuário
+            with transaction.atomic():
+                novo_valor.save()
+                resumo.registrar(novo_valor)
+                saldos.registrar(novo_valor)
+                categorizacao.aprender([novo_valor])
+            invalidar_dados(request.user)
+            if automatica:
+                messages.add_message(request, constants.INFO, f'Categoria "{novo_valor.categoria}" atribuída automaticamente')
             
             messages.add_message(request, constants.SUCCESS, f'{"Entrada" if tipo == "E" else "Saída"} registrada com sucesso!')
             return redirect('/perfil/home/')
@@ -574,13 +529,14 @@ def adicionar_saida(request):
 
 @login_required(login_url='login')
 def perfil_usuario(request):
-    user_profile, created = UserProfile.objects.get_or_create(user=request.user)
+    user_profile = perfil_da_requisicao(request)
     return render(request, 'perfil_usuario.html', {'user_profile': user_profile})
 
 @login_required(login_url='login')
 def editar_perfil(request):
-    user_profile, created = UserProfile.objects.get_or_create(user=request.user)
     if request.method == 'POST':
+        # Alterações partem do banco, não da cópia em cache
+        user_profile, created = UserProfile.objects.get_or_create(user=request.user)
         request.user.first_name = request.POST.get('first_name', '')
         request.user.last_name = request.POST.get('last_name', '')
         request.user.email = request.POST.get('email', '')
@@ -589,7 +545,10 @@ def editar_perfil(request):
         # Atualiza foto de perfil se enviada
         foto_file = request.FILES.get('foto_perfil')
         if foto_file:
-            user_profile.foto_perfil = foto_file
+            try:
+                user_profile.foto_perfil = imagens.processar(foto_file, 'perfis')
+            except imagens.ErroImagem as e:
+                messages.add_message(request, constants.ERROR, f'Foto não atualizada: {e}')
 
         user_profile.bio = request.POST.get('bio', '')
         user_profile.telefone = request.POST.get('telefone', '')
@@ -599,16 +558,18 @@ def editar_perfil(request):
         user_profile.cidade = request.POST.get('cidade', '')
         user_profile.estado = request.POST.get('estado', '')
         user_profile.save()
+        invalidar_perfil(request.user)
         
         messages.add_message(request, constants.SUCCESS, 'Perfil atualizado com sucesso!')
         return redirect('editar_perfil')
     
-    return render(request, 'editar_perfil.html', {'user_profile': user_profile})
+    return render(request, 'editar_perfil.html', {'user_profile': perfil_da_requisicao(request)})
 
 @login_required(login_url='login')
 def configuracoes(request):
-    user_profile, created = UserProfile.objects.get_or_create(user=request.user)
     if request.method == 'POST':
+        # Alterações partem do banco, não da cópia em cache
+        user_profile, created = UserProfile.objects.get_or_create(user=request.user)
         action = request.POST.get('action')
         if action == 'gerais':
             user_profile.idioma = request.POST.get('idioma', 'pt-BR')
@@ -621,10 +582,17 @@ def configuracoes(request):
             user_profile.notificacoes = request.POST.get('notificacoes') == 'on'
             user_profile.save()
             messages.add_message(request, constants.SUCCESS, 'Preferências atualizadas!')
+        elif action == 'personalizacao':
+            user_profile.tema = request.POST.get('tema', 'system')
+            user_profile.auto_categoria = request.POST.get('auto_categoria') == 'on'
+            user_profile.layout_dashboard = request.POST.get('layout', 'comfortable')
+            user_profile.save()
+            messages.add_message(request, constants.SUCCESS, 'Personalização atualizada!')
+        invalidar_perfil(request.user)
         
         return redirect('configuracoes')
     
-    return render(request, 'configuracoes.html', {'user_profile': user_profile})
+    return render(request, 'configuracoes.html', {'user_profile': perfil_da_requisicao(request)})
 
 # class DeletarBancoView(DeleteView):
 #     model = Conta
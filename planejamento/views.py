@@ -2,6 +2,8 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.messages import constants
 from perfil.models import Categorias
+from perfil.cache import invalidar_dados
+from core.dinheiro import para_decimal
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
@@ -16,10 +18,11 @@ def update_valor_categoria(request, id):
     categoria = Categorias.objects.get(id=id, user=request.user)
     categoria.valor_planejado = novo_valor
     categoria.save()
+    invalidar_dados(request.user)
     return JsonResponse({'Status': 'Sucesso'})
 
 def ver_planejamento(request):
-    categorias = Categorias.objects.filter(user=request.user)
+    categorias = Categorias.objects.filter(user=request.user).com_gastos()
     return render(request, 'ver_planejamento.html', {'categorias': categorias})
 
 
@@ -27,13 +30,14 @@ def salvar_valor_categoria(request, id):
     if request.method == 'POST':
         novo_valor = request.POST.get('novo_valor', '').strip()
         try:
-            valor = float(novo_valor) if novo_valor not in (None, '') else 0
+            valor = para_decimal(novo_valor) if novo_valor not in (None, '') else 0
         except ValueError:
             valor = 0
 
         categoria = Categorias.objects.get(id=id, user=request.user)
         categoria.valor_planejado = valor
         categoria.save()
+        invalidar_dados(request.user)
         messages.add_message(request, constants.SUCCESS, 'Valor planejado salvo com sucesso.')
 
     # After saving, show the planning overview so the user can see the updated values
@@ -50,7 +54,7 @@ def salvar_valor_categoria_form(request):
             return redirect('definir_planejamento')
 
         try:
-            valor = float(novo_valor) if novo_valor not in (None, '') else 0
+            valor = para_decimal(novo_valor) if novo_valor not in (None, '') else 0
         except ValueError:
             messages.add_message(request, constants.ERROR, 'Valor inválido.')
             return redirect('definir_planejamento')
@@ -59,6 +63,7 @@ def salvar_valor_categoria_form(request):
             categoria = Categorias.objects.get(id=int(categoria_id), user=request.user)
             categoria.valor_planejado = valor
             categoria.save()
+            invalidar_dados(request.user)
             messages.add_message(request, constants.SUCCESS, 'Valor planejado salvo com sucesso.')
         except Categorias.DoesNotExist:
             messages.add_message(request, constants.ERROR, 'Categoria não encontrada.')
@@ -73,6 +78,7 @@ def deletar_categoria(request, id):
             categoria = Categorias.objects.get(id=id, user=request.user)
             categoria_nome = categoria.categoria
             categoria.delete()
+            invalidar_dados(request.user)
             messages.add_message(request, constants.SUCCESS, f'Categoria "{categoria_nome}" deletada com sucesso.')
         except Categorias.DoesNotExist:
             messages.add_message(request, constants.ERROR, 'Categoria não encontrada.')